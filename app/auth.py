@@ -1,27 +1,47 @@
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Optional
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from fastapi import HTTPException, Depends, Request
+from fastapi.requests import HTTPConnection
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
+from app.hashing import (
+    HASH_RETRY_AFTER,
+    HashingBusy,
+    hash_password,
+    hash_pool,
+    verify_password,
+)
 
 # Secret key (keep it safe!)
 SECRET_KEY = "your_super_secret_key_here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 # ---------- PASSWORD HELPERS ----------
-def hash_password(password: str):
-    password_bytes = password.encode("utf-8")[:72]
-    return pwd_context.hash(password_bytes.decode("utf-8"))
+async def hash_password_async(password: str) -> str:
+    return await run_hashing(hash_pool.hash, password)
+
 
+async def verify_password_async(plain_password: str, hashed_password: str):
+    """(matches, upgraded hash or None), computed on the hashing pool."""
+    return await run_hashing(hash_pool.verify, plain_password, hashed_password)
 
-def verify_password(plain_password: str, hashed_password: str):
-    plain_password_bytes = plain_password.encode("utf-8")[:72]
-    return pwd_context.verify(plain_password_bytes.decode("utf-8"), hashed_password)
+
+async def run_hashing(method, *args):
+    try:
+        return await method(*args)
+    except HashingBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent logins, try again shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER)},
+        )
 
 
 # ---------- JWT CREATION ----------
@@ -61,12 +81,126 @@ def logout_user_response():
     return response
 
 
-# ---------- GET CURRENT USER ----------
-def get_current_user(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/api/token"))):
-    if not token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+# ---------- VERIFIED TOKEN CACHE ----------
+class TTLCache:
+    """Bounded LRU map whose entries carry their own expiry time."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at > now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, expires_at: float):
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+# When set, get_current_user also rejects users that are missing or inactive,
+# looking them up at most once per AUTH_USER_CACHE_SECONDS. Users deactivated
+# or deleted in the database directly are locked out within that many seconds;
+# code that changes them should call invalidate_user() for an immediate effect.
+AUTH_REQUIRE_ACTIVE_USER = os.getenv("AUTH_REQUIRE_ACTIVE_USER", "0") == "1"
+AUTH_USER_CACHE_SECONDS = float(os.getenv("AUTH_USER_CACHE_SECONDS", "30"))
+
+token_cache = TTLCache(AUTH_TOKEN_CACHE_SIZE)
+user_cache = TTLCache(AUTH_TOKEN_CACHE_SIZE)
+
+
+def verify_token(token: str) -> dict:
+    """Decoded claims of token, served from token_cache until the token expires."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    token_cache.put(token, payload, payload.get("exp", time.time()))
+    return payload
+
+
+def is_active_user(username: str) -> bool:
+    active = user_cache.get(username)
+    if active is None:
+        from app.database import SessionLocal
+        from app.models import User
+
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.username == username).first()
+            active = bool(user and user.is_active)
+        finally:
+            db.close()
+        user_cache.put(username, active, time.time() + AUTH_USER_CACHE_SECONDS)
+    return active
+
+
+def invalidate_user(username: str):
+    """Call after deactivating or deleting a user so the next request re-checks it."""
+    user_cache.discard(username)
+
+
+# ---------- GET CURRENT USER ----------
+def authenticate(token: Optional[str]) -> str:
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    username = verify_token(token)["sub"]
+    if AUTH_REQUIRE_ACTIVE_USER and not is_active_user(username):
+        raise HTTPException(status_code=401, detail="Inactive or unknown user")
+    return username
+
+
+def get_current_user(token: str = Depends(OAuth2PasswordBearer(tokenUrl="/api/token"))):
+    return authenticate(token)
+
+
+def connection_token(connection: HTTPConnection) -> Optional[str]:
+    """JWT from the bearer header, else the access_token query parameter or login cookie.
+
+    Browsers cannot set headers on EventSource or WebSocket connections.
+    """
+    scheme, _, token = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return connection.query_params.get("access_token") or connection.cookies.get("access_token")
+
+
+def get_stream_user(connection: HTTPConnection):
+    """get_current_user() for the change feed, also taking the token from connection_token()."""
+    return authenticate(connection_token(connection))
@@ -0,0 +1,174 @@
+"""
+Transactional batches of move / rename / delete / restore for
+POST /api/nodes/batch.
+
+Operations apply in order, each seeing the ones before it. BatchPlan loads
+every referenced node together with its ancestor chain from node_closure in
+one query (per IN_CHUNK ids) and replays the batch in memory on that parent
+map: cycle checks, deleted parents, root deletes and restore chains are all
+answered there. If any operation fails the batch is rejected with every
+error; otherwise apply() runs it in the caller's transaction with the same
+set-based statements as the single-node routes and logs each touched node
+once under one hierarchy version. The caller takes that version (and with it
+the hierarchy write lock, see app.change_log) before planning, so no other
+write can invalidate the plan.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.orm import Session
+
+from app import change_log, hierarchy
+from app.models import NodeClosure, NodeData
+from app.schemas import BatchOperation
+
+MAX_BATCH_OPERATIONS = 1000
+IN_CHUNK = 1000  # MSSQL allows 2100 parameters per statement
+NAME_MAX_LENGTH = 255
+
+node_table = NodeData.__table__
+
+
+class BatchPlan:
+    def __init__(self, db: Session, operations: List[BatchOperation]):
+        self.operations = operations
+        # node_id -> {"parent_id", "node_name", "is_deleted"} for referenced nodes and their ancestors
+        self.nodes: Dict[int, dict] = {}
+        referenced = sorted({op.node_id for op in operations} |
+                            {op.parent_id for op in operations if op.parent_id is not None})
+        chain_query = text("""
+            SELECT n.node_id, n.parent_id, n.node_name, n.is_deleted
+            FROM node_closure c
+            JOIN node_data n ON n.node_id = c.ancestor_id
+            WHERE c.descendant_id IN :ids
+        """).bindparams(bindparam("ids", expanding=True))
+        for i in range(0, len(referenced), IN_CHUNK):
+            for row in db.execute(chain_query, {"ids": referenced[i:i + IN_CHUNK]}):
+                self.nodes[row.node_id] = {"parent_id": row.parent_id, "node_name": row.node_name,
+                                           "is_deleted": bool(row.is_deleted)}
+        self.children: Dict[Optional[int], set] = {}
+        for node_id, node in self.nodes.items():
+            self.children.setdefault(node["parent_id"], set()).add(node_id)
+        self.restore_ids: Dict[int, List[int]] = {}  # operation index -> ids it restores
+        self.old_parents: Dict[int, Optional[int]] = {}  # operation index -> parent before a move
+        self.errors: List[dict] = []
+        for index, op in enumerate(operations):
+            error = getattr(self, f"_plan_{op.op}")(index, op)
+            if error:
+                self.errors.append({"index": index, "op": op.op, "node_id": op.node_id, "error": error})
+
+    def chain(self, node_id: int) -> List[int]:
+        """node_id and its ancestors, nearest first, as of the operations planned so far."""
+        ids = []
+        while node_id in self.nodes and len(ids) <= len(self.nodes):
+            ids.append(node_id)
+            node_id = self.nodes[node_id]["parent_id"]
+        return ids
+
+    # ---------- PLANNING (in memory) ----------
+    def _plan_rename(self, index: int, op: BatchOperation) -> Optional[str]:
+        if op.node_id not in self.nodes:
+            return "Node not found"
+        if not op.node_name or len(op.node_name) > NAME_MAX_LENGTH:
+            return f"node_name must be 1 to {NAME_MAX_LENGTH} characters"
+        self.nodes[op.node_id]["node_name"] = op.node_name
+
+    def _plan_move(self, index: int, op: BatchOperation) -> Optional[str]:
+        if op.node_id not in self.nodes:
+            return "Node not found"
+        if op.parent_id is None:
+            return "parent_id is required"
+        parent = self.nodes.get(op.parent_id)
+        if parent is None or parent["is_deleted"]:
+            return f"Parent node {op.parent_id} not found."
+        if op.node_id in self.chain(op.parent_id):
+            return "Node cannot be moved under itself or its descendants"
+        node = self.nodes[op.node_id]
+        self.old_parents[index] = node["parent_id"]
+        self.children[node["parent_id"]].discard(op.node_id)
+        self.children.setdefault(op.parent_id, set()).add(op.node_id)
+        node["parent_id"] = op.parent_id
+
+    def _plan_delete(self, index: int, op: BatchOperation) -> Optional[str]:
+        node = self.nodes.get(op.node_id)
+        if node is None:
+            return "Node not found"
+        if node["parent_id"] == 0:
+            return "Root node cannot be deleted"
+        # only the loaded part of the subtree matters to later operations
+        stack = [op.node_id]
+        while stack:
+            node_id = stack.pop()
+            self.nodes[node_id]["is_deleted"] = True
+            stack.extend(self.children.get(node_id, ()))
+
+    def _plan_restore(self, index: int, op: BatchOperation) -> Optional[str]:
+        if op.node_id not in self.nodes:
+            return "Node not found"
+        ids = [op.node_id]
+        for ancestor_id in self.chain(op.node_id)[1:]:
+            if not self.nodes[ancestor_id]["is_deleted"]:
+                break
+            ids.append(ancestor_id)
+        for node_id in ids:
+            self.nodes[node_id]["is_deleted"] = False
+        self.restore_ids[index] = ids
+
+    # ---------- APPLYING (caller's transaction) ----------
+    def apply(self, db: Session, version: int) -> dict:
+        """Run the planned batch under version; returns per-operation results and change feed events."""
+        results, events = [], []
+        touched: Dict[int, str] = {}  # node_id -> change log op, last one wins
+        pending_renames = []
+        now = datetime.utcnow()
+
+        def flush_renames():
+            if pending_renames:
+                db.execute(
+                    update(node_table)
+                    .where(node_table.c.node_id == bindparam("target_id"))
+                    .values(node_name=bindparam("new_name")),
+                    pending_renames,
+                )
+                pending_renames.clear()
+
+        for index, op in enumerate(self.operations):
+            if op.op == "rename":
+                pending_renames.append({"target_id": op.node_id, "new_name": op.node_name})
+                touched[op.node_id] = "update"
+                results.append({"index": index, "op": op.op, "node_id": op.node_id, "affected": 1})
+                events.append({"type": "rename", "node_id": op.node_id, "node_name": op.node_name})
+                continue
+            flush_renames()
+
+            if op.op == "move":
+                db.execute(update(node_table).where(node_table.c.node_id == op.node_id)
+                           .values(parent_id=op.parent_id))
+                hierarchy.move_subtree(db, op.node_id, op.parent_id)
+                touched[op.node_id] = "update"
+                affected = [op.node_id]
+                events.append({"type": "move", "node_id": op.node_id, "parent_id": op.parent_id,
+                               "old_parent_id": self.old_parents[index]})
+            elif op.op == "delete":
+                subtree = select(NodeClosure.descendant_id).where(NodeClosure.ancestor_id == op.node_id)
+                affected = list(db.execute(subtree).scalars())
+                db.execute(update(node_table).where(node_table.c.node_id.in_(subtree)).values(
+                    is_deleted=True, deleted_at=func.coalesce(node_table.c.deleted_at, now)))
+                touched.update((node_id, "delete") for node_id in affected)
+                events.append({"type": "delete", "node_id": op.node_id, "descendants": len(affected) - 1})
+            else:
+                affected = self.restore_ids[index]
+                db.execute(update(node_table).where(node_table.c.node_id.in_(affected)).values(
+                    is_deleted=False, deleted_at=None))
+                touched.update((node_id, "restore") for node_id in affected)
+                events.append({"type": "restore", "node_ids": affected})
+            results.append({"index": index, "op": op.op, "node_id": op.node_id, "affected": len(affected)})
+        flush_renames()
+
+        by_op: Dict[str, List[int]] = {}
+        for node_id, log_op in touched.items():
+            by_op.setdefault(log_op, []).append(node_id)
+        for log_op, node_ids in by_op.items():
+            change_log.record(db, version, log_op, node_ids)
+        return {"results": results, "events": events}
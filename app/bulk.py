@@ -0,0 +1,199 @@
+"""
+Bulk hierarchy import and export.
+
+Import rows carry `node_name` plus one parent reference: `parent_path`
+("Site A/Line 3"), `parent_id` or `parent_name`. A row without any parent
+reference becomes a root. Parents are resolved in memory against the live
+hierarchy and against rows earlier in the same upload, and new nodes are
+inserted wave by wave (one wave per level of new nodes) as batched multi-row
+INSERTs in the caller's transaction.
+"""
+import csv
+import io
+import json
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app import change_log, hierarchy
+from app.models import NodeData
+from app.schemas import NodeCreate
+
+PATH_SEPARATOR = "/"
+EXPORT_FIELDS = ["node_id", "parent_id", "node_name", "parent_path"]
+
+
+# ---------- PARSING ----------
+def parse_rows(body: bytes, fmt: str) -> List[dict]:
+    content = body.decode("utf-8-sig")
+    if fmt == "csv":
+        return [dict(row) for row in csv.DictReader(io.StringIO(content))]
+    rows = []
+    for line in content.splitlines():
+        if line.strip():
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                rows.append({"_error": f"Invalid JSON: {e}"})
+    return rows
+
+
+# ---------- IMPORT ----------
+class LiveHierarchy:
+    """Name, path and id lookups over live nodes, extended as rows are imported."""
+
+    def __init__(self, db: Session):
+        result = db.execute(text(
+            "SELECT node_id, parent_id, node_name FROM node_data WHERE is_deleted = 0"
+        ))
+        self.parents: Dict[int, Optional[int]] = {}
+        self.names: Dict[int, str] = {}
+        for node_id, parent_id, node_name in result:
+            self.parents[node_id] = parent_id
+            self.names[node_id] = node_name
+        self.by_name: Dict[str, List[int]] = {}
+        self.by_path: Dict[str, List[int]] = {}  # siblings may share a name
+        for node_id in self.names:
+            self.by_name.setdefault(self.names[node_id], []).append(node_id)
+            self.by_path.setdefault(self.path_of(node_id), []).append(node_id)
+
+    def path_of(self, node_id: int) -> str:
+        parts = []
+        current = node_id
+        while current in self.names and len(parts) <= len(self.names):
+            parts.append(self.names[current])
+            current = self.parents.get(current)
+        return PATH_SEPARATOR.join(reversed(parts))
+
+    def add(self, node_id: int, parent_id: Optional[int], node_name: str, path: str):
+        self.parents[node_id] = parent_id
+        self.names[node_id] = node_name
+        self.by_name.setdefault(node_name, []).append(node_id)
+        self.by_path.setdefault(path, []).append(node_id)
+
+
+def text_field(row: dict, key: str) -> Optional[str]:
+    value = row.get(key)
+    return None if value in (None, "") else str(value)
+
+
+def import_rows(db: Session, rows: List[dict], version: Optional[int] = None) -> dict:
+    """Insert rows in the caller's transaction; returns created count and per-row errors.
+
+    With a hierarchy version, the created nodes are written to the change log under it.
+    """
+    live = LiveHierarchy(db)
+    errors = []
+    pending = []
+
+    for line, row in enumerate(rows, start=1):
+        if "_error" in row:
+            errors.append({"row": line, "error": row["_error"]})
+            continue
+        try:
+            node = NodeCreate(node_name=row.get("node_name"), parent_path=text_field(row, "parent_path"),
+                              parent_name=text_field(row, "parent_name"))
+        except ValidationError as e:
+            errors.append({"row": line, "error": e.errors()[0]["msg"]})
+            continue
+        pending.append((line, {**row, "node_name": node.node_name}))
+
+    created = 0
+    while pending:
+        wave, waiting = [], []
+        for line, row in pending:
+            parent_id, error = resolve_parent(live, row)
+            if error:
+                waiting.append((line, row, error))
+            else:
+                wave.append((line, row, parent_id))
+
+        if not wave:
+            errors.extend({"row": line, "error": error} for line, _, error in waiting)
+            break
+
+        result = db.execute(
+            insert(NodeData).returning(NodeData.node_id, sort_by_parameter_order=True),
+            [
+                {"parent_id": parent_id, "node_name": row["node_name"], "is_deleted": False}
+                for _, row, parent_id in wave
+            ],
+        )
+        new_ids = [row.node_id for row in result]
+        hierarchy.add_nodes(db, [
+            (node_id, parent_id) for node_id, (_, _, parent_id) in zip(new_ids, wave)
+        ])
+        if version is not None:
+            change_log.record(db, version, "create", new_ids)
+        for node_id, (_, row, parent_id) in zip(new_ids, wave):
+            parent_path = live.path_of(parent_id) if parent_id else ""
+            path = f"{parent_path}{PATH_SEPARATOR}{row['node_name']}" if parent_path else row["node_name"]
+            live.add(node_id, parent_id, row["node_name"], path)
+        created += len(wave)
+        pending = [(line, row) for line, row, _ in waiting]
+
+    errors.sort(key=lambda e: e["row"])
+    return {"created": created, "errors": errors}
+
+
+def resolve_parent(live: LiveHierarchy, row: dict):
+    """(parent_id, None) when resolvable now, else (None, reason)."""
+    if row.get("parent_path") not in (None, ""):
+        matches = live.by_path.get(str(row["parent_path"]).strip(PATH_SEPARATOR), [])
+        if not matches:
+            return None, f"Parent path '{row['parent_path']}' not found"
+        if len(matches) > 1:
+            return None, f"Parent path '{row['parent_path']}' is ambiguous"
+        return matches[0], None
+    if row.get("parent_id") not in (None, ""):
+        try:
+            parent_id = int(row["parent_id"])
+        except ValueError:
+            return None, f"Invalid parent_id '{row['parent_id']}'"
+        if parent_id == 0:  # legacy roots
+            return None, None
+        if parent_id not in live.names:
+            return None, f"Parent id {parent_id} not found"
+        return parent_id, None
+    if row.get("parent_name") not in (None, ""):
+        matches = live.by_name.get(row["parent_name"], [])
+        if not matches:
+            return None, f"Parent node '{row['parent_name']}' not found"
+        if len(matches) > 1:
+            return None, f"Parent name '{row['parent_name']}' is ambiguous; use parent_path"
+        return matches[0], None
+    return None, None
+
+
+# ---------- EXPORT ----------
+def export_nodes(db: Session, fmt: str, batch_size: int = 1000) -> Iterator[str]:
+    """Yield live nodes parents-first as CSV or NDJSON, re-importable by parent_path."""
+    result = db.execute(text("""
+        SELECT n.node_id, n.parent_id, n.node_name
+        FROM node_data n
+        JOIN (
+            SELECT descendant_id, COUNT(*) AS depth
+            FROM node_closure
+            GROUP BY descendant_id
+        ) d ON d.descendant_id = n.node_id
+        WHERE n.is_deleted = 0
+        ORDER BY d.depth, n.node_id
+    """).execution_options(stream_results=True, yield_per=batch_size))
+
+    paths: Dict[int, str] = {}
+    if fmt == "csv":
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+    for batch in result.partitions():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for node_id, parent_id, node_name in batch:
+            parent_path = paths.get(parent_id, "")
+            paths[node_id] = f"{parent_path}{PATH_SEPARATOR}{node_name}" if parent_path else node_name
+            record = [node_id, parent_id or None, node_name, parent_path]
+            if fmt == "csv":
+                writer.writerow(record)
+            else:
+                out.write(json.dumps(dict(zip(EXPORT_FIELDS, record))) + "\n")
+        yield out.getvalue()
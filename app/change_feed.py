@@ -0,0 +1,146 @@
+"""
+In-process hierarchy change feed behind /api/nodes/events (SSE) and
+/api/nodes/events/ws.
+
+The node write routes call change_feed.publish() after committing. Each
+event gets the next sequence number, is encoded to JSON once and kept in a
+ring of the last FEED_HISTORY events, then handed to the event loop in a
+single call that fans it out to every subscriber's bounded queue. A
+subscriber whose queue is full is evicted: it is told the resume token of
+the last event it received and disconnected, and can reconnect with that
+token to replay what it missed from the ring.
+
+Tokens are "<feed id>-<seq>". The feed id changes when the process restarts
+and the ring only reaches back so far; a token that cannot be resumed gets a
+"resync" event, after which the client should refetch the tree. Each worker
+process has its own feed and sees only the writes it served.
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Optional, Tuple
+
+FEED_HISTORY = int(os.getenv("FEED_HISTORY", "10000"))
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "15"))
+
+
+class Subscription:
+    def __init__(self, feed: "ChangeFeed", queue_size: int, last_seq: int, backlog: list):
+        self.feed = feed
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.backlog = deque(backlog)  # replayed events, delivered before the queue
+        self.last_seq = backlog[-1][0] if backlog else last_seq
+        self.delivered_seq = last_seq
+        self.evicted = False
+
+    def offer(self, seq: int, data: str):
+        """Runs on the event loop; never blocks."""
+        if self.evicted or seq <= self.last_seq:
+            return
+        try:
+            self.queue.put_nowait((seq, data))
+            self.last_seq = seq
+        except asyncio.QueueFull:
+            self.evict()
+
+    def evict(self):
+        self.evicted = True
+        self.feed.evictions += 1
+        self.feed.unsubscribe(self)
+        # drop what is buffered (the client replays it on resume) and wake the reader
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[Tuple[str, str]]:
+        """Next (token, json) to send, or None once evicted."""
+        item = self.backlog.popleft() if self.backlog else await self.queue.get()
+        if item is None:
+            return None
+        seq, data = item
+        self.delivered_seq = seq
+        return self.feed.token(seq), data
+
+    @property
+    def resume_token(self) -> str:
+        return self.feed.token(self.delivered_seq)
+
+
+class ChangeFeed:
+    def __init__(self, history: int = FEED_HISTORY, queue_size: int = FEED_QUEUE_SIZE):
+        self.feed_id = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self.history: deque = deque(maxlen=history)
+        self.seq = 0
+        self.subscribers = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.evictions = 0
+
+    def token(self, seq: int) -> str:
+        return f"{self.feed_id}-{seq}"
+
+    def parse_token(self, token: Optional[str]) -> Optional[int]:
+        """Sequence number a token resumes after, or None if it cannot be resumed."""
+        if not token:
+            return None
+        feed_id, _, seq = token.rpartition("-")
+        if feed_id != self.feed_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self.history[0][0] if self.history else self.seq + 1
+        if seq > self.seq or seq < oldest - 1:
+            return None
+        return seq
+
+    # ---------- PUBLISHING (any thread) ----------
+    def publish(self, event: dict):
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+            data = json.dumps({"token": self.token(seq), **event}, separators=(",", ":"))
+            self.history.append((seq, data))
+            self.published += 1
+            # scheduled under the lock so the loop sees events in sequence order
+            if self.loop is not None and self.subscribers:
+                try:
+                    self.loop.call_soon_threadsafe(self._fan_out, seq, data)
+                except RuntimeError:  # loop closed during shutdown
+                    self.loop = None
+
+    def _fan_out(self, seq: int, data: str):
+        for subscription in list(self.subscribers):
+            subscription.offer(seq, data)
+
+    # ---------- SUBSCRIBING (event loop) ----------
+    def subscribe(self, token: Optional[str] = None) -> Tuple[Subscription, bool]:
+        """(subscription, resync needed); resumes after token when it is still in the ring."""
+        self.loop = asyncio.get_running_loop()
+        with self._lock:
+            since = self.parse_token(token)
+            if since is None:
+                subscription = Subscription(self, self.queue_size, self.seq, [])
+            else:
+                backlog = [item for item in self.history if item[0] > since]
+                subscription = Subscription(self, self.queue_size, since, backlog)
+            self.subscribers.add(subscription)
+        return subscription, bool(token) and since is None
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "evictions": self.evictions,
+            "token": self.token(self.seq),
+        }
+
+
+change_feed = ChangeFeed()
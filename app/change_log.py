@@ -0,0 +1,208 @@
+"""
+Hierarchy change log behind GET /api/nodes/changes?since=<version>.
+
+Every write route calls next_version() and record() inside its own
+transaction, so a change is logged exactly when it commits. next_version()
+increments the single hierarchy_version row; its row lock is held until
+commit, which serializes hierarchy writes and makes versions commit in
+order, so a client that has seen version v has seen everything up to v.
+
+changes_since() returns the net change per node: the current row of every
+node touched after `since` (upserts) and the ids of touched nodes that no
+longer exist (removed). Nodes created and hard-deleted within the window are
+left out. Clients start from a full GET /api/nodes, whose X-Hierarchy-Version
+header is the version to sync from.
+
+prune() compacts the log to one row per node and drops rows older than
+CHANGE_LOG_RETENTION_DAYS, raising log_floor; a `since` below the floor (or
+ahead of the current version) gets resync_required and should re-download.
+ChangeLogPruner runs it every CHANGE_LOG_PRUNE_SECONDS.
+
+    python -m app.change_log prune [days]
+"""
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import HierarchyVersion, NodeChange, NodeClosure, NodeData
+
+CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+CHANGE_LOG_PRUNE_SECONDS = float(os.getenv("CHANGE_LOG_PRUNE_SECONDS", "3600"))
+RECORD_CHUNK = 1000
+
+logger = logging.getLogger("app.change_log")
+
+version_table = HierarchyVersion.__table__
+change_table = NodeChange.__table__
+node_table = NodeData.__table__
+
+
+# ---------- WRITES (caller's transaction) ----------
+def ensure_version_row(db: Session):
+    """Insert the version row at version 0 unless it exists; create_tables() calls this."""
+    try:
+        with db.begin_nested():
+            db.execute(insert(version_table).values(id=1, version=0, log_floor=0))
+    except IntegrityError:
+        pass  # already there, or another writer's first write inserted it first
+
+
+def next_version(db: Session) -> int:
+    """Bump and return the hierarchy version; locks the version row until commit."""
+    bump = (
+        update(version_table)
+        .where(version_table.c.id == 1)
+        .values(version=version_table.c.version + 1)
+        .returning(version_table.c.version)
+    )
+    version = db.execute(bump).scalar()
+    if version is None:
+        # tables created without create_tables(), e.g. by a script
+        ensure_version_row(db)
+        version = db.execute(bump).scalar()
+    return version
+
+
+def record(db: Session, version: int, op: str, node_ids: Iterable[int]):
+    node_ids = list(dict.fromkeys(node_ids))
+    changed_at = datetime.utcnow()
+    for i in range(0, len(node_ids), RECORD_CHUNK):
+        db.execute(insert(change_table), [
+            {"version": version, "node_id": node_id, "op": op, "changed_at": changed_at}
+            for node_id in node_ids[i:i + RECORD_CHUNK]
+        ])
+
+
+def record_subtree(db: Session, version: int, op: str, node_id: int):
+    """record() for node_id and all its descendants, in one INSERT ... SELECT."""
+    db.execute(insert(change_table).from_select(
+        ["version", "node_id", "op", "changed_at"],
+        select(literal(version), NodeClosure.descendant_id, literal(op), literal(datetime.utcnow()))
+        .where(NodeClosure.ancestor_id == node_id),
+    ))
+
+
+# ---------- READS ----------
+def current(db: Session) -> Tuple[int, int]:
+    """(version, log_floor); (0, 0) before the first write."""
+    row = db.execute(
+        select(version_table.c.version, version_table.c.log_floor).where(version_table.c.id == 1)
+    ).first()
+    return (row.version, row.log_floor) if row else (0, 0)
+
+
+def changes_since(db: Session, since: int) -> dict:
+    version, floor = current(db)
+    if since < floor or since > version:
+        return {"version": version, "since": since, "resync_required": True, "upserts": [], "removed": []}
+
+    params = {"since": since, "version": version}
+    touched = select(change_table.c.node_id).where(
+        change_table.c.version > since, change_table.c.version <= version
+    )
+    upserts = db.execute(
+        select(node_table).where(node_table.c.node_id.in_(touched)).order_by(node_table.c.node_id)
+    ).mappings().all()
+    removed = db.execute(text("""
+        SELECT DISTINCT c.node_id
+        FROM node_changes c
+        WHERE c.version > :since AND c.version <= :version
+          AND NOT EXISTS (SELECT 1 FROM node_data n WHERE n.node_id = c.node_id)
+          AND NOT EXISTS (
+              SELECT 1 FROM node_changes k
+              WHERE k.node_id = c.node_id AND k.version > :since AND k.op = 'create'
+          )
+        ORDER BY c.node_id
+    """), params).scalars().all()
+    return {
+        "version": version,
+        "since": since,
+        "resync_required": False,
+        "upserts": [dict(row) for row in upserts],
+        "removed": list(removed),
+    }
+
+
+# ---------- RETENTION ----------
+def prune(db: Session, retention_days: float = CHANGE_LOG_RETENTION_DAYS) -> dict:
+    """Compact the log to the latest row per node and drop rows past retention."""
+    # a node's latest row is enough to report it; superseded rows only take space
+    compacted = db.execute(text("""
+        DELETE FROM node_changes
+        WHERE EXISTS (
+            SELECT 1 FROM node_changes later
+            WHERE later.node_id = node_changes.node_id AND later.version > node_changes.version
+        )
+    """)).rowcount
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    expired_through = db.execute(
+        select(func.max(change_table.c.version)).where(change_table.c.changed_at < cutoff)
+    ).scalar()
+    expired = 0
+    if expired_through is not None:
+        expired = db.execute(delete(change_table).where(change_table.c.version <= expired_through)).rowcount
+        db.execute(
+            update(version_table)
+            .where(version_table.c.id == 1, version_table.c.log_floor < expired_through)
+            .values(log_floor=expired_through)
+        )
+    return {"compacted": compacted, "expired": expired, "log_floor": current(db)[1]}
+
+
+class ChangeLogPruner:
+    def __init__(self, session_factory, interval: float = CHANGE_LOG_PRUNE_SECONDS,
+                 retention_days: float = CHANGE_LOG_RETENTION_DAYS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.retention_days = retention_days
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> dict:
+        db = self.session_factory()
+        try:
+            result = prune(db, self.retention_days)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-log-pruner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("change log prune failed")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, init_db
+
+    if len(sys.argv) < 2 or sys.argv[1] != "prune":
+        print("usage: python -m app.change_log prune [days]")
+        sys.exit(2)
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else CHANGE_LOG_RETENTION_DAYS
+    init_db()
+    print(ChangeLogPruner(SessionLocal, retention_days=days).run_once())
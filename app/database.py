@@ -1,6 +1,8 @@
+import os
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.engine import URL
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.pool import StaticPool
 
 Base = declarative_base()
 
@@ -12,13 +14,81 @@ connection_string = (
     "TrustServerCertificate=yes;"
 )
 
-DATABASE_URL = URL.create(
+# DATABASE_URL overrides the MSSQL default, e.g. "sqlite:///assets.db" to run
+# or load-test the service locally.
+DATABASE_URL = os.getenv("DATABASE_URL") or URL.create(
     "mssql+pyodbc", query={"odbc_connect": connection_string}
 )
 
-engine = create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# pyodbc sends executemany() parameter sets in one round trip instead of one per row
+DB_FAST_EXECUTEMANY = os.getenv("DB_FAST_EXECUTEMANY", "1") == "1"
+
+
+def engine_options(url) -> dict:
+    """create_engine keyword arguments for url, from the DB_* settings."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+        if url.database in (None, "", ":memory:"):
+            # a single shared connection, otherwise every session gets its own empty database
+            options["poolclass"] = StaticPool
+        return options
+
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.drivername == "mssql+pyodbc":
+        options["fast_executemany"] = DB_FAST_EXECUTEMANY
+    return options
+
+
+def make_engine(url=DATABASE_URL, **overrides):
+    return create_engine(url, **{**engine_options(url), **overrides})
+
+
+def make_async_engine(url, **overrides):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(url, **{**engine_options(url), **overrides})
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional async engine, e.g. "mssql+aioodbc://..." or "sqlite+aiosqlite:///assets.db".
+# When set, app.main serves the node and auth routes from the async routers.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+async_engine = None
+AsyncSessionLocal = None
+
+if ASYNC_DATABASE_URL:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = make_async_engine(ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
 def test_connection():
     try:
@@ -0,0 +1,119 @@
+"""
+Password hashing on a bounded process pool.
+
+bcrypt is deliberately slow, and a burst of logins hashing on the request
+threads starves every other route. HashPool runs the work on a small pool of
+worker processes so it can use every core without holding a request thread,
+and caps how many hashes may be queued at once: past HASH_MAX_PENDING,
+submit() raises HashingBusy straight away instead of letting requests pile up
+behind the pool.
+
+BCRYPT_ROUNDS sets the cost of new hashes. Stored hashes with a different
+cost still verify, and verify_and_update() returns a replacement hash so the
+login route can upgrade them in place.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "0")) or os.cpu_count() or 1
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "0")) or HASH_WORKERS * 16
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# ---------- HASHING (runs in worker processes) ----------
+def truncate(password: str) -> str:
+    # bcrypt only looks at the first 72 bytes
+    return password.encode("utf-8")[:72].decode("utf-8", "ignore")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(truncate(password))
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(truncate(plain_password), hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash or None); a new hash is returned when the stored cost is stale."""
+    return pwd_context.verify_and_update(truncate(plain_password), hashed_password)
+
+
+# ---------- POOL ----------
+class HashingBusy(Exception):
+    pass
+
+
+class HashPool:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, so workers never inherit the parent's DB connections or locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def submit(self, fn, *args) -> asyncio.Future:
+        executor = self._executor or self.start()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingBusy()
+            self.pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self.submit(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self.submit(verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+hash_pool = HashPool()
@@ -0,0 +1,282 @@
+"""
+Closure-table index over node_data.parent_id.
+
+Every node has a (node, node, 0) row plus one row per ancestor, so ancestors,
+descendants, depth and subtree size are single indexed lookups on node_closure.
+The write routes call the maintenance helpers below inside their own
+transaction. app.main fills an empty node_closure on startup; existing
+databases can also be brought in line by hand with:
+
+    python -m app.hierarchy rebuild
+    python -m app.hierarchy verify
+"""
+import sys
+from typing import List, Optional
+
+from sqlalchemy import text, select, insert, delete, literal, func, case, bindparam
+from sqlalchemy.orm import Session
+
+from app.models import NodeData, NodeClosure
+
+
+# ---------- MAINTENANCE ----------
+def add_node(db: Session, node_id: int, parent_id: Optional[int]):
+    """Index a freshly inserted leaf under parent_id."""
+    db.execute(text("""
+        INSERT INTO node_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, :node_id, depth + 1
+        FROM node_closure
+        WHERE descendant_id = :parent_id
+    """), {"node_id": node_id, "parent_id": parent_id})
+    db.execute(text("""
+        INSERT INTO node_closure (ancestor_id, descendant_id, depth)
+        VALUES (:node_id, :node_id, 0)
+    """), {"node_id": node_id})
+
+
+def add_nodes(db: Session, pairs: List[tuple]):
+    """Index many fresh leaves at once; pairs are (node_id, parent_id) with parents already indexed."""
+    if not pairs:
+        return
+    params = [{"node_id": node_id, "parent_id": parent_id} for node_id, parent_id in pairs]
+    db.execute(text("""
+        INSERT INTO node_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, :node_id, depth + 1
+        FROM node_closure
+        WHERE descendant_id = :parent_id
+    """), params)
+    db.execute(text("""
+        INSERT INTO node_closure (ancestor_id, descendant_id, depth)
+        VALUES (:node_id, :node_id, 0)
+    """), params)
+
+
+def move_subtree(db: Session, node_id: int, new_parent_id: Optional[int]):
+    """Re-hang node_id and everything below it under new_parent_id."""
+    db.execute(text("""
+        DELETE FROM node_closure
+        WHERE descendant_id IN (
+            SELECT descendant_id FROM node_closure WHERE ancestor_id = :node_id
+        )
+        AND ancestor_id NOT IN (
+            SELECT descendant_id FROM node_closure WHERE ancestor_id = :node_id
+        )
+    """), {"node_id": node_id})
+    db.execute(text("""
+        INSERT INTO node_closure (ancestor_id, descendant_id, depth)
+        SELECT supertree.ancestor_id, subtree.descendant_id,
+               supertree.depth + subtree.depth + 1
+        FROM node_closure supertree
+        CROSS JOIN node_closure subtree
+        WHERE supertree.descendant_id = :parent_id
+          AND subtree.ancestor_id = :node_id
+    """), {"node_id": node_id, "parent_id": new_parent_id})
+
+
+def remove_subtree(db: Session, node_id: int):
+    """Drop the index rows of node_id's subtree; run before deleting the nodes."""
+    db.execute(text("""
+        DELETE FROM node_closure
+        WHERE descendant_id IN (
+            SELECT descendant_id FROM node_closure WHERE ancestor_id = :node_id
+        )
+    """), {"node_id": node_id})
+
+
+# ---------- QUERIES ----------
+def descendant_ids_query(node_id: int):
+    """SELECT of every node_id strictly below node_id."""
+    return select(NodeClosure.descendant_id).where(
+        NodeClosure.ancestor_id == node_id, NodeClosure.depth > 0
+    )
+
+
+def get_ancestors(db: Session, node_id: int) -> List[dict]:
+    """Ancestors of node_id, nearest first."""
+    result = db.execute(text("""
+        SELECT n.node_id, n.parent_id, n.node_name, n.is_deleted, c.depth
+        FROM node_closure c
+        JOIN node_data n ON n.node_id = c.ancestor_id
+        WHERE c.descendant_id = :node_id AND c.depth > 0
+        ORDER BY c.depth
+    """), {"node_id": node_id})
+    return [dict(row._mapping) for row in result.fetchall()]
+
+
+def get_depth(db: Session, node_id: int) -> int:
+    return db.execute(text("""
+        SELECT COUNT(*) FROM node_closure
+        WHERE descendant_id = :node_id AND depth > 0
+    """), {"node_id": node_id}).scalar()
+
+
+def subtree_size(db: Session, node_id: int) -> int:
+    """Number of descendants of node_id, not counting the node itself."""
+    return db.execute(text("""
+        SELECT COUNT(*) FROM node_closure
+        WHERE ancestor_id = :node_id AND depth > 0
+    """), {"node_id": node_id}).scalar()
+
+
+def get_paths(db: Session, node_ids: List[int]) -> dict:
+    """Slash-separated root-to-node name path for each id."""
+    if not node_ids:
+        return {}
+    result = db.execute(text("""
+        SELECT c.descendant_id, n.node_name
+        FROM node_closure c
+        JOIN node_data n ON n.node_id = c.ancestor_id
+        WHERE c.descendant_id IN :ids
+        ORDER BY c.descendant_id, c.depth DESC
+    """).bindparams(bindparam("ids", expanding=True)), {"ids": list(node_ids)})
+    paths = {}
+    for descendant_id, node_name in result:
+        paths.setdefault(descendant_id, []).append(node_name)
+    return {node_id: "/".join(names) for node_id, names in paths.items()}
+
+
+def is_in_subtree(db: Session, node_id: int, ancestor_id: int) -> bool:
+    """True when node_id is ancestor_id or lies below it."""
+    return db.execute(text("""
+        SELECT 1 FROM node_closure
+        WHERE ancestor_id = :ancestor_id AND descendant_id = :node_id
+    """), {"ancestor_id": ancestor_id, "node_id": node_id}).first() is not None
+
+
+def load_subtrees(db: Session, top_ids, depth: int) -> List[dict]:
+    """
+    Live nodes within `depth` levels below each of top_ids (a list or a
+    SELECT of node ids), with children_count (live descendants) and
+    has_children (any live direct child) for each returned node.
+    """
+    selected = (
+        select(NodeClosure.descendant_id)
+        .join(NodeData, NodeData.node_id == NodeClosure.descendant_id)
+        .where(
+            NodeClosure.ancestor_id.in_(top_ids),
+            NodeClosure.depth <= depth,
+            NodeData.is_deleted == False,
+        )
+    )
+    nodes = db.execute(
+        select(NodeData)
+        .where(NodeData.node_id.in_(selected))
+        .order_by(NodeData.node_id)
+    ).scalars().all()
+
+    below = NodeClosure.__table__.alias("below")
+    counts = db.execute(
+        select(
+            below.c.ancestor_id,
+            func.count().label("children_count"),
+            func.sum(case((below.c.depth == 1, 1), else_=0)).label("direct_children"),
+        )
+        .join(NodeData, NodeData.node_id == below.c.descendant_id)
+        .where(
+            below.c.ancestor_id.in_(selected),
+            below.c.depth > 0,
+            NodeData.is_deleted == False,
+        )
+        .group_by(below.c.ancestor_id)
+    ).all()
+    count_map = {row.ancestor_id: row for row in counts}
+
+    result = []
+    for node in nodes:
+        row = count_map.get(node.node_id)
+        result.append({
+            "node_id": node.node_id,
+            "node_name": node.node_name,
+            "parent_id": node.parent_id,
+            "is_deleted": node.is_deleted,
+            "children_count": row.children_count if row else 0,
+            "has_children": bool(row and row.direct_children),
+        })
+    return result
+
+
+# ---------- REBUILD / VERIFY ----------
+def rebuild(db: Session):
+    """Recompute node_closure from node_data.parent_id in one statement."""
+    closure = (
+        select(
+            NodeData.node_id.label("ancestor_id"),
+            NodeData.node_id.label("descendant_id"),
+            literal(0).label("depth"),
+        )
+        .cte("closure", recursive=True)
+    )
+    closure = closure.union_all(
+        select(
+            closure.c.ancestor_id,
+            NodeData.node_id,
+            closure.c.depth + 1,
+        ).where(NodeData.parent_id == closure.c.descendant_id)
+    )
+    db.execute(delete(NodeClosure))
+    db.execute(
+        insert(NodeClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"], select(closure)
+        )
+    )
+
+
+def rebuild_if_empty(db: Session) -> bool:
+    """rebuild() when node_closure is empty but node_data is not (a database
+    from before the closure table); returns whether it ran."""
+    if db.execute(select(NodeClosure.ancestor_id).limit(1)).first() is not None:
+        return False
+    if db.execute(select(NodeData.node_id).limit(1)).first() is None:
+        return False
+    rebuild(db)
+    return True
+
+
+def expected_closure(db: Session) -> set:
+    parents = dict(db.execute(select(NodeData.node_id, NodeData.parent_id)).all())
+    expected = set()
+    for node_id in parents:
+        current, depth = node_id, 0
+        while current in parents:
+            expected.add((current, node_id, depth))
+            current, depth = parents[current], depth + 1
+            if depth > len(parents):
+                raise ValueError(f"Cycle in node_data above node {node_id}")
+    return expected
+
+
+def verify(db: Session) -> dict:
+    """Compare node_closure with node_data.parent_id; empty lists mean consistent."""
+    expected = expected_closure(db)
+    actual = set(db.execute(
+        select(NodeClosure.ancestor_id, NodeClosure.descendant_id, NodeClosure.depth)
+    ).all())
+    return {
+        "missing": sorted(expected - actual),
+        "unexpected": sorted(actual - expected),
+    }
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, init_db
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    init_db()
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            rebuild(db)
+            db.commit()
+            print("node_closure rebuilt")
+        elif command == "verify":
+            report = verify(db)
+            if report["missing"] or report["unexpected"]:
+                print(f"node_closure inconsistent: {len(report['missing'])} missing, "
+                      f"{len(report['unexpected'])} unexpected rows")
+                sys.exit(1)
+            print("node_closure consistent")
+        else:
+            print("usage: python -m app.hierarchy [rebuild|verify]")
+            sys.exit(2)
+    finally:
+        db.close()
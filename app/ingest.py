@@ -0,0 +1,237 @@
+"""
+MQTT telemetry ingestion into node_readings.
+
+ReadingIngestor.handle() is the subscriber callback for node/+/metrics: it
+validates each message against schemas.MetricReading and appends a row to an
+in-memory buffer. A flusher thread writes the buffer out as batched INSERTs
+whenever INGEST_BATCH_SIZE rows are waiting or INGEST_FLUSH_SECONDS have
+passed, so the MQTT network thread never waits on the database.
+
+The buffer holds at most INGEST_MAX_BUFFER rows. When it is full,
+INGEST_DROP_POLICY decides what happens: "drop_newest" discards the incoming
+message, "drop_oldest" evicts the oldest buffered row, and "block" makes the
+subscriber wait up to INGEST_BLOCK_SECONDS for room, pushing back on the
+broker connection, before dropping. Counters and flush latency are exported
+on /metrics.
+
+Enable it in the API process with INGEST_ENABLED=1; the broker settings are
+the same MQTT_* variables the simulator reads.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import timezone
+from typing import List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from app.metrics import BUCKETS, Histogram, registry
+from app.models import NodeReading
+from app.schemas import MetricReading
+
+logger = logging.getLogger("app.ingest")
+
+INGEST_TOPIC = "node/+/metrics"
+INGEST_ENABLED = os.getenv("INGEST_ENABLED", "0") == "1"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "2000"))
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "1"))
+INGEST_MAX_BUFFER = int(os.getenv("INGEST_MAX_BUFFER", "100000"))
+INGEST_DROP_POLICY = os.getenv("INGEST_DROP_POLICY", "drop_newest")
+INGEST_BLOCK_SECONDS = float(os.getenv("INGEST_BLOCK_SECONDS", "1"))
+DROP_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+readings_table = NodeReading.__table__
+
+
+def parse_reading(topic: str, payload: bytes) -> Optional[dict]:
+    """Row for node_readings, or None if the topic or payload is invalid."""
+    parts = topic.split("/")
+    if len(parts) != 3 or parts[0] != "node" or parts[2] != "metrics":
+        return None
+    try:
+        node_id = int(parts[1])
+        reading = MetricReading(**json.loads(payload))
+    except (ValueError, TypeError, ValidationError):
+        return None
+    recorded_at = reading.timestamp
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "node_id": node_id,
+        "recorded_at": recorded_at,
+        "temperature": reading.temperature,
+        "humidity": reading.humidity,
+        "pressure": reading.pressure,
+        "status": reading.status,
+    }
+
+
+class ReadingIngestor:
+    def __init__(self, engine, batch_size: int = INGEST_BATCH_SIZE,
+                 flush_seconds: float = INGEST_FLUSH_SECONDS, max_buffer: int = INGEST_MAX_BUFFER,
+                 drop_policy: str = INGEST_DROP_POLICY, block_seconds: float = INGEST_BLOCK_SECONDS):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {DROP_POLICIES}")
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.drop_policy = drop_policy
+        self.block_seconds = block_seconds
+        # called with each batch of rows after it commits
+        self.listeners = []
+
+        self.buffer: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.mqtt_client = None
+
+        self.received = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.ingested = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.flush_latency = Histogram()
+
+    # ---------- SUBSCRIBER SIDE ----------
+    def handle(self, topic: str, payload: bytes):
+        row = parse_reading(topic, payload)
+        with self._cond:
+            self.received += 1
+            if row is None:
+                self.invalid += 1
+                return
+            if len(self.buffer) >= self.max_buffer and not self._make_room():
+                self.dropped += 1
+                return
+            self.buffer.append(row)
+            if len(self.buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _make_room(self) -> bool:
+        """Called with the lock held and the buffer full; True if row may be appended."""
+        if self.drop_policy == "drop_oldest":
+            self.buffer.popleft()
+            self.dropped += 1
+            return True
+        if self.drop_policy == "block":
+            return self._cond.wait_for(lambda: len(self.buffer) < self.max_buffer, timeout=self.block_seconds)
+        return False
+
+    # ---------- FLUSHER ----------
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="reading-flusher", daemon=True)
+        self._thread.start()
+        registry.collectors.append(self.render_metrics)
+
+    def stop(self):
+        if self.mqtt_client is not None:
+            self.mqtt_client.loop_stop()
+            self.mqtt_client.disconnect()
+            self.mqtt_client = None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.render_metrics in registry.collectors:
+            registry.collectors.remove(self.render_metrics)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self.buffer) >= self.batch_size or self._stopping,
+                    timeout=self.flush_seconds,
+                )
+                if not self.buffer and self._stopping:
+                    return
+                batch = [self.buffer.popleft() for _ in range(min(len(self.buffer), self.batch_size))]
+                self._cond.notify_all()  # wake subscribers blocked on a full buffer
+            if batch:
+                self.flush(batch)
+
+    def flush(self, batch: List[dict]):
+        start = time.perf_counter()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(readings_table), batch)
+        except Exception:
+            logger.exception("failed to write %d readings", len(batch))
+            with self._cond:
+                self.flush_errors += 1
+                self.dropped += len(batch)
+            return
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self.ingested += len(batch)
+            self.flushes += 1
+            self.flush_latency.observe(elapsed)
+        for listener in self.listeners:
+            try:
+                listener(batch)
+            except Exception:
+                logger.exception("reading listener failed")
+
+    # ---------- MQTT ----------
+    def connect_mqtt(self, host: str, port: int, transport: str = "tcp", qos: int = 0):
+        import paho.mqtt.client as mqtt
+
+        def on_connect(client, userdata, flags, rc):
+            client.subscribe(INGEST_TOPIC, qos=qos)
+
+        def on_message(client, userdata, message):
+            self.handle(message.topic, message.payload)
+
+        client = mqtt.Client(transport=transport)
+        client.on_connect = on_connect
+        client.on_message = on_message
+        client.connect(host, port)
+        client.loop_start()
+        self.mqtt_client = client
+
+    # ---------- STATS ----------
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "received": self.received,
+                "ingested": self.ingested,
+                "invalid": self.invalid,
+                "dropped": self.dropped,
+                "buffered": len(self.buffer),
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "flush_seconds_total": self.flush_latency.sum,
+            }
+
+    def render_metrics(self) -> List[str]:
+        stats = self.stats()
+        lines = ["# HELP ingest_messages_total Telemetry messages by outcome.",
+                 "# TYPE ingest_messages_total counter"]
+        for outcome in ("received", "ingested", "invalid", "dropped"):
+            lines.append(f'ingest_messages_total{{outcome="{outcome}"}} {stats[outcome]}')
+        lines += ["# HELP ingest_buffered_readings Readings waiting to be flushed.",
+                  "# TYPE ingest_buffered_readings gauge",
+                  f"ingest_buffered_readings {stats['buffered']}",
+                  "# HELP ingest_flush_errors_total Failed batch writes.",
+                  "# TYPE ingest_flush_errors_total counter",
+                  f"ingest_flush_errors_total {stats['flush_errors']}",
+                  "# HELP ingest_flush_seconds Batch write latency.",
+                  "# TYPE ingest_flush_seconds histogram"]
+        hist = self.flush_latency
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist.counts):
+            cumulative += count
+            lines.append(f'ingest_flush_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'ingest_flush_seconds_bucket{{le="+Inf"}} {hist.count}')
+        lines.append(f"ingest_flush_seconds_sum {hist.sum:.6f}")
+        lines.append(f"ingest_flush_seconds_count {hist.count}")
+        return lines
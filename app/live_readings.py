@@ -0,0 +1,229 @@
+"""
+Latest telemetry per node in fixed-size NumPy ring buffers, summarized over
+hierarchy subtrees for /api/nodes/{id}/live-summary.
+
+Each node that has reported owns one row (slot) in (slots, LIVE_HISTORY)
+arrays of timestamps, metrics and status codes, written round-robin; node
+ids map to slots through a flat array indexed by node id. The ingestor hands
+every flushed batch to add_rows(), which writes the whole batch with fancy
+indexing.
+
+Subtrees come from SubtreeIndex: live nodes laid out in depth-first order,
+so every subtree is one contiguous range of that order. It is rebuilt from
+node_data when the hierarchy version (bumped by the write routes through
+tree_cache.invalidate()) changes, or after LIVE_INDEX_MAX_AGE seconds so
+writes from other workers show up. Refreshes are single-flight without
+blocking: the refresh path is also reached from the event loop through
+AsyncSession.run_sync, so no lock is held across the query. While one
+request rebuilds, the others keep using the previous layout.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.rollups import from_epoch, to_epoch
+from app.tree_cache import tree_cache
+
+LIVE_HISTORY = int(os.getenv("LIVE_HISTORY", "16"))
+LIVE_INDEX_MAX_AGE = float(os.getenv("LIVE_INDEX_MAX_AGE", "60"))
+STATUS_CODES = {"OK": 0, "Warning": 1, "Error": 2}
+METRICS = ("temperature", "humidity", "pressure")
+
+
+class SubtreeIndex:
+    def __init__(self):
+        # (live node ids in depth-first order, node_id -> [start, end) in that order),
+        # swapped as one tuple so readers never pair a new order with an old span
+        self.layout: Tuple[np.ndarray, Dict[int, Tuple[int, int]]] = (np.empty(0, dtype=np.int64), {})
+        self._lock = threading.Lock()  # guards the fields below, never held across a query
+        self._refreshing = False
+        self.version: Optional[int] = None
+        self.built_at = 0.0
+        self.rebuilds = 0
+
+    def is_current(self) -> bool:
+        return self.version == tree_cache.version and time.monotonic() - self.built_at < LIVE_INDEX_MAX_AGE
+
+    @staticmethod
+    def build(rows) -> Tuple[np.ndarray, Dict[int, Tuple[int, int]]]:
+        children: Dict[Optional[int], List[int]] = {}
+        ids = set()
+        for node_id, parent_id in rows:
+            ids.add(node_id)
+            children.setdefault(parent_id, []).append(node_id)
+        roots = [node_id for parent_id, kids in children.items() if parent_id not in ids for node_id in kids]
+
+        order, span = [], {}
+        for root in sorted(roots):
+            stack = [(root, False)]
+            while stack:
+                node_id, done = stack.pop()
+                if done:
+                    span[node_id] = (span[node_id], len(order))
+                    continue
+                span[node_id] = len(order)
+                order.append(node_id)
+                stack.append((node_id, True))
+                stack.extend((child, False) for child in reversed(children.get(node_id, ())))
+        return np.array(order, dtype=np.int64), span
+
+    def refresh(self, db: Session):
+        with self._lock:
+            if self.is_current():
+                return
+            # someone else is rebuilding: serve the previous layout meanwhile (only the
+            # very first build, with nothing to serve yet, runs concurrently)
+            if self._refreshing and self.version is not None:
+                return
+            self._refreshing = True
+            version = tree_cache.version
+        try:
+            rows = db.execute(text("SELECT node_id, parent_id FROM node_data WHERE is_deleted = 0")).all()
+            layout = self.build(rows)
+        finally:
+            with self._lock:
+                self._refreshing = False
+        with self._lock:
+            if self.version is not None and self.version > version:
+                return  # a concurrent first build finished later with newer rows
+            self.layout = layout
+            self.version = version
+            self.built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def subtree(self, node_id: int) -> Optional[np.ndarray]:
+        order, spans = self.layout
+        span = spans.get(node_id)
+        if span is None:
+            return None
+        return order[span[0]:span[1]]
+
+
+class LiveReadingStore:
+    def __init__(self, history: int = LIVE_HISTORY, initial_slots: int = 1024):
+        self.history = history
+        self._lock = threading.Lock()
+        self.slot_of = np.full(initial_slots, -1, dtype=np.int64)  # indexed by node_id
+        self.used = 0
+        self.head = np.zeros(initial_slots, dtype=np.int64)
+        self.filled = np.zeros(initial_slots, dtype=np.int64)
+        self.times = np.zeros((initial_slots, history), dtype=np.float64)
+        self.status = np.zeros((initial_slots, history), dtype=np.int8)
+        self.values = {metric: np.zeros((initial_slots, history), dtype=np.float32) for metric in METRICS}
+        self.index = SubtreeIndex()
+
+    # ---------- WRITES ----------
+    def _grow_ids(self, max_id: int):
+        size = len(self.slot_of)
+        while size <= max_id:
+            size *= 2
+        grown = np.full(size, -1, dtype=np.int64)
+        grown[:len(self.slot_of)] = self.slot_of
+        self.slot_of = grown
+
+    def _grow_slots(self, needed: int):
+        size = len(self.head)
+        while size < needed:
+            size *= 2
+        pad = size - len(self.head)
+        self.head = np.concatenate([self.head, np.zeros(pad, dtype=np.int64)])
+        self.filled = np.concatenate([self.filled, np.zeros(pad, dtype=np.int64)])
+        self.times = np.vstack([self.times, np.zeros((pad, self.history), dtype=np.float64)])
+        self.status = np.vstack([self.status, np.zeros((pad, self.history), dtype=np.int8)])
+        for metric in METRICS:
+            self.values[metric] = np.vstack([self.values[metric], np.zeros((pad, self.history), dtype=np.float32)])
+
+    def _slots_for(self, node_ids: np.ndarray) -> np.ndarray:
+        if node_ids.max() >= len(self.slot_of):
+            self._grow_ids(int(node_ids.max()))
+        slots = self.slot_of[node_ids]
+        new_ids = np.unique(node_ids[slots < 0])
+        if len(new_ids):
+            if self.used + len(new_ids) > len(self.head):
+                self._grow_slots(self.used + len(new_ids))
+            self.slot_of[new_ids] = np.arange(self.used, self.used + len(new_ids))
+            self.used += len(new_ids)
+            slots = self.slot_of[node_ids]
+        return slots
+
+    def add_rows(self, rows: List[dict]):
+        """Ingestor listener: append a batch of node_readings rows."""
+        if not rows:
+            return
+        node_ids = np.fromiter((row["node_id"] for row in rows), dtype=np.int64, count=len(rows))
+        times = to_epoch(row["recorded_at"] for row in rows).astype(np.float64)
+        status = np.fromiter((STATUS_CODES.get(row["status"], 0) for row in rows), dtype=np.int8, count=len(rows))
+        values = {
+            metric: np.fromiter((row[metric] for row in rows), dtype=np.float32, count=len(rows))
+            for metric in METRICS
+        }
+        with self._lock:
+            slots = self._slots_for(node_ids)
+            # rank of each row among the batch's rows for the same slot, in arrival order
+            order = np.argsort(slots, kind="stable")
+            sorted_slots = slots[order]
+            starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+            counts = np.diff(np.r_[starts, len(sorted_slots)])
+            rank = np.empty(len(slots), dtype=np.int64)
+            rank[order] = np.arange(len(slots)) - np.repeat(starts, counts)
+
+            positions = (self.head[slots] + rank) % self.history
+            self.times[slots, positions] = times
+            self.status[slots, positions] = status
+            for metric in METRICS:
+                self.values[metric][slots, positions] = values[metric]
+            unique_slots = sorted_slots[starts]
+            self.head[unique_slots] = (self.head[unique_slots] + counts) % self.history
+            self.filled[unique_slots] = np.minimum(self.filled[unique_slots] + counts, self.history)
+
+    # ---------- READS ----------
+    def summary(self, db: Session, node_id: int, max_age: Optional[float] = None) -> Optional[dict]:
+        """Aggregates over node_id and its live descendants, or None if the node is unknown."""
+        self.index.refresh(db)
+        members = self.index.subtree(node_id)
+        if members is None:
+            return None
+
+        with self._lock:
+            in_range = members[members < len(self.slot_of)]
+            slots = self.slot_of[in_range]
+            slots = slots[slots >= 0]
+            latest = (self.head[slots] - 1) % self.history
+            latest_times = self.times[slots, latest]
+            if max_age is not None:
+                fresh = latest_times >= time.time() - max_age
+                slots, latest, latest_times = slots[fresh], latest[fresh], latest_times[fresh]
+            latest_status = self.status[slots, latest]
+            latest_values = {metric: self.values[metric][slots, latest] for metric in METRICS}
+
+            filled = self.filled[slots]
+            window = np.arange(self.history) < filled[:, None]
+            window_status = self.status[slots]
+            window_temperature = self.values["temperature"][slots]
+
+        reporting = len(slots)
+        result = {
+            "node_id": node_id,
+            "sensors": len(members),
+            "reporting": reporting,
+            "latest_at": from_epoch(latest_times.max()).isoformat() if reporting else None,
+            "error_count": int(np.count_nonzero(latest_status == STATUS_CODES["Error"])),
+            "warning_count": int(np.count_nonzero(latest_status == STATUS_CODES["Warning"])),
+        }
+        for metric in METRICS:
+            result[f"{metric}_avg"] = float(latest_values[metric].mean(dtype=np.float64)) if reporting else None
+        readings = int(window.sum())
+        result["window"] = {
+            "readings": readings,
+            "temperature_avg": float(window_temperature[window].mean(dtype=np.float64)) if readings else None,
+            "error_count": int(np.count_nonzero(window_status[window] == STATUS_CODES["Error"])),
+        }
+        return result
+
+
+live_readings = LiveReadingStore()
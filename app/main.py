@@ -1,13 +1,33 @@
-from sqlalchemy import text
+import logging
+import os
+from sqlalchemy import inspect, text
 from app.database import engine
 from fastapi import FastAPI
-from app.database import engine, Base
+from app.database import engine, Base, async_engine
 from app.routes import node_routes
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth_routes
+from fastapi.responses import PlainTextResponse
+from app.metrics import MetricsMiddleware, instrument_engine, registry
+from app.routes import auth_routes, change_routes
+from app.hashing import hash_pool
+from app.ingest import INGEST_ENABLED, ReadingIngestor
+from app.rollups import RollupMaintainer
+from app.live_readings import live_readings
+from app.change_log import ChangeLogPruner
+from app.retention import DELETED_NODE_RETENTION_DAYS, RetentionPurger
+from app.replicas import replica_set
+from app.database import SessionLocal
+from app.models import NodeData
+from app import change_log, hierarchy
 
 app = FastAPI(title="Asset Hierarchy API")
 
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine, name="async")
+for replica in replica_set.replicas:
+    instrument_engine(replica.engine, name=replica.name)
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,7 +37,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
+
+@app.on_event("startup")
+def create_tables():
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add columns and indexes added to them later
+    if "deleted_at" not in {column["name"] for column in inspect(engine).get_columns("node_data")}:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE node_data ADD deleted_at DATETIME NULL"))
+    for index in NodeData.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    # node_closure arrived after node_data: without it deletes, restores and subtrees silently miss nodes
+    db = SessionLocal()
+    try:
+        # seeded here so concurrent first writes never race to insert it
+        change_log.ensure_version_row(db)
+        db.commit()
+        if hierarchy.rebuild_if_empty(db):
+            db.commit()
+            logging.getLogger("app.hierarchy").info("node_closure was empty, rebuilt from node_data")
+    finally:
+        db.close()
+
+
+@app.on_event("shutdown")
+def stop_hash_pool():
+    hash_pool.shutdown()
+
+
+change_log_pruner = ChangeLogPruner(SessionLocal)
+
+
+@app.on_event("startup")
+def start_change_log_pruner():
+    change_log_pruner.start()
+
+
+@app.on_event("shutdown")
+def stop_change_log_pruner():
+    change_log_pruner.stop()
+
+
+retention_purger = None
+if DELETED_NODE_RETENTION_DAYS > 0:
+    retention_purger = RetentionPurger(SessionLocal)
+
+    @app.on_event("startup")
+    def start_retention_purger():
+        retention_purger.start()
+
+    @app.on_event("shutdown")
+    def stop_retention_purger():
+        retention_purger.stop()
+
+
+ingestor = None
+if INGEST_ENABLED:
+    ingestor = ReadingIngestor(engine)
+    rollup_maintainer = RollupMaintainer(engine)
+    ingestor.listeners.append(rollup_maintainer.on_readings)
+    ingestor.listeners.append(live_readings.add_rows)
+
+    @app.on_event("startup")
+    def start_ingestion():
+        rollup_maintainer.start()
+        ingestor.start()
+        ingestor.connect_mqtt(
+            os.getenv("MQTT_BROKER", "localhost"),
+            int(os.getenv("MQTT_PORT", "9001")),
+            os.getenv("MQTT_TRANSPORT", "websockets"),
+            int(os.getenv("MQTT_QOS", "0")),
+        )
+
+    @app.on_event("shutdown")
+    def stop_ingestion():
+        ingestor.stop()
+        rollup_maintainer.stop()
+
+
+if async_engine is not None:
+    # registered first so they take precedence over the sync routes they mirror
+    from app.routes import async_node_routes, async_auth_routes
+    app.include_router(async_node_routes.router, prefix="/api", tags=["Nodes"])
+    app.include_router(async_auth_routes.router, prefix="/api")
+app.include_router(change_routes.router, prefix="/api")
 app.include_router(node_routes.router, prefix="/api", tags=["Nodes"])
 app.include_router(auth_routes.router, prefix="/api")
 
@@ -29,3 +132,8 @@ def test_db_connection():
             return {"status": "success", "message": "Database connected", "value": result.scalar()}
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return registry.render()
@@ -0,0 +1,211 @@
+"""
+Request and SQL instrumentation exposed in Prometheus text format at /metrics.
+
+MetricsMiddleware times every request per route template and status.
+instrument_engine() hooks SQLAlchemy cursor events so each request also
+records how many statements it ran and how long they took; the per-request
+tally lives in a context variable, which Starlette carries into the
+threadpool that runs sync handlers. Set SLOW_REQUEST_SECONDS to log the
+statements of requests slower than that threshold.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger("app.slow_requests")
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0")) or None
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "log")
+
+    def __init__(self, keep_log: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.log: Optional[List[tuple]] = [] if keep_log else None
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.db_latency = {}
+        self.statements = {}
+        self.responses = {}
+        self.sql_statements_total = 0
+        self.sql_seconds_total = 0.0
+        self.engines = {}
+        # callables returning extra exposition lines, e.g. from app.ingest
+        self.collectors = []
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram()
+                self.db_latency[key] = Histogram()
+                self.statements[key] = 0
+            self.latency[key].observe(seconds)
+            self.db_latency[key].observe(stats.db_seconds)
+            self.statements[key] += stats.statements
+            status_key = (method, route, status)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def observe_statement(self, seconds: float):
+        with self._lock:
+            self.sql_statements_total += 1
+            self.sql_seconds_total += seconds
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            render_histograms(lines, "http_request_duration_seconds",
+                              "Request latency by route.", self.latency)
+            render_histograms(lines, "http_request_db_seconds",
+                              "Time spent in SQL per request by route.", self.db_latency)
+
+            lines.append("# HELP http_request_sql_statements_total SQL statements issued by route.")
+            lines.append("# TYPE http_request_sql_statements_total counter")
+            for (method, route), value in sorted(self.statements.items()):
+                lines.append(f'http_request_sql_statements_total{{method="{method}",route="{route}"}} {value}')
+
+            lines.append("# HELP http_responses_total Responses by route and status.")
+            lines.append("# TYPE http_responses_total counter")
+            for (method, route, status), value in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {value}')
+
+            lines.append("# HELP sql_statements_total SQL statements executed.")
+            lines.append("# TYPE sql_statements_total counter")
+            lines.append(f"sql_statements_total {self.sql_statements_total}")
+            lines.append("# HELP sql_seconds_total Time spent executing SQL.")
+            lines.append("# TYPE sql_seconds_total counter")
+            lines.append(f"sql_seconds_total {self.sql_seconds_total:.6f}")
+
+            engines = dict(self.engines)
+
+        lines.append("# HELP db_pool_connections Connection pool state by engine.")
+        lines.append("# TYPE db_pool_connections gauge")
+        for name, engine in sorted(engines.items()):
+            pool = engine.pool
+            for state in ("size", "checkedin", "checkedout", "overflow"):
+                reader = getattr(pool, state, None)
+                if callable(reader):
+                    lines.append(f'db_pool_connections{{engine="{name}",state="{state}"}} {reader()}')
+        for collect in list(self.collectors):
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def render_histograms(lines: list, name: str, help_text: str, histograms: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), hist in sorted(histograms.items()):
+        labels = f'method="{method}",route="{route}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+        lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+
+registry = Registry()
+
+
+# ---------- SQLALCHEMY HOOKS ----------
+def instrument_engine(engine, name: str = "primary"):
+    """Count statements and SQL time on engine (a sync Engine or an AsyncEngine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    registry.engines[name] = sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        registry.observe_statement(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            if stats.log is not None:
+                stats.log.append((elapsed, statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # a failed statement never reaches after_cursor_execute; drop its start time
+        conn = context.connection
+        if conn is not None and context.statement is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+# ---------- MIDDLEWARE ----------
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_seconds: Optional[float] = SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(keep_log=self.slow_request_seconds is not None)
+        token = _current.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            registry.observe_request(scope["method"], route_path, status, elapsed, stats)
+            if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+                log_slow_request(scope, status, elapsed, stats)
+
+
+def log_slow_request(scope, status: int, elapsed: float, stats: RequestStats):
+    lines = [
+        f"{scope['method']} {scope['path']} -> {status} in {elapsed * 1000:.1f} ms, "
+        f"{stats.statements} statements, {stats.db_seconds * 1000:.1f} ms in SQL"
+    ]
+    for seconds, statement in stats.log or []:
+        lines.append(f"  {seconds * 1000:8.2f} ms  {' '.join(statement.split())}")
+    logger.warning("\n".join(lines))
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Float, ForeignKey, Index
+from sqlalchemy.sql import func, text
 from .database import Base
 
 class NodeData(Base):
@@ -11,6 +11,20 @@ class NodeData(Base):
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    deleted_at = Column(DateTime, nullable=True)  # UTC, set by soft delete; see app.retention
+
+    __table_args__ = (
+        Index("ix_node_data_parent_name", "parent_id", "node_name"),  # path resolution, see app.path_resolver
+        Index("ix_node_data_name", "node_name"),  # parent_name lookups
+        # filtered to live rows where the backend supports it (a plain index elsewhere):
+        # the tree, search index and listing scans read only these
+        Index("ix_node_data_live", "node_id", "parent_id", "node_name",
+              sqlite_where=text("is_deleted = 0"), mssql_where=text("is_deleted = 0"),
+              postgresql_where=text("is_deleted = false")),
+        Index("ix_node_data_deleted_at", "deleted_at",
+              sqlite_where=text("is_deleted = 1"), mssql_where=text("is_deleted = 1"),
+              postgresql_where=text("is_deleted = true")),
+    )
 
 class User(Base):
     __tablename__ = "users"
@@ -19,3 +33,75 @@ class User(Base):
     username = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+
+class NodeClosure(Base):
+    """One row per (ancestor, descendant) pair, including each node with itself at depth 0."""
+    __tablename__ = "node_closure"
+
+    ancestor_id = Column(Integer, primary_key=True)
+    descendant_id = Column(Integer, primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_node_closure_descendant_depth", "descendant_id", "depth"),
+    )
+
+class NodeReading(Base):
+    """One telemetry message from node/{node_id}/metrics."""
+    __tablename__ = "node_readings"
+
+    # BIGINT on the server; SQLite only autoincrements INTEGER primary keys
+    reading_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    node_id = Column(Integer, nullable=False)
+    recorded_at = Column(DateTime, nullable=False)
+    temperature = Column(Float, nullable=False)
+    humidity = Column(Float, nullable=False)
+    pressure = Column(Float, nullable=False)
+    status = Column(String(16), nullable=False)
+
+    __table_args__ = (
+        Index("ix_node_readings_node_recorded", "node_id", "recorded_at"),
+    )
+
+class NodeReadingRollup(Base):
+    """Aggregates of node_readings per node and time bucket; see app.rollups."""
+    __tablename__ = "node_reading_rollups"
+
+    node_id = Column(Integer, primary_key=True)
+    resolution = Column(String(3), primary_key=True)  # "1m", "1h" or "1d"
+    bucket_start = Column(DateTime, primary_key=True)
+    sample_count = Column(Integer, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    temperature_p95 = Column(Float, nullable=False)
+    humidity_min = Column(Float, nullable=False)
+    humidity_max = Column(Float, nullable=False)
+    humidity_sum = Column(Float, nullable=False)
+    humidity_p95 = Column(Float, nullable=False)
+    pressure_min = Column(Float, nullable=False)
+    pressure_max = Column(Float, nullable=False)
+    pressure_sum = Column(Float, nullable=False)
+    pressure_p95 = Column(Float, nullable=False)
+
+class HierarchyVersion(Base):
+    """Single row holding the hierarchy version; see app.change_log."""
+    __tablename__ = "hierarchy_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    log_floor = Column(BigInteger, nullable=False, default=0)  # node_changes pruned up to here
+
+class NodeChange(Base):
+    """One row per node touched by a hierarchy write, tagged with that write's version."""
+    __tablename__ = "node_changes"
+
+    version = Column(BigInteger, primary_key=True)
+    node_id = Column(Integer, primary_key=True)
+    op = Column(String(16), nullable=False)  # create, update, delete, restore or hard_delete
+    changed_at = Column(DateTime, nullable=False)  # UTC
+
+    __table_args__ = (
+        Index("ix_node_changes_node_version", "node_id", "version"),
+        Index("ix_node_changes_changed_at", "changed_at"),
+    )
@@ -1,43 +1,368 @@
+"""
+Telemetry simulator publishing node metrics to MQTT.
+
+Every simulated node publishes once per period, where the period is the node
+count divided by the aggregate SIM_RATE (messages/sec). First publishes are
+spread evenly over one period and each later one is jittered by
++/- SIM_JITTER of the period, so the load stays smooth instead of arriving in
+bursts. Due nodes are popped from a heap and their payloads built together,
+at most SIM_BATCH_SIZE per loop turn.
+
+Node ids come from SIM_NODES: "db" (live rows in node_data), a range such
+as "1-20000", or a comma-separated list of ids and ranges ("1-5,10").
+SIM_BROKER=fake publishes to an in-process FakeBroker instead of a real
+MQTT broker.
+
+    uvicorn app.mqtt_simulator:app
+    python -m app.mqtt_simulator --broker fake --nodes 1-20000 --rate 20000 --duration 10
+"""
+import argparse
 import asyncio
-import json
+import heapq
+import logging
+import os
 import random
+import time
+from collections import deque
 from datetime import datetime
-import paho.mqtt.client as mqtt
-from fastapi import FastAPI
+from typing import Callable, Dict, List, Optional
 
-app = FastAPI(title="IoT Simulator API")
+from fastapi import FastAPI, Query, Response
+
+logger = logging.getLogger("app.mqtt_simulator")
 
 # MQTT configuration
-MQTT_BROKER = "localhost"
-MQTT_PORT = 9001       # WebSocket port
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "9001"))  # WebSocket port
+MQTT_TRANSPORT = os.getenv("MQTT_TRANSPORT", "websockets")  # or "tcp"
+MQTT_QOS = int(os.getenv("MQTT_QOS", "0"))
 TOPIC_TEMPLATE = "node/{node_id}/metrics"
 
-NODE_IDS = [1, 2, 3, 4, 5]
+SIM_NODES = os.getenv("SIM_NODES", "db")
+SIM_BROKER = os.getenv("SIM_BROKER", "mqtt")
+SIM_RATE = float(os.getenv("SIM_RATE", "100"))
+SIM_JITTER = float(os.getenv("SIM_JITTER", "0.1"))
+SIM_BATCH_SIZE = int(os.getenv("SIM_BATCH_SIZE", "500"))
+SIM_STATS_SECONDS = float(os.getenv("SIM_STATS_SECONDS", "10"))
+STATS_WINDOW = 10
+
+STATUSES = ("OK", "Warning", "Error")
+PAYLOAD_TEMPLATE = (
+    '{{"temperature": {:.1f}, "humidity": {}, "pressure": {}, '
+    '"status": "{}", "timestamp": "{}"}}'
+)
+
+
+# ---------- NODE IDS ----------
+def parse_node_ids(spec: str) -> List[int]:
+    """Ids for a comma-separated list of ids and first-last ranges, e.g. "1-5,10"."""
+    node_ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        try:
+            if dash:
+                first, last = int(first), int(last)
+                if first > last:
+                    raise ValueError
+                node_ids.extend(range(first, last + 1))
+            else:
+                node_ids.append(int(part))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid node id or range '{part}' in '{spec}'")
+    if not node_ids:
+        raise argparse.ArgumentTypeError(f"no node ids in '{spec}'")
+    return node_ids
+
+
+def node_spec(spec: str) -> str:
+    """argparse type for --nodes: "db" or anything parse_node_ids() accepts."""
+    if spec != "db":
+        parse_node_ids(spec)
+    return spec
+
+
+def load_node_ids(spec: str = SIM_NODES) -> List[int]:
+    if spec != "db":
+        return parse_node_ids(spec)
+    from sqlalchemy import text
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return list(db.execute(text(
+            "SELECT node_id FROM node_data WHERE is_deleted = 0 ORDER BY node_id"
+        )).scalars())
+    finally:
+        db.close()
+
+
+# ---------- BROKERS ----------
+class FakeBroker:
+    """In-process broker: counts publishes and hands them to matching subscribers."""
+
+    def __init__(self):
+        self.published = 0
+        self.subscribers: List[tuple] = []
+
+    def subscribe(self, pattern: str, callback: Callable[[str, bytes], None]):
+        self.subscribers.append((pattern.split("/"), callback))
+
+    def publish(self, topic: str, payload: str, qos: int = 0):
+        self.published += 1
+        if not self.subscribers:
+            return
+        levels = topic.split("/")
+        data = payload.encode("utf-8")
+        for pattern, callback in self.subscribers:
+            if topic_matches(pattern, levels):
+                callback(topic, data)
+
+
+def topic_matches(pattern: List[str], levels: List[str]) -> bool:
+    for i, part in enumerate(pattern):
+        if part == "#":
+            return True
+        if i >= len(levels) or (part != "+" and part != levels[i]):
+            return False
+    return len(pattern) == len(levels)
+
+
+class MqttPublisher:
+    def __init__(self, host: str = MQTT_BROKER, port: int = MQTT_PORT, transport: str = MQTT_TRANSPORT):
+        import paho.mqtt.client as mqtt
+
+        self.client = mqtt.Client(transport=transport)
+        self.host, self.port = host, port
+
+    def start(self):
+        self.client.connect(self.host, self.port)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def publish(self, topic: str, payload: str, qos: int = 0):
+        self.client.publish(topic, payload, qos=qos)
+
+
+# ---------- SIMULATOR ----------
+class Simulator:
+    def __init__(self, publisher, node_ids: List[int], rate: float = SIM_RATE,
+                 jitter: float = SIM_JITTER, batch_size: int = SIM_BATCH_SIZE, qos: int = MQTT_QOS):
+        self.publisher = publisher
+        self.rate = rate
+        self.jitter = jitter
+        self.batch_size = batch_size
+        self.qos = qos
+        self.running = False
+        self.published = 0
+        self.started_at: Optional[float] = None
+        # (monotonic time, cumulative published, cumulative lag), one sample a second
+        self.window: deque = deque(maxlen=STATS_WINDOW)
+        self.lag_total = 0.0
+        self.max_lag = 0.0
+        self.set_nodes(node_ids)
+
+    @property
+    def period(self) -> float:
+        return len(self.node_ids) / self.rate if self.rate > 0 else float("inf")
+
+    def set_nodes(self, node_ids: List[int]):
+        self.node_ids = list(node_ids)
+        self.topics: Dict[int, str] = {node_id: TOPIC_TEMPLATE.format(node_id=node_id) for node_id in self.node_ids}
+        self.reschedule()
+
+    def set_rate(self, rate: float):
+        self.rate = rate
+        self.reschedule()
+
+    def reschedule(self):
+        now = time.monotonic()
+        period = self.period if self.rate > 0 else 0.0
+        count = len(self.node_ids) or 1
+        self.schedule = [(now + period * i / count, node_id) for i, node_id in enumerate(self.node_ids)]
+        heapq.heapify(self.schedule)
+
+    def next_due(self, due: float, now: float) -> float:
+        period = self.period
+        nxt = due + period * (1 + random.uniform(-self.jitter, self.jitter))
+        # fell more than a period behind: drop the backlog rather than burst to catch up
+        return nxt if nxt > now - period else now
+
+    def payloads(self, count: int, timestamp: str) -> List[str]:
+        rand = random.random
+        return [
+            PAYLOAD_TEMPLATE.format(
+                20 + 10 * rand(), 30 + int(41 * rand()), 990 + int(36 * rand()),
+                STATUSES[int(3 * rand())], timestamp,
+            )
+            for _ in range(count)
+        ]
+
+    def publish_due(self) -> int:
+        """Publish up to batch_size due nodes; returns how many were sent."""
+        now = time.monotonic()
+        schedule = self.schedule
+        batch = []
+        while schedule and schedule[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(schedule))
+        if not batch:
+            return 0
+
+        timestamp = datetime.utcnow().isoformat()
+        publish, topics, qos = self.publisher.publish, self.topics, self.qos
+        for (due, node_id), payload in zip(batch, self.payloads(len(batch), timestamp)):
+            publish(topics[node_id], payload, qos)
+        sent_at = time.monotonic()
+
+        for due, node_id in batch:
+            lag = sent_at - due
+            self.lag_total += lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            heapq.heappush(schedule, (self.next_due(due, sent_at), node_id))
+        self.published += len(batch)
+        return len(batch)
+
+    async def run(self, duration: Optional[float] = None):
+        self.running = True
+        self.started_at = time.monotonic()
+        deadline = self.started_at + duration if duration else None
+        while self.running and (deadline is None or time.monotonic() < deadline):
+            self.sample(time.monotonic())
+            if not self.schedule or self.rate <= 0:
+                await asyncio.sleep(0.1)
+                continue
+            if self.publish_due():
+                await asyncio.sleep(0)
+                continue
+            await asyncio.sleep(min(max(self.schedule[0][0] - time.monotonic(), 0), 0.1))
+        self.running = False
+
+    def stop(self):
+        self.running = False
+
+    def sample(self, now: float):
+        if not self.window or now - self.window[-1][0] >= 1:
+            self.window.append((now, self.published, self.lag_total))
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        self.sample(now)
+        first_at, first_count, first_lag = self.window[0]
+        window_count = self.published - first_count
+        elapsed = now - first_at
+        return {
+            "nodes": len(self.node_ids),
+            "target_rate": self.rate,
+            "achieved_rate": window_count / elapsed if elapsed > 0 else 0.0,
+            "published": self.published,
+            "avg_lag_ms": (self.lag_total - first_lag) / window_count * 1000 if window_count else 0.0,
+            "max_lag_ms": self.max_lag * 1000,
+            "running": self.running,
+        }
+
+
+def make_publisher(broker: str = SIM_BROKER):
+    return FakeBroker() if broker == "fake" else MqttPublisher()
+
+
+# ---------- API ----------
+app = FastAPI(title="IoT Simulator API")
+simulator: Optional[Simulator] = None
+
+
+async def log_stats():
+    while simulator is not None and simulator.running:
+        await asyncio.sleep(SIM_STATS_SECONDS)
+        stats = simulator.stats()
+        logger.info("published %d msgs, %.0f msg/s (target %.0f), avg lag %.1f ms, max lag %.1f ms",
+                    stats["published"], stats["achieved_rate"], stats["target_rate"],
+                    stats["avg_lag_ms"], stats["max_lag_ms"])
 
-# Use WebSocket transport so frontend can subscribe
-client = mqtt.Client(transport="websockets")
 
 @app.on_event("startup")
 async def startup_event():
-    client.connect(MQTT_BROKER, MQTT_PORT)
-    client.loop_start()           # Required for async publishing
-    asyncio.create_task(simulate_metrics())
-
-async def simulate_metrics():
-    while True:
-        for node_id in NODE_IDS:
-            data = {
-                "temperature": round(random.uniform(20, 30), 1),
-                "humidity": random.randint(30, 70),
-                "pressure": random.randint(990, 1025),
-                "status": random.choice(["OK", "Warning", "Error"]),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            topic = TOPIC_TEMPLATE.format(node_id=node_id)
-            client.publish(topic, json.dumps(data))
-            print(f"Published to {topic}: {data}")
-        await asyncio.sleep(2)
+    global simulator
+    publisher = make_publisher()
+    if isinstance(publisher, MqttPublisher):
+        publisher.start()  # loop_start() runs the network loop on its own thread
+    simulator = Simulator(publisher, load_node_ids())
+    asyncio.create_task(simulator.run())
+    asyncio.create_task(log_stats())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    simulator.stop()
+    if isinstance(simulator.publisher, MqttPublisher):
+        simulator.publisher.stop()
+
 
 @app.get("/api/nodes")
-def get_nodes():
-    return NODE_IDS
+def get_nodes(response: Response):
+    stats = simulator.stats()
+    response.headers["X-Target-Rate"] = f"{stats['target_rate']:g}"
+    response.headers["X-Achieved-Rate"] = f"{stats['achieved_rate']:.1f}"
+    return simulator.node_ids
+
+
+@app.get("/api/stats")
+def get_stats():
+    return simulator.stats()
+
+
+@app.put("/api/rate")
+def set_rate(rate: float = Query(..., ge=0)):
+    simulator.set_rate(rate)
+    return simulator.stats()
+
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="Publish simulated node metrics")
+    parser.add_argument("--nodes", type=node_spec, default=SIM_NODES,
+                        help='"db", a range like 1-20000, or a list like 1-5,10,12')
+    parser.add_argument("--rate", type=float, default=SIM_RATE, help="aggregate messages/sec")
+    parser.add_argument("--jitter", type=float, default=SIM_JITTER)
+    parser.add_argument("--batch-size", type=int, default=SIM_BATCH_SIZE)
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=MQTT_QOS)
+    parser.add_argument("--broker", choices=("mqtt", "fake"), default=SIM_BROKER)
+    parser.add_argument("--host", default=MQTT_BROKER)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--transport", choices=("websockets", "tcp"), default=MQTT_TRANSPORT)
+    parser.add_argument("--duration", type=float, default=None, help="seconds; runs forever if omitted")
+    args = parser.parse_args()
+
+    if args.broker == "fake":
+        publisher = FakeBroker()
+    else:
+        publisher = MqttPublisher(args.host, args.port, args.transport)
+        publisher.start()
+    sim = Simulator(publisher, load_node_ids(args.nodes), rate=args.rate, jitter=args.jitter,
+                    batch_size=args.batch_size, qos=args.qos)
+
+    async def report():
+        while sim.running:
+            await asyncio.sleep(1)
+            print(sim.stats())
+
+    async def run():
+        task = asyncio.create_task(sim.run(args.duration))
+        await asyncio.sleep(0)
+        await asyncio.gather(task, report())
+
+    try:
+        asyncio.run(run())
+    finally:
+        if isinstance(publisher, MqttPublisher):
+            publisher.stop()
+    print(sim.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Resolves slash-separated node paths ("Site A/Line 3/Pump 1") to node ids.
+
+A path is walked one level at a time through the (parent_id, node_name)
+index on node_data, over live nodes only; roots are nodes whose parent_id
+is NULL or 0. resolve_many() walks any number of paths together, one query
+per level (per IN_CHUNK pairs), so resolving thousands of paths costs about
+as many queries as the deepest of them has segments.
+
+Every resolved path and prefix goes into an LRU cache of PATH_CACHE_SIZE
+entries. The write routes call invalidate() with the paths a node had before
+and after a rename, move or delete, which drops those paths and everything
+below them; creates and restores invalidate the new path, since a cached
+sibling of the same name becomes ambiguous. Entries also expire after
+PATH_CACHE_MAX_AGE seconds so writes made by other worker processes show up.
+A name shared by two live siblings makes the path ambiguous; it resolves to
+nothing and is reported as such.
+
+Names compare case-insensitively, as under SQL Server's default collation:
+rows the name IN (...) lists bring back are matched to the requested
+segments, and cached, by casefolded name, so "plant/pump" and "Plant/Pump"
+share an entry and invalidating one drops both. (SQLite compares the IN
+lists case-sensitively, so there only cached paths resolve in another case.)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+PATH_SEPARATOR = "/"
+PATH_CACHE_SIZE = int(os.getenv("PATH_CACHE_SIZE", "100000"))
+PATH_CACHE_MAX_AGE = float(os.getenv("PATH_CACHE_MAX_AGE", "60"))
+IN_CHUNK = 1000  # parent ids and names per query, within MSSQL's 2100 parameters
+
+ROOT_CHILDREN = text("""
+    SELECT node_id, parent_id, node_name FROM node_data
+    WHERE (parent_id IS NULL OR parent_id = 0) AND node_name IN :names AND is_deleted = 0
+""").bindparams(bindparam("names", expanding=True))
+CHILDREN = text("""
+    SELECT node_id, parent_id, node_name FROM node_data
+    WHERE parent_id IN :parent_ids AND node_name IN :names AND is_deleted = 0
+""").bindparams(bindparam("parent_ids", expanding=True), bindparam("names", expanding=True))
+
+
+def split_path(path: str) -> List[str]:
+    return [part.strip() for part in path.strip().strip(PATH_SEPARATOR).split(PATH_SEPARATOR)]
+
+
+class PathResolver:
+    def __init__(self, max_size: int = PATH_CACHE_SIZE, max_age: float = PATH_CACHE_MAX_AGE):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._items: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.queries = 0
+
+    # ---------- CACHE ----------
+    def _get(self, key: str) -> Optional[int]:
+        key = key.casefold()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            node_id, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return node_id
+
+    def _put_many(self, entries: Dict[str, int]):
+        expires_at = time.monotonic() + self.max_age
+        with self._lock:
+            for key, node_id in entries.items():
+                key = key.casefold()
+                self._items[key] = (node_id, expires_at)
+                self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, paths: Iterable[str]):
+        """Forget these paths and every path below them."""
+        keys = {PATH_SEPARATOR.join(split_path(path)).casefold() for path in paths}
+        if not keys:
+            return
+        prefixes = tuple(key + PATH_SEPARATOR for key in keys)
+        with self._lock:
+            stale = [key for key in self._items if key in keys or key.startswith(prefixes)]
+            for key in stale:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    # ---------- RESOLVING ----------
+    def resolve(self, db: Session, path: str) -> Tuple[Optional[int], bool]:
+        """(node_id or None, ambiguous)"""
+        found, ambiguous = self.resolve_many(db, [path])
+        return found.get(path), path in ambiguous
+
+    def resolve_many(self, db: Session, paths: Iterable[str]) -> Tuple[Dict[str, int], Set[str]]:
+        """({path: node_id} for the paths that resolve, paths that are ambiguous)."""
+        found: Dict[str, int] = {}
+        ambiguous: Set[str] = set()
+        # path -> (segments, index of the next segment, node id so far)
+        walking: Dict[str, Tuple[List[str], int, Optional[int]]] = {}
+        for path in paths:
+            parts = split_path(path)
+            if not all(parts):
+                continue
+            key = PATH_SEPARATOR.join(parts)
+            # longest cached prefix, the full path included
+            for end in range(len(parts), 0, -1):
+                node_id = self._get(key if end == len(parts) else PATH_SEPARATOR.join(parts[:end]))
+                if node_id is not None:
+                    break
+            else:
+                end, node_id = 0, None
+            if end == len(parts):
+                self.hits += 1
+                found[path] = node_id
+            else:
+                self.misses += 1
+                walking[path] = (parts, end, node_id)
+
+        while walking:
+            pairs = {(parent_id, parts[index]) for parts, index, parent_id in walking.values()}
+            children = self._children(db, pairs)
+            learned: Dict[str, int] = {}
+            still_walking = {}
+            for path, (parts, index, parent_id) in walking.items():
+                matches = children.get((parent_id, parts[index].casefold()), [])
+                if len(matches) != 1:
+                    if len(matches) > 1:
+                        ambiguous.add(path)
+                    continue
+                learned[PATH_SEPARATOR.join(parts[:index + 1])] = matches[0]
+                if index + 1 == len(parts):
+                    found[path] = matches[0]
+                else:
+                    still_walking[path] = (parts, index + 1, matches[0])
+            self._put_many(learned)
+            walking = still_walking
+        return found, ambiguous
+
+    def _children(self, db: Session, pairs: Set[Tuple[Optional[int], str]]) -> Dict[tuple, List[int]]:
+        """(parent_id, casefolded name) -> live child ids; None as parent_id means the roots."""
+        children: Dict[tuple, List[int]] = {}
+        pairs = sorted(pairs, key=lambda pair: (pair[0] or 0, pair[1]))
+        for i in range(0, len(pairs), IN_CHUNK):
+            chunk = set(pairs[i:i + IN_CHUNK])
+            wanted = {(parent_id, name.casefold()) for parent_id, name in chunk}
+            names = sorted({name for _, name in chunk})
+            parent_ids = sorted({parent_id for parent_id, _ in chunk if parent_id is not None})
+            rows = []
+            if any(parent_id is None for parent_id, _ in chunk):
+                rows += db.execute(ROOT_CHILDREN, {"names": names}).all()
+                self.queries += 1
+            if parent_ids:
+                rows += db.execute(CHILDREN, {"parent_ids": parent_ids, "names": names}).all()
+                self.queries += 1
+            for node_id, parent_id, node_name in rows:
+                pair = (parent_id or None, node_name.casefold())
+                # the IN lists also match pairs that belong to other chunks
+                if pair in wanted:
+                    children.setdefault(pair, []).append(node_id)
+        return children
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._items)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "queries": self.queries,
+        }
+
+
+path_resolver = PathResolver()
@@ -0,0 +1,226 @@
+"""
+Read-replica routing for the node routes.
+
+DATABASE_REPLICA_URLS lists replica databases (comma-separated URLs, same
+form as DATABASE_URL). Read-only handlers take their session from
+get_read_db, which hands out replicas round-robin; write handlers take
+get_write_db, which always uses the primary. Both build on
+app.database.get_db, the primary session, so overriding that one dependency
+moves every node route. With no replicas configured both are the primary.
+
+Read-your-writes: a write marks its client sticky for REPLICA_STICKY_SECONDS,
+and a sticky client's reads go to the primary, so it sees its own writes
+even while the replicas catch up. Clients are recognised by the user of
+their bearer token (or login cookie), kept in a per-process TTL map; every
+write also sets a `read_primary_until` cookie, which covers anonymous
+clients and requests that land on another worker process.
+
+Health: a replica is probed (SELECT version FROM hierarchy_version) before
+use when its last check is older than REPLICA_CHECK_SECONDS. One request
+probes while the others go on with the last known status. Any failure of
+the probe, a replica whose hierarchy version trails the primary's by more
+than REPLICA_MAX_VERSION_LAG, or a database error during a request marks it
+down for REPLICA_RETRY_SECONDS; reads fall back to the primary while none is
+up. The request that hit the error still fails.
+
+The in-process caches (tree_cache, search_index, path_resolver) still load
+from the primary: they are shared by every client and invalidated by this
+process's writes, so filling them from a lagging replica would pin stale data.
+
+Only the sync routes are routed; with ASYNC_DATABASE_URL set, the async
+routes keep reading from the async (primary) engine.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.auth import TTLCache, connection_token, verify_token
+from app.database import SessionLocal, get_db, make_engine
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+REPLICA_MAX_VERSION_LAG = int(os.getenv("REPLICA_MAX_VERSION_LAG", "100"))
+REPLICA_STICKY_CLIENTS = int(os.getenv("REPLICA_STICKY_CLIENTS", "10000"))
+STICKY_COOKIE = "read_primary_until"
+
+logger = logging.getLogger("app.replicas")
+
+VERSION_PROBE = text("SELECT version FROM hierarchy_version WHERE id = 1")
+
+
+class Replica:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.healthy = True
+        self.checked_at = 0.0  # monotonic
+        self.failures = 0
+        self.probing = False
+
+
+class ReplicaSet:
+    def __init__(self, engines: List, primary_factory=SessionLocal,
+                 check_seconds: float = REPLICA_CHECK_SECONDS, retry_seconds: float = REPLICA_RETRY_SECONDS,
+                 max_version_lag: int = REPLICA_MAX_VERSION_LAG):
+        self.replicas = [Replica(f"replica-{i}", engine) for i, engine in enumerate(engines, start=1)]
+        self.primary_factory = primary_factory
+        self.check_seconds = check_seconds
+        self.retry_seconds = retry_seconds
+        self.max_version_lag = max_version_lag
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    # ---------- HEALTH ----------
+    def mark_down(self, replica: Replica, reason: str):
+        with self._lock:
+            if replica.healthy:
+                logger.warning("%s marked down: %s", replica.name, reason)
+            replica.healthy = False
+            replica.checked_at = time.monotonic()
+            replica.failures += 1
+
+    def _probe(self, replica: Replica) -> bool:
+        try:
+            with replica.engine.connect() as conn:
+                replica_version = conn.execute(VERSION_PROBE).scalar() or 0
+            primary = self.primary_factory()
+            try:
+                primary_version = primary.execute(VERSION_PROBE).scalar() or 0
+            finally:
+                primary.close()
+        except Exception as e:  # pool timeouts and socket errors count as down too
+            self.mark_down(replica, str(getattr(e, "orig", None) or e))
+            return False
+        if primary_version - replica_version > self.max_version_lag:
+            self.mark_down(replica, f"{primary_version - replica_version} versions behind")
+            return False
+        with self._lock:
+            if not replica.healthy:
+                logger.info("%s is back", replica.name)
+            replica.healthy = True
+            replica.checked_at = time.monotonic()
+        return True
+
+    def _usable(self, replica: Replica) -> bool:
+        age = time.monotonic() - replica.checked_at
+        if replica.healthy and age < self.check_seconds:
+            return True
+        if not replica.healthy and age < self.retry_seconds:
+            return False
+        with self._lock:
+            if replica.probing:
+                return replica.healthy
+            replica.probing = True
+        try:
+            return self._probe(replica)
+        finally:
+            replica.probing = False
+
+    # ---------- SESSIONS ----------
+    def read_session(self, fallback: Optional[Session] = None) -> Session:
+        """Session on the next usable replica, else fallback or a new primary session."""
+        count = len(self.replicas)
+        start = next(self._next)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if self._usable(replica):
+                self.replica_reads += 1
+                db = replica.session_factory()
+                db.info["replica"] = replica
+                return db
+        self.primary_reads += 1
+        return fallback if fallback is not None else self.primary_factory()
+
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+            "replicas": [{"name": r.name, "healthy": r.healthy, "failures": r.failures} for r in self.replicas],
+        }
+
+
+replica_set = ReplicaSet([make_engine(url) for url in DATABASE_REPLICA_URLS])
+
+
+sticky_clients = TTLCache(REPLICA_STICKY_CLIENTS)  # user -> True until the window ends
+
+
+def client_user(request: Request) -> Optional[str]:
+    """User of the request's token (see connection_token), if it carries a valid one."""
+    token = connection_token(request)
+    if not token:
+        return None
+    try:
+        return verify_token(token)["sub"]
+    except HTTPException:
+        return None
+
+
+def sticky(request: Request) -> bool:
+    """True while the client's last write is recent enough that replicas may not have it."""
+    user = client_user(request)
+    if user is not None and sticky_clients.get(user):
+        return True
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request, primary: Session = Depends(get_db)):
+    if not replica_set.replicas or sticky(request):
+        yield primary
+        return
+    db = replica_set.read_session(fallback=primary)
+    try:
+        yield db
+    except (SQLAlchemyError, OSError) as e:
+        replica = db.info.get("replica")
+        if replica is not None:
+            replica_set.mark_down(replica, str(getattr(e, "orig", None) or e))
+        raise
+    finally:
+        if db is not primary:
+            db.close()
+
+
+def get_write_db(request: Request, response: Response, db: Session = Depends(get_db)):
+    if not replica_set.replicas:
+        yield db
+        return
+    user = client_user(request)
+    response.set_cookie(STICKY_COOKIE, f"{time.time() + REPLICA_STICKY_SECONDS:.3f}",
+                        max_age=max(1, int(REPLICA_STICKY_SECONDS)), httponly=True, samesite="lax")
+    try:
+        yield db
+    finally:
+        # the window runs from the end of the write, however long it took
+        if user is not None:
+            sticky_clients.put(user, True, time.time() + REPLICA_STICKY_SECONDS)
+
+
+@contextmanager
+def primary_session(db: Session):
+    """db if it is on the primary, else a primary session for the block (cache loads)."""
+    if "replica" not in db.info:
+        yield db
+        return
+    primary = SessionLocal()
+    try:
+        yield primary
+    finally:
+        primary.close()
@@ -0,0 +1,175 @@
+"""
+Retention for soft-deleted nodes: hard-deletes subtrees that have been in the
+bin longer than DELETED_NODE_RETENTION_DAYS (0, the default, keeps them
+forever).
+
+Soft delete stamps deleted_at on the node and on descendants not already
+deleted; restore clears it. A node is purgeable once it and everything below
+it were deleted before the cutoff. purge() lists the purgeable nodes deepest
+first and deletes them PURGE_BATCH_SIZE at a time, each batch in its own
+short transaction followed by a PURGE_PAUSE_SECONDS pause. Deepest first
+means a batch never leaves a child behind its deleted parent, so every batch
+is a valid hard delete on its own. Each batch takes the hierarchy version
+(and with it the write lock, see app.change_log), re-checks its rows, and
+logs them as hard_delete for delta sync clients.
+
+Rows soft-deleted before deleted_at existed have none; purge() stamps them
+with the current time first, so they age out one retention period later.
+RetentionPurger runs purge() every PURGE_INTERVAL_SECONDS.
+
+    python -m app.retention purge [days]
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from app import change_log
+from app.change_feed import change_feed
+from app.models import NodeClosure, NodeData
+
+DELETED_NODE_RETENTION_DAYS = float(os.getenv("DELETED_NODE_RETENTION_DAYS", "0"))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+PURGE_PAUSE_SECONDS = float(os.getenv("PURGE_PAUSE_SECONDS", "0.05"))
+PURGE_INTERVAL_SECONDS = float(os.getenv("PURGE_INTERVAL_SECONDS", "3600"))
+
+logger = logging.getLogger("app.retention")
+
+node_table = NodeData.__table__
+closure_table = NodeClosure.__table__
+
+# deleted before the cutoff, with nothing below that is live or more recently deleted
+PURGEABLE = text("""
+    SELECT n.node_id, (SELECT MAX(c.depth) FROM node_closure c WHERE c.descendant_id = n.node_id) AS depth
+    FROM node_data n
+    WHERE n.is_deleted = 1 AND n.deleted_at < :cutoff
+      AND NOT EXISTS (
+          SELECT 1
+          FROM node_closure below
+          JOIN node_data d ON d.node_id = below.descendant_id
+          WHERE below.ancestor_id = n.node_id AND below.depth > 0
+            AND (d.is_deleted = 0 OR d.deleted_at IS NULL OR d.deleted_at >= :cutoff)
+      )
+    ORDER BY depth DESC, n.node_id
+""")
+
+
+def stamp_undated(db: Session, now: datetime, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Give deleted rows without deleted_at the current time, batch by batch; returns the count."""
+    stamped = 0
+    while True:
+        ids = list(db.execute(
+            select(node_table.c.node_id)
+            .where(node_table.c.is_deleted == True, node_table.c.deleted_at.is_(None))
+            .limit(batch_size)
+        ).scalars())
+        if not ids:
+            return stamped
+        db.execute(update(node_table).where(node_table.c.node_id.in_(ids)).values(deleted_at=now))
+        db.commit()
+        stamped += len(ids)
+
+
+def purge_batch(db: Session, ids: List[int], cutoff: datetime) -> int:
+    """Hard-delete ids that are still purgeable, in one transaction; returns rows deleted."""
+    version = change_log.next_version(db)  # hierarchy write lock until commit
+    ids = list(db.execute(
+        select(node_table.c.node_id).where(
+            node_table.c.node_id.in_(ids),
+            node_table.c.is_deleted == True,
+            node_table.c.deleted_at < cutoff,
+        )
+    ).scalars())
+    if ids:
+        change_log.record(db, version, "hard_delete", ids)
+        db.execute(delete(closure_table).where(
+            or_(closure_table.c.descendant_id.in_(ids), closure_table.c.ancestor_id.in_(ids))))
+        db.execute(delete(node_table).where(node_table.c.node_id.in_(ids)))
+    db.commit()
+    if ids:
+        change_feed.publish({"type": "purge", "node_ids": ids})
+    return len(ids)
+
+
+def purge(db: Session, retention_days: float = DELETED_NODE_RETENTION_DAYS,
+          batch_size: int = PURGE_BATCH_SIZE, pause: float = PURGE_PAUSE_SECONDS,
+          stop: Optional[threading.Event] = None) -> dict:
+    """Hard-delete soft-deleted subtrees older than retention_days in throttled batches."""
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    stamped = stamp_undated(db, now, batch_size)
+    cutoff = now - timedelta(days=retention_days)
+    candidates = [row.node_id for row in db.execute(PURGEABLE, {"cutoff": cutoff})]
+    db.commit()
+
+    purged = batches = 0
+    for i in range(0, len(candidates), batch_size):
+        if stop is not None and stop.is_set():
+            break
+        purged += purge_batch(db, candidates[i:i + batch_size], cutoff)
+        batches += 1
+        if pause and i + batch_size < len(candidates):
+            time.sleep(pause)
+    return {"purged": purged, "batches": batches, "stamped": stamped, "cutoff": cutoff.isoformat(),
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+class RetentionPurger:
+    def __init__(self, session_factory, interval: float = PURGE_INTERVAL_SECONDS,
+                 retention_days: float = DELETED_NODE_RETENTION_DAYS,
+                 batch_size: int = PURGE_BATCH_SIZE, pause: float = PURGE_PAUSE_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> dict:
+        db = self.session_factory()
+        try:
+            result = purge(db, self.retention_days, self.batch_size, self.pause, self._stop)
+            if result["purged"]:
+                logger.info("purged %d soft-deleted nodes in %d batches", result["purged"], result["batches"])
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-purger", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("retention purge failed")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, init_db
+
+    if len(sys.argv) < 2 or sys.argv[1] != "purge":
+        print("usage: python -m app.retention purge [days]")
+        sys.exit(2)
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else DELETED_NODE_RETENTION_DAYS
+    init_db()
+    print(RetentionPurger(SessionLocal, retention_days=days).run_once())
@@ -0,0 +1,398 @@
+"""
+Telemetry rollups: per-node min/max/avg/p95 of temperature, humidity and
+pressure at 1-minute, 1-hour and 1-day resolution, in node_reading_rollups.
+
+1-minute buckets are computed from raw node_readings, 1-hour buckets from
+1-minute rollups and 1-day buckets from 1-hour rollups, each as one NumPy
+pass: rows are lexsorted by (node, bucket) and reduced with ufunc.reduceat.
+min, max, sum (avg) and count merge exactly; p95 is exact (nearest rank) at
+1 minute and estimated for coarser buckets from their children's min, p95,
+max and counts (see mixture_p95).
+
+RollupMaintainer keeps them current as readings arrive: the ingestor hands
+it every flushed batch, touched minutes are marked dirty, and every
+ROLLUP_INTERVAL seconds dirty minutes are recomputed. An hour or day is
+written once it has closed, ROLLUP_GRACE seconds after its end to let late
+readings in; until then queries merge it on the fly from the finer level.
+
+    python -m app.rollups backfill [days]
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import and_, delete, insert, select, true
+
+from app.models import NodeReading, NodeReadingRollup
+
+logger = logging.getLogger("app.rollups")
+
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+FINER = {"1h": "1m", "1d": "1h"}
+COARSER = {"1m": "1h", "1h": "1d"}
+METRICS = ("temperature", "humidity", "pressure")
+STATS = ("min", "max", "sum", "p95")
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "5"))
+ROLLUP_GRACE = float(os.getenv("ROLLUP_GRACE", "120"))
+# keeps node id IN lists well under SQL Server's 2100 parameter limit
+NODE_CHUNK = 1000
+
+readings_table = NodeReading.__table__
+rollup_table = NodeReadingRollup.__table__
+STAT_COLUMNS = [f"{metric}_{stat}" for metric in METRICS for stat in STATS]
+EPOCH = datetime(1970, 1, 1)
+
+
+# ---------- TIME HELPERS ----------
+def to_epoch(values: Iterable[datetime]) -> np.ndarray:
+    return np.array(list(values), dtype="datetime64[s]").astype(np.int64)
+
+
+def epoch_of(value: datetime) -> int:
+    """Epoch seconds of value; naive datetimes are taken as UTC like recorded_at."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - EPOCH).total_seconds())
+
+
+def from_epoch(seconds: int) -> datetime:
+    return datetime.utcfromtimestamp(int(seconds))
+
+
+def floor_to(seconds: float, size: int) -> int:
+    return int(seconds // size * size)
+
+
+def closed_until(resolution: str, now: float, grace: float = ROLLUP_GRACE) -> float:
+    """Buckets starting before this have ended at least grace seconds ago."""
+    if resolution == "1m":
+        return float("inf")
+    return floor_to(now - grace, RESOLUTIONS[resolution])
+
+
+# ---------- VECTORIZED AGGREGATION ----------
+def empty_rollup() -> Dict[str, np.ndarray]:
+    arrays = {"node_id": np.empty(0, np.int64), "bucket": np.empty(0, np.int64), "count": np.empty(0, np.int64)}
+    arrays.update({name: np.empty(0, np.float64) for name in STAT_COLUMNS})
+    return arrays
+
+
+def group_starts(node_ids: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+    """Index where each (node, bucket) run starts in arrays sorted by node then bucket."""
+    change = np.empty(len(node_ids), dtype=bool)
+    change[:1] = True
+    change[1:] = (node_ids[1:] != node_ids[:-1]) | (buckets[1:] != buckets[:-1])
+    return np.flatnonzero(change)
+
+
+def aggregate_raw(raw: Dict[str, np.ndarray], size: int) -> Dict[str, np.ndarray]:
+    """Roll raw readings (node_id, time, one array per metric) up into size-second buckets."""
+    if not len(raw["node_id"]):
+        return empty_rollup()
+    buckets = raw["time"] // size * size
+    order = np.lexsort((buckets, raw["node_id"]))
+    node_ids, buckets = raw["node_id"][order], buckets[order]
+    starts = group_starts(node_ids, buckets)
+    counts = np.diff(np.append(starts, len(node_ids)))
+    # nearest-rank p95 position inside each run once its values are sorted
+    p95_at = starts + np.ceil(counts * 0.95).astype(np.int64) - 1
+
+    out = {"node_id": node_ids[starts], "bucket": buckets[starts], "count": counts}
+    for metric in METRICS:
+        values = raw[metric][order]
+        out[f"{metric}_min"] = np.minimum.reduceat(values, starts)
+        out[f"{metric}_max"] = np.maximum.reduceat(values, starts)
+        out[f"{metric}_sum"] = np.add.reduceat(values, starts)
+        # runs keep their positions when re-sorted by (node, bucket, value)
+        out[f"{metric}_p95"] = values[np.lexsort((values, buckets, node_ids))][p95_at]
+    return out
+
+
+def merge_rollups(finer: Dict[str, np.ndarray], size: int) -> Dict[str, np.ndarray]:
+    """Combine finer rollups into size-second buckets."""
+    if not len(finer["node_id"]):
+        return empty_rollup()
+    buckets = finer["bucket"] // size * size
+    order = np.lexsort((buckets, finer["node_id"]))
+    node_ids, buckets = finer["node_id"][order], buckets[order]
+    counts = finer["count"][order]
+    starts = group_starts(node_ids, buckets)
+    totals = np.add.reduceat(counts, starts)
+
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(node_ids))))
+
+    out = {"node_id": node_ids[starts], "bucket": buckets[starts], "count": totals}
+    for metric in METRICS:
+        mins = finer[f"{metric}_min"][order]
+        maxs = finer[f"{metric}_max"][order]
+        out[f"{metric}_min"] = np.minimum.reduceat(mins, starts)
+        out[f"{metric}_max"] = np.maximum.reduceat(maxs, starts)
+        out[f"{metric}_sum"] = np.add.reduceat(finer[f"{metric}_sum"][order], starts)
+        out[f"{metric}_p95"] = mixture_p95(
+            group, starts, counts, totals, mins, finer[f"{metric}_p95"][order], maxs,
+            out[f"{metric}_min"], out[f"{metric}_max"],
+        )
+    return out
+
+
+def mixture_p95(group, starts, counts, totals, mins, p95s, maxs, lo, hi, iterations: int = 40):
+    """
+    p95 of each group of child buckets, modelling every child's distribution as
+    piecewise linear through (min, 0), (p95, 0.95) and (max, 1) and bisecting,
+    for all groups at once, on the point where the count-weighted mixture
+    reaches 95%. Exact when children hold single readings.
+    """
+    target = 0.95 * totals
+    low_span = np.where(p95s > mins, p95s - mins, 1.0)
+    high_span = np.where(maxs > p95s, maxs - p95s, 1.0)
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        x = mid[group]
+        cdf = np.where(x >= maxs, 1.0,
+              np.where(x >= p95s, 0.95 + 0.05 * (x - p95s) / high_span,
+              np.where(x >= mins, 0.95 * (x - mins) / low_span, 0.0)))
+        below = np.add.reduceat(cdf * counts, starts) < target
+        lo = np.where(below, mid, lo)
+        hi = np.where(below, hi, mid)
+    return hi
+
+
+def concat(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+# ---------- STORAGE ----------
+def node_filter(column, node_ids: Optional[List[int]]):
+    return column.in_(node_ids) if node_ids is not None else true()
+
+
+def fetch_raw(db, node_ids: Optional[List[int]], lo: int, hi: int) -> Dict[str, np.ndarray]:
+    rows = db.execute(
+        select(readings_table.c.node_id, readings_table.c.recorded_at,
+               *(readings_table.c[metric] for metric in METRICS))
+        .where(and_(
+            node_filter(readings_table.c.node_id, node_ids),
+            readings_table.c.recorded_at >= from_epoch(lo),
+            readings_table.c.recorded_at < from_epoch(hi),
+        ))
+    ).fetchall()
+    columns = list(zip(*rows)) or [[]] * (2 + len(METRICS))
+    raw = {"node_id": np.array(columns[0], dtype=np.int64), "time": to_epoch(columns[1])}
+    for i, metric in enumerate(METRICS):
+        raw[metric] = np.array(columns[2 + i], dtype=np.float64)
+    return raw
+
+
+def fetch_rollups(db, resolution: str, node_ids: Optional[List[int]], lo: int, hi: int) -> Dict[str, np.ndarray]:
+    rows = db.execute(
+        select(rollup_table.c.node_id, rollup_table.c.bucket_start, rollup_table.c.sample_count,
+               *(rollup_table.c[name] for name in STAT_COLUMNS))
+        .where(and_(
+            node_filter(rollup_table.c.node_id, node_ids),
+            rollup_table.c.resolution == resolution,
+            rollup_table.c.bucket_start >= from_epoch(lo),
+            rollup_table.c.bucket_start < from_epoch(hi),
+        ))
+        .order_by(rollup_table.c.node_id, rollup_table.c.bucket_start)
+    ).fetchall()
+    if not rows:
+        return empty_rollup()
+    columns = list(zip(*rows))
+    out = {
+        "node_id": np.array(columns[0], dtype=np.int64),
+        "bucket": to_epoch(columns[1]),
+        "count": np.array(columns[2], dtype=np.int64),
+    }
+    for i, name in enumerate(STAT_COLUMNS):
+        out[name] = np.array(columns[3 + i], dtype=np.float64)
+    return out
+
+
+def replace_rollups(db, resolution: str, node_ids: Optional[List[int]], lo: int, hi: int,
+                    rollup: Dict[str, np.ndarray]):
+    db.execute(delete(rollup_table).where(and_(
+        node_filter(rollup_table.c.node_id, node_ids),
+        rollup_table.c.resolution == resolution,
+        rollup_table.c.bucket_start >= from_epoch(lo),
+        rollup_table.c.bucket_start < from_epoch(hi),
+    )))
+    if not len(rollup["node_id"]):
+        return
+    columns = {name: rollup[name].tolist() for name in STAT_COLUMNS}
+    db.execute(insert(rollup_table), [
+        {
+            "node_id": node_id,
+            "resolution": resolution,
+            "bucket_start": from_epoch(bucket),
+            "sample_count": count,
+            **{name: columns[name][i] for name in STAT_COLUMNS},
+        }
+        for i, (node_id, bucket, count) in enumerate(zip(
+            rollup["node_id"].tolist(), rollup["bucket"].tolist(), rollup["count"].tolist()
+        ))
+    ])
+
+
+def compute(db, resolution: str, node_ids: Optional[List[int]], lo: int, hi: int) -> int:
+    """Recompute and store resolution buckets in [lo, hi); returns how many were written."""
+    size = RESOLUTIONS[resolution]
+    if resolution == "1m":
+        rollup = aggregate_raw(fetch_raw(db, node_ids, lo, hi), size)
+    else:
+        rollup = merge_rollups(fetch_rollups(db, FINER[resolution], node_ids, lo, hi), size)
+    replace_rollups(db, resolution, node_ids, lo, hi, rollup)
+    return len(rollup["node_id"])
+
+
+def backfill(db, lo: int, hi: int):
+    """Rebuild every resolution for all nodes between lo and hi (epoch seconds)."""
+    for resolution, size in RESOLUTIONS.items():
+        compute(db, resolution, None, floor_to(lo, size), floor_to(hi + size - 1, size))
+
+
+# ---------- QUERY ----------
+def pick_resolution(lo: float, hi: float, points: int, max_points: int) -> str:
+    """Coarsest resolution that still yields at least points buckets over [lo, hi).
+
+    Only resolutions with at most max_points buckets are considered; when none
+    of them reaches points, the finest of them wins.
+    """
+    allowed = [r for r in ("1m", "1h", "1d") if (hi - lo) / RESOLUTIONS[r] <= max_points]
+    for resolution in reversed(allowed):
+        if (hi - lo) / RESOLUTIONS[resolution] >= points:
+            return resolution
+    return allowed[0] if allowed else "1d"
+
+
+def series(db, node_id: int, resolution: str, lo: int, hi: int, now: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Buckets of one node; those not yet closed are merged from the finer level."""
+    now = time.time() if now is None else now
+    size = RESOLUTIONS[resolution]
+    lo = floor_to(lo, size)
+    boundary = int(min(max(closed_until(resolution, now), lo), hi))
+    stored = fetch_rollups(db, resolution, [node_id], lo, boundary)
+    if boundary >= hi:
+        return stored
+    tail = merge_rollups(series(db, node_id, FINER[resolution], boundary, hi, now), size)
+    return concat([stored, tail])
+
+
+def to_points(rollup: Dict[str, np.ndarray]) -> List[dict]:
+    columns = {name: rollup[name].tolist() for name in STAT_COLUMNS}
+    points = []
+    for i, (bucket, count) in enumerate(zip(rollup["bucket"].tolist(), rollup["count"].tolist())):
+        point = {"time": from_epoch(bucket).isoformat(), "count": count}
+        for metric in METRICS:
+            point[metric] = {
+                "min": columns[f"{metric}_min"][i],
+                "max": columns[f"{metric}_max"][i],
+                "avg": columns[f"{metric}_sum"][i] / count,
+                "p95": columns[f"{metric}_p95"][i],
+            }
+        points.append(point)
+    return points
+
+
+# ---------- INCREMENTAL MAINTENANCE ----------
+def runs(buckets: Dict[int, set], size: int):
+    """Group dirty buckets into contiguous (lo, hi, node ids) ranges."""
+    current = None
+    for bucket in sorted(buckets):
+        if current and bucket == current[1]:
+            current[1] = bucket + size
+            current[2] |= buckets[bucket]
+        else:
+            if current:
+                yield current
+            current = [bucket, bucket + size, set(buckets[bucket])]
+    if current:
+        yield current
+
+
+class RollupMaintainer:
+    def __init__(self, engine, interval: float = ROLLUP_INTERVAL, grace: float = ROLLUP_GRACE):
+        self.engine = engine
+        self.interval = interval
+        self.grace = grace
+        self.dirty = {resolution: defaultdict(set) for resolution in RESOLUTIONS}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.buckets_written = 0
+        self.last_refresh_seconds = 0.0
+
+    def on_readings(self, rows: List[dict]):
+        """Ingestor listener: mark the minutes these readings fall into."""
+        minutes = (to_epoch(row["recorded_at"] for row in rows) // 60 * 60).tolist()
+        with self._lock:
+            dirty = self.dirty["1m"]
+            for minute, row in zip(minutes, rows):
+                dirty[minute].add(row["node_id"])
+
+    def refresh(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        for resolution, size in RESOLUTIONS.items():
+            limit = closed_until(resolution, now, self.grace)
+            with self._lock:
+                pending = self.dirty[resolution]
+                ready = {bucket: pending.pop(bucket) for bucket in [b for b in pending if b < limit]}
+            if not ready:
+                continue
+            with self.engine.begin() as conn:
+                for lo, hi, nodes in runs(ready, size):
+                    ordered = sorted(nodes)
+                    for i in range(0, len(ordered), NODE_CHUNK):
+                        self.buckets_written += compute(conn, resolution, ordered[i:i + NODE_CHUNK], lo, hi)
+            coarser = COARSER.get(resolution)
+            if coarser:
+                parent_size = RESOLUTIONS[coarser]
+                with self._lock:
+                    for bucket, nodes in ready.items():
+                        self.dirty[coarser][floor_to(bucket, parent_size)] |= nodes
+        self.refreshes += 1
+        self.last_refresh_seconds = time.perf_counter() - start
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-maintainer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.refresh()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("rollup refresh failed")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, init_db
+
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print("usage: python -m app.rollups backfill [days]")
+        sys.exit(2)
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    init_db()
+    db = SessionLocal()
+    try:
+        now = time.time()
+        backfill(db, int(now - days * 86400), int(now))
+        db.commit()
+        print(f"rollups rebuilt for the last {days:g} days")
+    finally:
+        db.close()
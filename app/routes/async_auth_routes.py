@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import User
+from app.schemas import UserCreate, UserLogin
+from app.auth import (
+    hash_password_async,
+    verify_password_async,
+    create_access_token,
+    invalidate_user,
+)
+
+router = APIRouter(tags=["Auth"])
+
+
+# -------- REGISTER --------
+@router.post("/register")
+async def register_async(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = (await db.execute(
+        select(User).where(User.username == user.username)
+    )).scalars().first()
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Username already exists")
+
+    hashed_pw = await hash_password_async(user.password)
+    new_user = User(username=user.username, hashed_password=hashed_pw)
+    db.add(new_user)
+    await db.commit()
+    invalidate_user(new_user.username)  # it may be cached as unknown
+
+    token = create_access_token({"sub": new_user.username})
+    return {"access_token": token, "token_type": "bearer"}
+
+
+# -------- LOGIN --------
+@router.post("/token")
+async def login_async(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(
+        select(User).where(User.username == user.username)
+    )).scalars().first()
+
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await verify_password_async(user.password, db_user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
+    token = create_access_token({"sub": db_user.username})
+    return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,176 @@
+"""
+Async counterparts of the node routes, served when ASYNC_DATABASE_URL is set.
+
+The handlers run the sync implementations from node_routes on the async
+session through AsyncSession.run_sync, so each request waits on a pooled
+connection instead of pinning a threadpool thread, and the two paths cannot
+drift apart.
+"""
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+from app.database import get_async_db
+from app.schemas import BatchRequest, NodeCreate, NodeMove, NodeResponse, PathResolveRequest, NodeTreeResponse, NodeSubtreeResponse, DeletedNodeTree
+from app.auth import get_current_user
+from app.tree_cache import tree_cache
+from app.routes import node_routes
+from app import change_log
+
+router = APIRouter()
+
+
+@router.get("/nodes", response_model=List[NodeResponse])
+async def get_nodes_async(request: Request,
+                          response: Response,
+                          after: Optional[int] = Query(None, description="Return nodes with node_id greater than this cursor"),
+                          limit: Optional[int] = Query(None, ge=1, le=10000),
+                          is_deleted: Optional[bool] = None,
+                          parent_id: Optional[int] = None,
+                          format: str = Query("json", regex="^(json|ndjson|json-stream)$"),
+                          db: AsyncSession = Depends(get_async_db)):
+    if format != "json":
+        query = node_routes.node_list_query(after, is_deleted, parent_id)
+        if limit is not None:
+            query = query.limit(limit)
+        # read before the rows, see get_nodes
+        version = str((await db.run_sync(change_log.current))[0])
+        rows = node_routes.stream_nodes_own_session(request, query, format)
+        return node_routes.node_stream_response(rows, format, version)
+    return await db.run_sync(lambda session: node_routes.get_nodes(
+        response, after, limit, is_deleted, parent_id, format, session
+    ))
+
+
+@router.get("/nodes/changes")
+async def get_node_changes_async(since: int = Query(..., ge=0),
+                                 db: AsyncSession = Depends(get_async_db),
+                                 current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.get_node_changes(since, session, current_user))
+
+
+@router.get("/nodes/tree", response_model=List[NodeTreeResponse])
+async def get_nodes_tree_async(request: Request,
+                               db: AsyncSession = Depends(get_async_db),
+                               current_user: str = Depends(get_current_user)):
+    tree_cache.observe((await db.run_sync(change_log.current))[0])
+    etag = tree_cache.not_modified_etag(request.headers.get("if-none-match"))
+    if etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body, etag = await tree_cache.aget(lambda: db.run_sync(node_routes.serialize_nodes_tree))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/nodes/roots", response_model=List[NodeSubtreeResponse])
+async def get_root_subtrees_async(depth: int = Query(1, ge=0, le=50),
+                                  db: AsyncSession = Depends(get_async_db),
+                                  current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.get_root_subtrees(
+        depth, session, current_user
+    ))
+
+
+@router.get("/nodes/{node_id}/subtree", response_model=NodeSubtreeResponse)
+async def get_node_subtree_async(node_id: int,
+                                 depth: int = Query(1, ge=0, le=50),
+                                 db: AsyncSession = Depends(get_async_db),
+                                 current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.get_node_subtree(
+        node_id, depth, session, current_user
+    ))
+
+
+@router.get("/nodes/{node_id}/live-summary")
+async def get_node_live_summary_async(node_id: int,
+                                      max_age: Optional[float] = Query(None, gt=0),
+                                      db: AsyncSession = Depends(get_async_db),
+                                      current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.get_node_live_summary(
+        node_id, max_age, session, current_user
+    ))
+
+
+@router.get("/nodes/{node_id}/metrics")
+async def get_node_metrics_async(node_id: int,
+                                 from_: datetime = Query(..., alias="from"),
+                                 to: Optional[datetime] = None,
+                                 resolution: str = Query("auto", regex="^(auto|1m|1h|1d)$"),
+                                 points: int = Query(300, ge=1, le=node_routes.MAX_METRIC_POINTS),
+                                 db: AsyncSession = Depends(get_async_db),
+                                 current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.get_node_metrics(
+        node_id, from_, to, resolution, points, session, current_user
+    ))
+
+
+@router.post("/nodes", response_model=NodeResponse)
+async def create_node_async(node: NodeCreate,
+                            db: AsyncSession = Depends(get_async_db),
+                            current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.create_node(node, session, current_user))
+
+
+@router.post("/nodes/batch")
+async def run_batch_async(request: BatchRequest,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.run_batch(request, session, current_user))
+
+
+@router.post("/nodes/{node_id}/move")
+async def move_node_async(node_id: int,
+                          move: NodeMove,
+                          db: AsyncSession = Depends(get_async_db),
+                          current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.move_node(node_id, move, session, current_user))
+
+
+@router.put("/nodes/{node_id}", response_model=NodeResponse)
+async def update_node_async(node_id: int, node: NodeCreate, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: node_routes.update_node(node_id, node, session))
+
+
+@router.put("/nodes/restore/{node_id}", response_model=NodeResponse)
+async def restore_node_async(node_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: node_routes.restore_node(node_id, session))
+
+
+@router.delete("/nodes/{node_id}")
+async def delete_node_async(node_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: node_routes.delete_node(node_id, session))
+
+
+@router.delete("/hard-nodes/{node_id}")
+async def hard_delete_node_async(node_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: node_routes.hard_delete_node(node_id, session))
+
+
+@router.get("/nodes/by-path")
+async def get_node_by_path_async(path: str = Query(..., min_length=1),
+                                 db: AsyncSession = Depends(get_async_db),
+                                 current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.get_node_by_path(path, session, current_user))
+
+
+@router.post("/nodes/resolve")
+async def resolve_paths_async(request: PathResolveRequest,
+                              db: AsyncSession = Depends(get_async_db),
+                              current_user: str = Depends(get_current_user)):
+    return await db.run_sync(lambda session: node_routes.resolve_paths(request, session, current_user))
+
+
+@router.get("/nodes/search")
+async def search_nodes_async(q: str = Query(..., min_length=1),
+                             limit: int = Query(20, ge=1, le=200),
+                             offset: int = Query(0, ge=0),
+                             under: Optional[str] = None,
+                             db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: node_routes.search_nodes(q, limit, offset, under, session))
+
+
+@router.get("/nodes/deleted-trees", response_model=List[DeletedNodeTree])
+async def get_deleted_trees_async(after: Optional[int] = Query(None),
+                                  limit: int = Query(node_routes.DELETED_TREES_PAGE_SIZE, ge=1, le=1000),
+                                  db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(lambda session: node_routes.get_deleted_trees(after, limit, session))
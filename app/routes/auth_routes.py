@@ -1,44 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from fastapi.security import OAuth2PasswordBearer
-from app.database import SessionLocal
+from app.database import get_db
 from app.models import User
 from app.schemas import UserCreate, UserLogin
 from app.auth import (
-    hash_password,
-    verify_password,
-    create_access_token
+    hash_password_async,
+    verify_password_async,
+    create_access_token,
+    get_current_user,
+    invalidate_user,
+    token_cache,
+    user_cache,
 )
-from jose import JWTError, jwt
-from datetime import timedelta
+from app.hashing import hash_pool
 
 router = APIRouter(tags=["Auth"])
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
-
-SECRET_KEY = "your_super_secret_key_here"
-ALGORITHM = "HS256"
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# -------- REGISTER --------
+# Register and login are async so that, while bcrypt runs on the hashing
+# pool, they hold no worker thread; their DB work goes to the threadpool.
+def find_user(db: Session, username: str):
+    user = db.query(User).filter(User.username == username).first()
+    # hand the connection back to the pool while bcrypt runs; the loaded user
+    # stays usable and save_user re-attaches it
+    db.close()
+    return user
+
+
+def save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
 
 
-# -------- REGISTER --------
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    existing_user = await run_in_threadpool(find_user, db, user.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     new_user = User(username=user.username, hashed_password=hashed_pw)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(save_user, db, new_user)
+    invalidate_user(new_user.username)  # it may be cached as unknown
 
     # Return token in JSON instead of cookie
     token = create_access_token({"sub": new_user.username})
@@ -47,25 +51,24 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 # -------- LOGIN --------
 @router.post("/token")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(find_user, db, user.username)
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    valid, new_hash = await verify_password_async(user.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # stored with an outdated bcrypt cost; upgrade while we have the password
+        db_user.hashed_password = new_hash
+        await run_in_threadpool(save_user, db, db_user)
 
     token = create_access_token({"sub": db_user.username})
     return {"access_token": token, "token_type": "bearer"}
 
 
-# -------- CURRENT USER HELPER --------
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
-        return username
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+# -------- AUTH CACHE STATS --------
+@router.get("/auth/cache-stats")
+def get_auth_cache_stats(current_user: str = Depends(get_current_user)):
+    return {"tokens": token_cache.stats(), "users": user_cache.stats(), "hashing": hash_pool.stats()}
@@ -0,0 +1,79 @@
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from app.auth import get_current_user, get_stream_user
+from app.change_feed import FEED_HEARTBEAT_SECONDS, change_feed
+
+router = APIRouter(tags=["Nodes"])
+
+
+def control_event(kind: str, token: str) -> str:
+    return json.dumps({"type": kind, "token": token}, separators=(",", ":"))
+
+
+# -------- SERVER-SENT EVENTS --------
+@router.get("/nodes/events")
+async def stream_node_events(token: Optional[str] = Query(None, description="Resume after this token"),
+                             last_event_id: Optional[str] = Header(None),
+                             current_user: str = Depends(get_stream_user)):
+    subscription, resync = change_feed.subscribe(token or last_event_id)
+
+    async def events():
+        try:
+            yield "retry: 2000\n\n"
+            if resync:
+                yield f"event: resync\ndata: {control_event('resync', subscription.resume_token)}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.get(), FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    yield f"event: evicted\ndata: {control_event('evicted', subscription.resume_token)}\n\n"
+                    return
+                event_token, data = item
+                yield f"id: {event_token}\ndata: {data}\n\n"
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# -------- WEBSOCKET --------
+@router.websocket("/nodes/events/ws")
+async def node_events_socket(websocket: WebSocket, token: Optional[str] = None):
+    try:
+        get_stream_user(websocket)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription, resync = change_feed.subscribe(token)
+    try:
+        if resync:
+            await websocket.send_text(control_event("resync", subscription.resume_token))
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.get(), FEED_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_text(control_event("ping", subscription.resume_token))
+                continue
+            if item is None:
+                await websocket.send_text(control_event("evicted", subscription.resume_token))
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(item[1])
+    except WebSocketDisconnect:
+        pass
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+@router.get("/nodes/events/stats")
+def get_feed_stats(current_user: str = Depends(get_current_user)):
+    return change_feed.stats()
@@ -1,69 +1,257 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, requests
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, requests
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+import json
+import time
+from datetime import datetime
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import SessionLocal
-from app.models import NodeData
-from app.schemas import NodeCreate, NodeResponse, NodeTreeResponse, DeletedNodeTree
+from typing import List, Optional
+from app.database import get_db
+from app.models import NodeClosure, NodeData
+from app.schemas import BatchRequest, NodeCreate, NodeMove, NodeResponse, PathResolveRequest, NodeTreeResponse, NodeSubtreeResponse, DeletedNodeTree
 from app.crud import get_descendants
+from app import hierarchy, bulk, rollups, change_log, batch
 from fastapi import APIRouter, Depends
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from typing import List
 from urllib.parse import unquote_plus
-from sqlalchemy import text, bindparam
+from sqlalchemy import text, bindparam, update, delete, insert, select, or_, func
 from fastapi import Depends
 from app.auth import get_current_user
+from app.tree_cache import tree_cache
+from app.search_index import search_index
+from app.live_readings import live_readings
+from app.change_feed import change_feed
+from app.path_resolver import path_resolver
+from app.replicas import get_read_db, get_write_db, primary_session, replica_set
+from app.tree_arrays import TreeArrays, encode_bool, encode_datetime, encode_int, encode_str
 router = APIRouter()
 
+node_table = NodeData.__table__
+
+
+STREAM_BATCH_SIZE = 1000
+
+
+def node_list_query(after: Optional[int], is_deleted: Optional[bool], parent_id: Optional[int]):
+    query = select(NodeData.__table__).order_by(NodeData.node_id)
+    if after is not None:
+        query = query.where(NodeData.node_id > after)
+    if is_deleted is not None:
+        query = query.where(NodeData.is_deleted == is_deleted)
+    if parent_id is not None:
+        query = query.where(NodeData.parent_id == parent_id)
+    return query
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def stream_nodes(query, fmt: str, db: Session):
+    """Yield rows from a server-side cursor in batches, as NDJSON lines or one JSON array."""
+    result = db.execute(
+        query.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+    )
+    first = True
+    if fmt == "json-stream":
+        yield "["
+    for batch in result.mappings().partitions():
+        if fmt == "ndjson":
+            yield "".join(json.dumps(dict(row), default=encode_value) + "\n" for row in batch)
+        else:
+            chunk = ",".join(json.dumps(dict(row), default=encode_value) for row in batch)
+            yield chunk if first else "," + chunk
+            first = False
+    if fmt == "json-stream":
+        yield "]"
+
 
-def get_db():
-    db = SessionLocal()
+def stream_nodes_own_session(request: Request, query, fmt: str):
+    """stream_nodes() on a session of its own from get_db, as overridden on the app.
+
+    For the async routes, whose session cannot be read from the thread that
+    sends a streamed body."""
+    sessions = request.app.dependency_overrides.get(get_db, get_db)()
+    db = next(sessions)
     try:
-        yield db
+        yield from stream_nodes(query, fmt, db)
     finally:
-        db.close()
+        sessions.close()
+
+
+def node_stream_response(rows, fmt: str, version: str) -> StreamingResponse:
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return StreamingResponse(rows, media_type=media_type, headers={"X-Hierarchy-Version": version})
 
 
 @router.get("/nodes", response_model=List[NodeResponse])
-def get_nodes(db: Session = Depends(get_db)):
-    query = text("SELECT * FROM node_data;")
-    result = db.execute(query)
-    nodes = result.fetchall()
-    return [dict(row._mapping) for row in nodes]
+def get_nodes(response: Response,
+              after: Optional[int] = Query(None, description="Return nodes with node_id greater than this cursor"),
+              limit: Optional[int] = Query(None, ge=1, le=10000),
+              is_deleted: Optional[bool] = None,
+              parent_id: Optional[int] = None,
+              format: str = Query("json", regex="^(json|ndjson|json-stream)$"),
+              db: Session = Depends(get_read_db)):
+    query = node_list_query(after, is_deleted, parent_id)
+    # read before the rows, so a delta sync from this version cannot miss a change
+    version = str(change_log.current(db)[0])
+
+    if format != "json":
+        if limit is not None:
+            query = query.limit(limit)
+        # db (see get_read_db) stays open until the response has been sent
+        return node_stream_response(stream_nodes(query, format, db), format, version)
+
+    response.headers["X-Hierarchy-Version"] = version
+
+    if limit is not None:
+        query = query.limit(limit + 1)
+    nodes = [dict(row._mapping) for row in db.execute(query).fetchall()]
+    if limit is not None and len(nodes) > limit:
+        nodes = nodes[:limit]
+        response.headers["X-Next-Cursor"] = str(nodes[-1]["node_id"])
+    return nodes
+
+
+@router.get("/nodes/changes")
+def get_node_changes(since: int = Query(..., ge=0, description="Hierarchy version the client already has"),
+                     db: Session = Depends(get_read_db),
+                     current_user: str = Depends(get_current_user)):
+    return change_log.changes_since(db, since)
+
+
+def load_tree_arrays(db: Session) -> TreeArrays:
+    # literal is_deleted = 0 so SQLite can use the partial ix_node_data_live
+    return TreeArrays.from_rows(db.execute(text("""
+        SELECT node_id, parent_id, node_name
+        FROM node_data
+        WHERE is_deleted = 0
+        ORDER BY node_id
+    """)))
+
+
+def serialize_nodes_tree(db: Session) -> bytes:
+    """/nodes/tree body (NodeTreeResponse objects) written straight from the tree arrays."""
+    tree = load_tree_arrays(db)
+    return tree.dumps([
+        ("node_id", tree.node_ids, encode_int),
+        ("node_name", tree.names, encode_str),
+        ("parent_id", tree.parent_ids, encode_int),
+        ("children_count", tree.descendant_counts(), encode_int),
+    ], constants={"is_deleted": False})
+
+
+def subtree_columns(tree: TreeArrays, nodes: List[dict]) -> list:
+    """NodeSubtreeResponse fields for rows from hierarchy.load_subtrees."""
+    return [
+        ("node_id", tree.node_ids, encode_int),
+        ("node_name", tree.names, encode_str),
+        ("parent_id", tree.parent_ids, encode_int),
+        ("children_count", [n["children_count"] for n in nodes], encode_int),
+        ("is_deleted", [n["is_deleted"] for n in nodes], encode_bool),
+        ("has_children", [n["has_children"] for n in nodes], encode_bool),
+    ]
+
+
+def subtree_arrays(nodes: List[dict]) -> TreeArrays:
+    return TreeArrays([n["node_id"] for n in nodes], [n["parent_id"] for n in nodes],
+                      [n["node_name"] for n in nodes])
 
 
 @router.get("/nodes/tree", response_model=List[NodeTreeResponse])
-def get_nodes_tree(db: Session = Depends(get_db),current_user: str = Depends(get_current_user)):
-    query = text("SELECT * FROM node_data WHERE is_deleted = 0;")
-    result = db.execute(query)
-    nodes = [dict(row._mapping) for row in result.fetchall()]
-    node_map = {n["node_id"]: {**n, "children": [],
-                               "children_count": 0} for n in nodes}
-    tree = []
-
-    for n in node_map.values():
-        parent_id = n.get("parent_id")
-        if parent_id and parent_id in node_map:
-            node_map[parent_id]["children"].append(n)
-        else:
-            tree.append(n)
+def get_nodes_tree(request: Request,
+                   db: Session = Depends(get_read_db),
+                   current_user: str = Depends(get_current_user)):
+    with primary_session(db) as primary:
+        # one indexed read, so writes made through other workers invalidate this one's copy
+        tree_cache.observe(change_log.current(primary)[0])
+        etag = tree_cache.not_modified_etag(request.headers.get("if-none-match"))
+        if etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        body, etag = tree_cache.get(lambda: serialize_nodes_tree(primary))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/nodes/tree/cache-stats")
+def get_tree_cache_stats(current_user: str = Depends(get_current_user)):
+    return tree_cache.stats()
+
+
+@router.get("/nodes/roots", response_model=List[NodeSubtreeResponse])
+def get_root_subtrees(depth: int = Query(1, ge=0, le=50),
+                      db: Session = Depends(get_read_db),
+                      current_user: str = Depends(get_current_user)):
+    root_ids = select(NodeData.node_id).where(
+        or_(NodeData.parent_id.is_(None), NodeData.parent_id == 0)
+    )
+    nodes = hierarchy.load_subtrees(db, root_ids, depth)
+    tree = subtree_arrays(nodes)
+    return Response(content=tree.dumps(subtree_columns(tree, nodes)), media_type="application/json")
+
+
+@router.get("/nodes/{node_id}/subtree", response_model=NodeSubtreeResponse)
+def get_node_subtree(node_id: int,
+                     depth: int = Query(1, ge=0, le=50),
+                     db: Session = Depends(get_read_db),
+                     current_user: str = Depends(get_current_user)):
+    nodes = hierarchy.load_subtrees(db, [node_id], depth)
+    tree = subtree_arrays(nodes)
+    top = [i for i in tree.roots if tree.node_ids[i] == node_id]
+    if not top:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return Response(content=tree.dumps_one(subtree_columns(tree, nodes), top[0]), media_type="application/json")
 
-    def count_children(node):
-        if not node["children"]:
-            node["children_count"] = 0
-            return 0
 
-        total = 0
-        for child in node["children"]:
-            total += 1 + count_children(child)
-        node["children_count"] = total
-        return total
 
-    for root in tree:
-        count_children(root)
+@router.get("/nodes/{node_id}/live-summary")
+def get_node_live_summary(node_id: int,
+                          max_age: Optional[float] = Query(None, gt=0, description="Ignore sensors silent for longer than this many seconds"),
+                          db: Session = Depends(get_db),
+                          current_user: str = Depends(get_current_user)):
+    summary = live_readings.summary(db, node_id, max_age)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return summary
+
+
+MAX_METRIC_POINTS = 10000
+
+
+@router.get("/nodes/{node_id}/metrics")
+def get_node_metrics(node_id: int,
+                     from_: datetime = Query(..., alias="from"),
+                     to: Optional[datetime] = None,
+                     resolution: str = Query("auto", regex="^(auto|1m|1h|1d)$"),
+                     points: int = Query(300, ge=1, le=MAX_METRIC_POINTS,
+                                         description="Target point count used to pick a resolution"),
+                     db: Session = Depends(get_read_db),
+                     current_user: str = Depends(get_current_user)):
+    lo = rollups.epoch_of(from_)
+    hi = rollups.epoch_of(to) if to else int(time.time())
+    if hi <= lo:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if resolution == "auto":
+        resolution = rollups.pick_resolution(lo, hi, points, MAX_METRIC_POINTS)
+    # only an explicit resolution (or a range of decades) can go over the cap
+    if (hi - lo) / rollups.RESOLUTIONS[resolution] > MAX_METRIC_POINTS:
+        raise HTTPException(status_code=400, detail=f"Range too long for {resolution} resolution")
+
+    exists = db.execute(text("SELECT 1 FROM node_data WHERE node_id = :id"), {"id": node_id}).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Node not found")
 
-    return tree
+    return {
+        "node_id": node_id,
+        "resolution": resolution,
+        "from": rollups.from_epoch(lo).isoformat(),
+        "to": rollups.from_epoch(hi).isoformat(),
+        "points": rollups.to_points(rollups.series(db, node_id, resolution, lo, hi)),
+    }
 
 
 # @router.get("/nodes/tree-withDeleted", response_model=List[NodeTreeResponse])
@@ -82,68 +270,242 @@ def get_nodes_tree(db: Session = Depends(get_db),current_user: str = Depends(get
 #             tree.append(n)
 #     return tree
 
-@router.post("/nodes", response_model=NodeResponse)
-def create_node(node: NodeCreate, 
-                db: Session = Depends(get_db), 
-                current_user: str = Depends(get_current_user)
-                ):
-    parent_query = text("""
-        SELECT node_id 
-        FROM node_data 
-        WHERE node_name = :parent_name AND is_deleted = 0
-    """)
-    parent_result = db.execute(
-        parent_query, {"parent_name": node.parent_name}).first()
-
-    if not parent_result:
+def find_parent_id(db: Session, node: NodeCreate) -> int:
+    """Live parent given by parent_path, else by parent_name; 409 when either matches more than one node."""
+    if node.parent_path:
+        parent_id, ambiguous = path_resolver.resolve(db, node.parent_path)
+        if ambiguous:
+            raise HTTPException(status_code=409, detail=f"Parent path '{node.parent_path}' is ambiguous")
+        if parent_id is None:
+            raise HTTPException(status_code=404, detail=f"Parent node '{node.parent_path}' not found.")
+        return parent_id
+    if not node.parent_name:
+        raise HTTPException(status_code=400, detail="Give parent_path or parent_name")
+    matches = db.execute(
+        select(node_table.c.node_id)
+        .where(node_table.c.node_name == node.parent_name, node_table.c.is_deleted == False)
+        .limit(2)
+    ).scalars().all()
+    if not matches:
         raise HTTPException(
             status_code=404,
             detail=f"Parent node '{node.parent_name}' not found."
         )
-    parent_id = parent_result.node_id
-    insert_query = text("""
-        INSERT INTO node_data (parent_id, node_name, is_deleted)
-        OUTPUT INSERTED.*
-        VALUES (:parent_id, :node_name, :is_deleted)
-    """)
-
-    result = db.execute(insert_query, {
-        "parent_id": parent_id,
-        "node_name": node.node_name,
-        "is_deleted": False
-    })
+    if len(matches) > 1:
+        raise HTTPException(status_code=409,
+                            detail=f"Parent name '{node.parent_name}' is ambiguous; use parent_path")
+    return matches[0]
+
+
+@router.post("/nodes", response_model=NodeResponse)
+def create_node(node: NodeCreate, 
+                db: Session = Depends(get_write_db), 
+                current_user: str = Depends(get_current_user)
+                ):
+    parent_id = find_parent_id(db, node)
+    # RETURNING compiles to OUTPUT INSERTED.* on MSSQL and RETURNING on SQLite
+    insert_query = (
+        insert(node_table)
+        .values(parent_id=parent_id, node_name=node.node_name, is_deleted=False)
+        .returning(*node_table.c)
+    )
+
+    result = db.execute(insert_query)
 
     new_node = result.fetchone()
+    hierarchy.add_node(db, new_node.node_id, parent_id)
+    change_log.record(db, change_log.next_version(db), "create", [new_node.node_id])
+    # a cached path to a same-named sibling is ambiguous from now on
+    new_paths = hierarchy.get_paths(db, [new_node.node_id])
     db.commit()
+    tree_cache.invalidate()
+    path_resolver.invalidate(new_paths.values())
+    search_index.add(new_node.node_id, new_node.node_name)
+    change_feed.publish({"type": "create", "node_id": new_node.node_id,
+                         "parent_id": parent_id, "node_name": new_node.node_name})
     return dict(new_node._mapping)
 
 
+@router.post("/nodes/import")
+async def import_nodes(request: Request,
+                       format: str = Query("csv", regex="^(csv|ndjson)$"),
+                       all_or_nothing: bool = False,
+                       db: Session = Depends(get_write_db),
+                       current_user: str = Depends(get_current_user)):
+    rows = bulk.parse_rows(await request.body(), format)
+    return await run_in_threadpool(run_import, db, rows, all_or_nothing)
+
+
+def run_import(db: Session, rows: List[dict], all_or_nothing: bool):
+    try:
+        report = bulk.import_rows(db, rows, version=change_log.next_version(db))
+        if report["errors"] and all_or_nothing:
+            db.rollback()
+            return {**report, "created": 0}
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    if report["created"]:
+        tree_cache.invalidate()
+        search_index.invalidate()
+        path_resolver.clear()
+        change_feed.publish({"type": "import", "created": report["created"]})
+    return report
+
+
+@router.post("/nodes/batch")
+def run_batch(request: BatchRequest,
+              db: Session = Depends(get_write_db),
+              current_user: str = Depends(get_current_user)):
+    operations = request.operations
+    if not operations:
+        raise HTTPException(status_code=400, detail="No operations given")
+    if len(operations) > batch.MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {batch.MAX_BATCH_OPERATIONS} operations per batch")
+
+    version = change_log.next_version(db)
+    plan = batch.BatchPlan(db, operations)
+    if plan.errors:
+        db.rollback()
+        raise HTTPException(status_code=400, detail={"applied": False, "errors": plan.errors})
+    try:
+        # paths of the touched nodes before and after, see update_node
+        touched_ids = sorted({op.node_id for op in operations}.union(*plan.restore_ids.values()))
+        stale_paths = list(hierarchy.get_paths(db, touched_ids).values())
+        outcome = plan.apply(db, version)
+        stale_paths += hierarchy.get_paths(db, touched_ids).values()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    tree_cache.invalidate()
+    search_index.invalidate()
+    path_resolver.invalidate(stale_paths)
+    for event in outcome["events"]:
+        change_feed.publish(event)
+    return {"applied": True, "version": version, "results": outcome["results"]}
+
+
+@router.get("/nodes/export")
+def export_nodes(format: str = Query("csv", regex="^(csv|ndjson)$"),
+                 db: Session = Depends(get_read_db),
+                 current_user: str = Depends(get_current_user)):
+    # the session stays open until the response has been sent
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(bulk.export_nodes(db, format), media_type=media_type)
+
+
+@router.post("/nodes/{node_id}/move")
+def move_node(node_id: int,
+              move: NodeMove,
+              db: Session = Depends(get_write_db),
+              current_user: str = Depends(get_current_user)):
+    if (move.parent_id is None) == (move.parent_path is None):
+        raise HTTPException(status_code=400, detail="Give exactly one of parent_id or parent_path")
+    try:
+        # the version row lock serializes hierarchy writes, so no concurrent move can
+        # slip in between the cycle check below and this commit
+        version = change_log.next_version(db)
+        node = db.execute(
+            select(node_table.c.parent_id).where(node_table.c.node_id == node_id)
+        ).first()
+        if not node:
+            raise HTTPException(status_code=404, detail="Node not found")
+        if move.parent_id is not None:
+            parent_id = move.parent_id
+            parent = db.execute(
+                select(node_table.c.is_deleted).where(node_table.c.node_id == parent_id)
+            ).first()
+            if not parent or parent.is_deleted:
+                parent_id = None
+        else:
+            parent_id, ambiguous = path_resolver.resolve(db, move.parent_path)
+            if ambiguous:
+                raise HTTPException(status_code=409, detail=f"Parent path '{move.parent_path}' is ambiguous")
+        if parent_id is None:
+            raise HTTPException(status_code=404, detail="Parent node not found")
+        if hierarchy.is_in_subtree(db, parent_id, node_id):
+            raise HTTPException(status_code=400, detail="Node cannot be moved under itself or its descendants")
+
+        moved = hierarchy.subtree_size(db, node_id) + 1
+        if node.parent_id == parent_id:
+            db.rollback()
+            moved = 0
+        else:
+            stale_paths = list(hierarchy.get_paths(db, [node_id]).values())
+            hierarchy.move_subtree(db, node_id, parent_id)
+            db.execute(update(node_table).where(node_table.c.node_id == node_id).values(parent_id=parent_id))
+            change_log.record(db, version, "update", [node_id])
+            stale_paths += hierarchy.get_paths(db, [node_id]).values()
+            db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if moved:
+        tree_cache.invalidate()
+        path_resolver.invalidate(stale_paths)
+        change_feed.publish({"type": "move", "node_id": node_id, "parent_id": parent_id,
+                             "old_parent_id": node.parent_id})
+    return {"node_id": node_id, "parent_id": parent_id, "old_parent_id": node.parent_id,
+            "moved": moved, "depth": hierarchy.get_depth(db, node_id)}
+
+
 @router.put("/nodes/{node_id}", response_model=NodeResponse)
-def update_node(node_id: int, node: NodeCreate, db: Session = Depends(get_db)):
-    update_query = text(""" 
-        UPDATE node_data 
-        SET parent_id = :parent_id,
-            node_name = :node_name
-        OUTPUT INSERTED.*
-        WHERE node_id = :node_id""")
+def update_node(node_id: int, node: NodeCreate, db: Session = Depends(get_write_db)):
+    # taken first: holds the hierarchy write lock through the cycle check (see move_node)
+    version = change_log.next_version(db)
+    parent_id = find_parent_id(db, node)
+    if hierarchy.is_in_subtree(db, parent_id, node_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Node cannot be moved under itself or its descendants"
+        )
+
+    update_query = (
+        update(node_table)
+        .where(node_table.c.node_id == node_id)
+        .values(parent_id=parent_id, node_name=node.node_name)
+        .returning(*node_table.c)
+    )
     try:
-        result = db.execute(update_query, {
-            "node_id": node_id,
-            "parent_id": node.parent_id,
-            "node_name": node.node_name
-        })
+        previous = db.execute(
+            select(node_table.c.parent_id, node_table.c.node_name).where(node_table.c.node_id == node_id)
+        ).first()
+        stale_paths = list(hierarchy.get_paths(db, [node_id]).values())
+        result = db.execute(update_query)
         updated_node = result.fetchone()
         if not updated_node:
             raise HTTPException(status_code=404, detail="Node not found")
+        hierarchy.move_subtree(db, node_id, parent_id)
+        change_log.record(db, version, "update", [node_id])
+        stale_paths += hierarchy.get_paths(db, [node_id]).values()
         db.commit()
+        tree_cache.invalidate()
+        path_resolver.invalidate(stale_paths)
+        if not updated_node.is_deleted:
+            search_index.add(updated_node.node_id, updated_node.node_name)
+        if previous.node_name != updated_node.node_name:
+            change_feed.publish({"type": "rename", "node_id": node_id, "node_name": updated_node.node_name})
+        if previous.parent_id != updated_node.parent_id:
+            change_feed.publish({"type": "move", "node_id": node_id, "parent_id": updated_node.parent_id,
+                                 "old_parent_id": previous.parent_id})
         return dict(updated_node._mapping)
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.put("/nodes/restore/{node_id}", response_model=NodeResponse)
-def restore_node(node_id: int, db: Session = Depends(get_db)):
+def restore_node(node_id: int, db: Session = Depends(get_write_db)):
     try:
         node_query = text("""
             SELECT node_id, parent_id, is_deleted
@@ -155,32 +517,26 @@ def restore_node(node_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Node not found")
 
         restore_chain = []
-        current_parent_id = node.parent_id
-
-        while current_parent_id:
-            parent = db.execute(text("""
-                SELECT node_id, parent_id, is_deleted
-                FROM node_data
-                WHERE node_id = :parent_id
-            """), {"parent_id": current_parent_id}).fetchone()
-
-            if not parent:
-                break
-
-            if parent.is_deleted == 1:
-                restore_chain.append(parent.node_id)
-                current_parent_id = parent.parent_id
+        for parent in hierarchy.get_ancestors(db, node.node_id):
+            if parent["is_deleted"] == 1:
+                restore_chain.append(parent["node_id"])
             else:
                 break
 
         ids_to_restore = [node.node_id] + restore_chain
 
         update_query = text(
-            "UPDATE node_data SET is_deleted = 0 WHERE node_id IN :ids"
+            "UPDATE node_data SET is_deleted = 0, deleted_at = NULL WHERE node_id IN :ids"
         ).bindparams(bindparam("ids", expanding=True))
 
         db.execute(update_query, {"ids": ids_to_restore})
+        change_log.record(db, change_log.next_version(db), "restore", ids_to_restore)
+        new_paths = hierarchy.get_paths(db, ids_to_restore)
         db.commit()
+        tree_cache.invalidate()
+        search_index.invalidate()
+        path_resolver.invalidate(new_paths.values())
+        change_feed.publish({"type": "restore", "node_ids": ids_to_restore})
 
         restored = db.execute(
             text("SELECT * FROM node_data WHERE node_id = :id"),
@@ -195,7 +551,7 @@ def restore_node(node_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/nodes/{node_id}")
-def delete_node(node_id: int, db: Session = Depends(get_db)):
+def delete_node(node_id: int, db: Session = Depends(get_write_db)):
     node_query = text(
         "SELECT node_id, parent_id FROM node_data WHERE node_id = :node_id")
     node = db.execute(node_query, {"node_id": node_id}).fetchone()
@@ -206,25 +562,34 @@ def delete_node(node_id: int, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=400, detail="Root node cannot be deleted")
 
-    child_nodes = get_descendants(db, node_id, return_objects=True)
+    child_ids = get_descendants(db, node_id, return_objects=False)
+    old_paths = hierarchy.get_paths(db, [node_id])
+    # descendants deleted earlier keep their own deletion time (see app.retention)
+    now = datetime.utcnow()
+    deleted_at = func.coalesce(NodeData.deleted_at, now)
     try:
-        if child_nodes:
-            child_ids = [child.node_id for child in child_nodes]
-            placeholders = ", ".join(map(str, child_ids))
-            update_children_query = text(
-                f"UPDATE node_data SET is_deleted = 1 WHERE node_id IN ({placeholders})"
-            )
-            db.execute(update_children_query)
+        update_children_query = (
+            update(NodeData)
+            .where(NodeData.node_id.in_(hierarchy.descendant_ids_query(node_id)))
+            .values(is_deleted=True, deleted_at=deleted_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(update_children_query)
 
         update_node_query = text(
-            "UPDATE node_data SET is_deleted = 1 WHERE node_id = :node_id"
+            "UPDATE node_data SET is_deleted = 1, deleted_at = COALESCE(deleted_at, :now) WHERE node_id = :node_id"
         )
-        db.execute(update_node_query, {"node_id": node_id})
+        db.execute(update_node_query, {"node_id": node_id, "now": now})
+        change_log.record_subtree(db, change_log.next_version(db), "delete", node_id)
 
         db.commit()
+        tree_cache.invalidate()
+        search_index.remove(child_ids + [node_id])
+        path_resolver.invalidate(old_paths.values())
+        change_feed.publish({"type": "delete", "node_id": node_id, "descendants": len(child_ids)})
 
         return {
-            "message": f"Node {node_id} and its {len(child_nodes)} child nodes marked as deleted successfully"
+            "message": f"Node {node_id} and its {len(child_ids)} child nodes marked as deleted successfully"
         }
 
     except Exception as e:
@@ -233,7 +598,7 @@ def delete_node(node_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/hard-nodes/{node_id}")
-def delete_node(node_id: int, db: Session = Depends(get_db)):
+def hard_delete_node(node_id: int, db: Session = Depends(get_write_db)):
     node_query = text(
         "SELECT node_id, parent_id FROM node_data WHERE node_id = :node_id")
     node = db.execute(node_query, {"node_id": node_id}).fetchone()
@@ -246,19 +611,27 @@ def delete_node(node_id: int, db: Session = Depends(get_db)):
             status_code=400, detail="Root node cannot be deleted")
 
     child_ids = get_descendants(db, node_id, return_objects=False)
+    old_paths = hierarchy.get_paths(db, [node_id])
 
     try:
-        if child_ids:
-            delete_children_query = text(
-                "DELETE FROM node_data WHERE node_id IN :child_ids"
-            )
-            db.execute(delete_children_query, {"child_ids": tuple(child_ids)})
+        delete_children_query = (
+            delete(NodeData)
+            .where(NodeData.node_id.in_(hierarchy.descendant_ids_query(node_id)))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(delete_children_query)
 
         delete_node_query = text(
             "DELETE FROM node_data WHERE node_id = :node_id")
         db.execute(delete_node_query, {"node_id": node_id})
+        change_log.record_subtree(db, change_log.next_version(db), "hard_delete", node_id)
+        hierarchy.remove_subtree(db, node_id)
 
         db.commit()
+        tree_cache.invalidate()
+        search_index.remove(child_ids + [node_id])
+        path_resolver.invalidate(old_paths.values())
+        change_feed.publish({"type": "hard_delete", "node_id": node_id, "descendants": len(child_ids)})
         return {
             "message": f"Node {node_id} and its {len(child_ids)} child nodes deleted successfully"
         }
@@ -268,44 +641,115 @@ def delete_node(node_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/nodes/search")
-def search_nodes(q: str = Query(..., min_length=1), db: Session = Depends(get_db)):
-    decoded_q = unquote_plus(q)
-    query = text("""
-    SELECT node_id, node_name
-    FROM node_data
-    WHERE node_name LIKE :pattern
-      AND is_deleted = 0
-    ORDER BY node_name
-    OFFSET 0 ROWS FETCH NEXT 20 ROWS ONLY
-""")
-    result = db.execute(query, {"pattern": f"%{decoded_q}%"})
+def resolve_or_404(db: Session, path: str) -> int:
+    node_id, ambiguous = path_resolver.resolve(db, path)
+    if ambiguous:
+        raise HTTPException(status_code=409, detail=f"Path '{path}' is ambiguous")
+    if node_id is None:
+        raise HTTPException(status_code=404, detail=f"Node '{path}' not found")
+    return node_id
 
-    return [dict(row._mapping) for row in result.fetchall()]
 
+@router.get("/nodes/by-path")
+def get_node_by_path(path: str = Query(..., min_length=1, description='Names from the root down, e.g. "Site A/Line 3/Pump 1"'),
+                     db: Session = Depends(get_db),
+                     current_user: str = Depends(get_current_user)):
+    node_id = resolve_or_404(db, path)
+    node = db.execute(select(node_table).where(node_table.c.node_id == node_id)).first()
+    if not node:
+        raise HTTPException(status_code=404, detail=f"Node '{path}' not found")
+    return {**node._mapping, "path": hierarchy.get_paths(db, [node_id]).get(node_id, node.node_name)}
 
-@router.get("/nodes/deleted-trees", response_model=List[DeletedNodeTree])
-def get_deleted_trees(db: Session = Depends(get_db)):
-    all_deleted = db.execute(text("""
-        SELECT node_id, node_name, parent_id
-        FROM node_data
-        WHERE is_deleted = 1
-    """)).mappings().all()
 
-    if not all_deleted:
-        return []
+MAX_RESOLVE_PATHS = 10000
+
+
+@router.post("/nodes/resolve")
+def resolve_paths(request: PathResolveRequest,
+                  db: Session = Depends(get_db),
+                  current_user: str = Depends(get_current_user)):
+    if len(request.paths) > MAX_RESOLVE_PATHS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RESOLVE_PATHS} paths per request")
+    found, ambiguous = path_resolver.resolve_many(db, request.paths)
+    results = []
+    for path in request.paths:
+        if path in found:
+            results.append({"path": path, "node_id": found[path]})
+        else:
+            results.append({"path": path, "node_id": None,
+                            "error": "ambiguous" if path in ambiguous else "not found"})
+    return {"results": results}
+
+
+@router.get("/nodes/by-path/cache-stats")
+def get_path_cache_stats(current_user: str = Depends(get_current_user)):
+    return path_resolver.stats()
+
 
-    deleted_nodes = [dict(row) for row in all_deleted]
+@router.get("/nodes/replicas/stats")
+def get_replica_stats(current_user: str = Depends(get_current_user)):
+    return replica_set.stats()
 
-    deleted_ids = {n["node_id"] for n in deleted_nodes}
-    deleted_roots = [
-        n for n in deleted_nodes if not n["parent_id"] or n["parent_id"] not in deleted_ids
+
+@router.get("/nodes/search")
+def search_nodes(q: str = Query(..., min_length=1),
+                 limit: int = Query(20, ge=1, le=200),
+                 offset: int = Query(0, ge=0),
+                 under: Optional[str] = Query(None, description="Only search below this node path"),
+                 db: Session = Depends(get_read_db)):
+    decoded_q = unquote_plus(q)
+    within = None
+    with primary_session(db) as primary:
+        search_index.ensure_loaded(primary)
+        top_id = resolve_or_404(primary, under) if under else None
+    if under:
+        within = set(db.execute(hierarchy.descendant_ids_query(top_id)).scalars())
+    hits = search_index.search(decoded_q, limit=limit, offset=offset, within=within)
+    paths = hierarchy.get_paths(db, [node_id for node_id, _ in hits])
+
+    return [
+        {"node_id": node_id, "node_name": node_name, "path": paths.get(node_id, node_name)}
+        for node_id, node_name in hits
     ]
-    node_map = {n["node_id"]: {**n, "children": []} for n in deleted_nodes}
-    for n in node_map.values():
-        pid = n.get("parent_id")
-        if pid and pid in node_map:
-            node_map[pid]["children"].append(n)
-    deleted_trees = [node_map[r["node_id"]] for r in deleted_roots]
-
-    return deleted_trees
+
+
+DELETED_TREES_PAGE_SIZE = 100
+
+
+@router.get("/nodes/deleted-trees", response_model=List[DeletedNodeTree])
+def get_deleted_trees(after: Optional[int] = Query(None, description="Return trees whose root node_id is greater than this cursor"),
+                      limit: int = Query(DELETED_TREES_PAGE_SIZE, ge=1, le=1000),
+                      db: Session = Depends(get_read_db)):
+    # a page of deleted subtree roots (deleted nodes whose parent is live or missing)...
+    parent = node_table.alias("parent")
+    roots_query = (
+        select(node_table.c.node_id)
+        .select_from(node_table.outerjoin(parent, parent.c.node_id == node_table.c.parent_id))
+        .where(node_table.c.is_deleted == True, or_(parent.c.node_id.is_(None), parent.c.is_deleted == False))
+        .order_by(node_table.c.node_id)
+        .limit(limit)
+    )
+    if after is not None:
+        roots_query = roots_query.where(node_table.c.node_id > after)
+    root_ids = list(db.execute(roots_query).scalars())
+    headers = {"X-Next-Cursor": str(root_ids[-1])} if len(root_ids) == limit else {}
+    if not root_ids:
+        return Response(content=b"[]", media_type="application/json", headers=headers)
+
+    # ...and the deleted nodes below them
+    rows = db.execute(
+        select(node_table.c.node_id, node_table.c.parent_id, node_table.c.node_name, node_table.c.deleted_at)
+        .join(NodeClosure, NodeClosure.descendant_id == node_table.c.node_id)
+        .where(NodeClosure.ancestor_id.in_(root_ids), node_table.c.is_deleted == True)
+        .order_by(node_table.c.node_id)
+    ).all()
+    tree = TreeArrays([row.node_id for row in rows], [row.parent_id for row in rows],
+                      [row.node_name for row in rows])
+    page = set(root_ids)
+    body = tree.dumps([
+        ("node_id", tree.node_ids, encode_int),
+        ("node_name", tree.names, encode_str),
+        ("parent_id", tree.parent_ids, encode_int),
+        ("deleted_at", [row.deleted_at for row in rows], encode_datetime),
+    ], roots=[i for i in tree.roots if tree.node_ids[i] in page])
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -2,9 +2,11 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 from typing import List, Optional, TYPE_CHECKING
+from typing import Literal
 
 class NodeCreate(BaseModel):
-    parent_name: str
+    parent_name: Optional[str] = None
+    parent_path: Optional[str] = None  # "Site A/Line 3", preferred when names repeat
     node_name: str
 
 class NodeResponse(BaseModel):
@@ -22,6 +24,7 @@ class DeletedNodeTree(BaseModel):
     node_id: int
     node_name: str
     parent_id: Optional[int] = None
+    deleted_at: Optional[datetime] = None
     children: List["DeletedNodeTree"] = []
 
 # Fix forward reference for Pydantic v1.x
@@ -41,6 +44,12 @@ class NodeTreeResponse(BaseModel):
 # Fix forward reference for Pydantic v1.x
 NodeTreeResponse.update_forward_refs()
 
+class NodeSubtreeResponse(NodeTreeResponse):
+    has_children: bool
+    children: List["NodeSubtreeResponse"] = []
+
+NodeSubtreeResponse.update_forward_refs()
+
 class UserCreate(BaseModel):
     username: str
     password: str
@@ -53,3 +62,27 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+
+class MetricReading(BaseModel):
+    temperature: float
+    humidity: float
+    pressure: float
+    status: Literal["OK", "Warning", "Error"]
+    timestamp: datetime
+
+
+class NodeMove(BaseModel):
+    parent_id: Optional[int] = None
+    parent_path: Optional[str] = None  # "Site A/Line 3"
+
+class BatchOperation(BaseModel):
+    op: Literal["move", "rename", "delete", "restore"]
+    node_id: int
+    parent_id: Optional[int] = None  # move
+    node_name: Optional[str] = None  # rename
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+class PathResolveRequest(BaseModel):
+    paths: List[str]
@@ -0,0 +1,133 @@
+"""
+In-process trigram index over live node names for /api/nodes/search.
+
+Each lower-cased name is broken into bigrams and trigrams and every gram
+keeps a posting list of node ids. A query looks up the rarest of its trigrams and
+checks the candidates against the stored names, so postings never need to be
+cleaned in place: renamed or deleted ids simply fail the check and are
+dropped on the next reload. Single-character queries scan the name table in
+memory.
+
+The index is loaded from node_data on first use and reloaded after
+SEARCH_INDEX_MAX_AGE seconds so writes made by other worker processes show
+up; writes in this process are applied immediately by the node routes.
+"""
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+GRAM_SIZES = (2, 3)
+SEARCH_INDEX_MAX_AGE = float(os.getenv("SEARCH_INDEX_MAX_AGE", "60"))
+
+
+def grams(name: str) -> set:
+    return {
+        name[i:i + size]
+        for size in GRAM_SIZES
+        for i in range(len(name) - size + 1)
+    }
+
+
+class NodeSearchIndex:
+    def __init__(self, max_age: float = SEARCH_INDEX_MAX_AGE):
+        self._lock = threading.Lock()
+        self.max_age = max_age
+        self.loaded_at: Optional[float] = None
+        self.names: Dict[int, str] = {}
+        self.lowered: Dict[int, str] = {}
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+    # ---------- LOADING ----------
+    def load(self, rows: Iterable[Tuple[int, str]]):
+        names, lowered = {}, {}
+        postings = defaultdict(list)
+        for node_id, node_name in rows:
+            names[node_id] = node_name
+            lowered[node_id] = low = node_name.lower()
+            for gram in grams(low):
+                postings[gram].append(node_id)
+        with self._lock:
+            self.names, self.lowered, self.postings = names, lowered, postings
+            self.loaded_at = time.monotonic()
+
+    def load_from_db(self, db: Session):
+        result = db.execute(text(
+            "SELECT node_id, node_name FROM node_data WHERE is_deleted = 0"
+        ))
+        self.load(result)
+
+    def ensure_loaded(self, db: Session):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+            self.load_from_db(db)
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    # ---------- MAINTENANCE ----------
+    def add(self, node_id: int, node_name: str):
+        if self.loaded_at is None:
+            return
+        low = node_name.lower()
+        with self._lock:
+            self.names[node_id] = node_name
+            self.lowered[node_id] = low
+            for gram in grams(low):
+                self.postings[gram].append(node_id)
+
+    def remove(self, node_ids: Iterable[int]):
+        if self.loaded_at is None:
+            return
+        with self._lock:
+            for node_id in node_ids:
+                self.names.pop(node_id, None)
+                self.lowered.pop(node_id, None)
+
+    # ---------- QUERY ----------
+    def search(self, q: str, limit: int = 20, offset: int = 0,
+               within: Optional[Container[int]] = None) -> List[Tuple[int, str]]:
+        """Case-insensitive substring match ranked exact, prefix, word prefix, then anywhere.
+
+        With `within`, only those node ids are considered.
+        """
+        needle = q.lower()
+        with self._lock:
+            lowered = self.lowered
+            if len(needle) < GRAM_SIZES[0]:
+                candidates = lowered.keys()
+            else:
+                lists = [self.postings.get(gram) for gram in grams(needle)]
+                if not all(lists):
+                    return []
+                candidates = dict.fromkeys(min(lists, key=len))
+
+            ranked = []
+            for node_id in candidates:
+                if within is not None and node_id not in within:
+                    continue
+                name = lowered.get(node_id)
+                if name is None:
+                    continue
+                pos = name.find(needle)
+                if pos < 0:
+                    continue
+                if name == needle:
+                    rank = 0
+                elif pos == 0:
+                    rank = 1
+                elif not name[pos - 1].isalnum():
+                    rank = 2
+                else:
+                    rank = 3
+                ranked.append((rank, len(name), name, node_id))
+
+            top = heapq.nsmallest(offset + limit, ranked)[offset:]
+            return [(node_id, self.names[node_id]) for _, _, _, node_id in top]
+
+
+search_index = NodeSearchIndex()
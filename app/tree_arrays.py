@@ -0,0 +1,174 @@
+"""
+Array-backed hierarchy assembly and JSON serialization for the tree routes.
+
+TreeArrays holds n nodes as parallel arrays indexed by position (the order
+rows were given in): node ids, names, parent ids and each node's parent
+position (-1 for roots). Children are kept CSR style, as one `children`
+array of positions sliced by `offsets` (node i's children are
+children[offsets[i]:offsets[i + 1]], in input order). Descendant counts are
+summed bottom-up over a breadth-first order, so nothing recurses and deep
+chains are no problem.
+
+dumps() writes the nested JSON straight from the arrays, node by node off an
+explicit stack, with the json module's C string encoder; no per-node dicts
+or Pydantic models are built. As before, a node whose parent is missing from
+the rows (or is 0) becomes a root, and children follow the input order.
+"""
+import json
+from array import array
+from datetime import datetime
+from itertools import accumulate
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+FLUSH_NODES = 10000  # nodes per joined chunk while serializing
+
+
+def encode_int(value: Optional[int]) -> str:
+    return "null" if value is None else str(int(value))
+
+
+def encode_bool(value: Optional[bool]) -> str:
+    return "null" if value is None else ("true" if value else "false")
+
+
+def encode_str(value: Optional[str]) -> str:
+    return "null" if value is None else encode_basestring_ascii(value)
+
+
+def encode_datetime(value: Optional[datetime]) -> str:
+    return "null" if value is None else '"' + value.isoformat() + '"'
+
+
+# (JSON key, one value per position, encoder)
+Column = Tuple[str, Sequence[Any], Callable[[Any], str]]
+
+
+class TreeArrays:
+    def __init__(self, node_ids: Sequence[int], parent_ids: Sequence[Optional[int]], names: List[str]):
+        n = len(node_ids)
+        self.node_ids = array("q", node_ids)
+        self.parent_ids = list(parent_ids)
+        self.names = names
+        position = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+        self.parent_pos = array("l", [-1]) * n
+        counts = array("l", [0]) * (n + 1)
+        for i, parent_id in enumerate(self.parent_ids):
+            if parent_id:
+                p = position.get(parent_id, -1)
+                if p >= 0:
+                    self.parent_pos[i] = p
+                    counts[p + 1] += 1
+        del position
+        self.offsets = array("l", accumulate(counts))
+
+        self.children = array("l", [0]) * self.offsets[n]
+        fill = self.offsets[:n]
+        roots = array("l")
+        for i, p in enumerate(self.parent_pos):
+            if p < 0:
+                roots.append(i)
+            else:
+                self.children[fill[p]] = i
+                fill[p] += 1
+        self.roots = roots
+        self._descendants: Optional[array] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, Optional[int], str]]) -> "TreeArrays":
+        """From (node_id, parent_id, node_name) rows."""
+        node_ids, parent_ids, names = array("q"), [], []
+        for node_id, parent_id, node_name in rows:
+            node_ids.append(node_id)
+            parent_ids.append(parent_id)
+            names.append(node_name)
+        return cls(node_ids, parent_ids, names)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def breadth_first(self, roots: Optional[Sequence[int]] = None) -> array:
+        """Positions reachable from roots, parents before children."""
+        order = array("l", self.roots if roots is None else roots)
+        children, offsets = self.children, self.offsets
+        head = 0
+        while head < len(order):
+            i = order[head]
+            order.extend(children[offsets[i]:offsets[i + 1]])
+            head += 1
+        return order
+
+    def descendant_counts(self) -> array:
+        """Number of nodes below each position, computed once."""
+        if self._descendants is None:
+            counts = array("l", [0]) * len(self)
+            parent_pos = self.parent_pos
+            for i in reversed(self.breadth_first()):
+                p = parent_pos[i]
+                if p >= 0:
+                    counts[p] += counts[i] + 1
+            self._descendants = counts
+        return self._descendants
+
+    def dumps(self, columns: List[Column], roots: Optional[Sequence[int]] = None,
+              constants: Optional[dict] = None) -> bytes:
+        """JSON array of the trees under roots (default: all roots), each node
+        an object of columns, then constants (the same value on every node),
+        then its nested "children"."""
+        # columns without None skip their encoder: ints format with %d, strings
+        # go straight to the C encoder
+        fields, getters = [], []
+        for key, values, encode in columns:
+            if encode is encode_int and None not in values:
+                fields.append(f'"{key}":%d')
+                getters.append(values.__getitem__)
+            elif encode is encode_str and None not in values:
+                fields.append(f'"{key}":%s')
+                getters.append(lambda i, values=values: encode_basestring_ascii(values[i]))
+            else:
+                fields.append(f'"{key}":%s')
+                getters.append(lambda i, values=values, encode=encode: encode(values[i]))
+        fields += [f'"{key}":' + json.dumps(value).replace("%", "%%") for key, value in (constants or {}).items()]
+        template = "{" + ",".join(fields) + ',"children":['
+        roots = self.roots if roots is None else roots
+        children, offsets = self.children, self.offsets
+
+        # a node needs a leading comma unless it is the first of its siblings
+        first = bytearray(len(self))
+        if len(roots):
+            first[roots[0]] = 1
+        for i in range(len(self)):
+            if offsets[i] != offsets[i + 1]:
+                first[children[offsets[i]]] = 1
+
+        parts, chunk = [b"["], []
+        stack = list(reversed(roots))
+        while stack:
+            i = stack.pop()
+            if i < 0:
+                chunk.append("]}")
+                continue
+            if not first[i]:
+                chunk.append(",")
+            chunk.append(template % tuple([get(i) for get in getters]))
+            stack.append(-1)
+            stack.extend(reversed(children[offsets[i]:offsets[i + 1]]))
+            if len(chunk) >= FLUSH_NODES:
+                parts.append("".join(chunk).encode("ascii"))
+                chunk = []
+        parts.append("".join(chunk).encode("ascii"))
+        parts.append(b"]")
+        return b"".join(parts)
+
+    def dumps_one(self, columns: List[Column], root: int, constants: Optional[dict] = None) -> bytes:
+        """The tree under one root position as a JSON object."""
+        return self.dumps(columns, [root], constants)[1:-1]
+
+    def nested(self, rows: Sequence[dict]) -> List[dict]:
+        """rows (one dict per position) linked into trees under "children" lists; returns the roots."""
+        nodes = [{**row, "children": []} for row in rows]
+        for i, p in enumerate(self.parent_pos):
+            if p >= 0:
+                nodes[p]["children"].append(nodes[i])
+        return [nodes[i] for i in self.roots]
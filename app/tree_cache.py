@@ -0,0 +1,138 @@
+"""
+In-process cache for the serialized /api/nodes/tree response.
+
+Write routes call `invalidate()` after committing, which bumps the cache
+version. Readers get the cached body while its version is current; on a miss
+only one thread rebuilds and concurrent callers wait for its result. The cache
+is per process, so the tree routes also pass the database's hierarchy_version
+(app.change_log, bumped by every write) to `observe()` on each request: a
+write served by another worker invalidates this copy on the next read. The
+ETag is a hash of the body, so every worker hands out the same one for the
+same tree.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class TreeCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._async_rebuild_lock: Optional[asyncio.Lock] = None
+        self.version = 0
+        self._db_version: Optional[int] = None
+        self._cached_version: Optional[int] = None
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.rebuilds = 0
+        self.last_rebuild_seconds = 0.0
+        self.total_rebuild_seconds = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def observe(self, db_version: int):
+        """Invalidate if the database's hierarchy version moved since the last call."""
+        with self._lock:
+            if db_version != self._db_version:
+                self._db_version = db_version
+                self.version += 1
+
+    def not_modified_etag(self, if_none_match: Optional[str]) -> Optional[str]:
+        """Current ETag if the client already has it.
+
+        Only as fresh as the last observe(): callers read the hierarchy version
+        first, so a 304 costs that one-row query but never a tree rebuild.
+        """
+        if not if_none_match:
+            return None
+        with self._lock:
+            if self._cached_version != self.version:
+                return None
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            if self._etag in tags or "*" in tags:
+                self.not_modified += 1
+                return self._etag
+            return None
+
+    def _lookup(self):
+        """Cached (body, etag) if current, counting the hit or miss."""
+        with self._lock:
+            if self._cached_version == self.version:
+                self.hits += 1
+                return self._body, self._etag
+            self.misses += 1
+            return None
+
+    def _current(self):
+        with self._lock:
+            if self._cached_version == self.version:
+                return (self._body, self._etag), self.version
+            return None, self.version
+
+    def _store(self, version: int, body: bytes, elapsed: float):
+        etag = f'"{hashlib.sha1(body).hexdigest()[:24]}"'
+        with self._lock:
+            self.rebuilds += 1
+            self.last_rebuild_seconds = elapsed
+            self.total_rebuild_seconds += elapsed
+            # a write that landed mid-rebuild leaves this copy stale
+            if version == self.version:
+                self._cached_version = version
+                self._body = body
+                self._etag = etag
+        return body, etag
+
+    def get(self, build: Callable[[], bytes]):
+        """Return (body, etag), calling build() at most once per concurrent miss."""
+        cached = self._lookup()
+        if cached:
+            return cached
+
+        with self._rebuild_lock:
+            cached, version = self._current()
+            if cached:
+                return cached
+            start = time.perf_counter()
+            body = build()
+            return self._store(version, body, time.perf_counter() - start)
+
+    async def aget(self, build: Callable[[], Awaitable[bytes]]):
+        """get() for the async routes; waiters yield to the event loop instead of blocking it."""
+        cached = self._lookup()
+        if cached:
+            return cached
+
+        if self._async_rebuild_lock is None:
+            self._async_rebuild_lock = asyncio.Lock()
+        async with self._async_rebuild_lock:
+            cached, version = self._current()
+            if cached:
+                return cached
+            start = time.perf_counter()
+            body = await build()
+            return self._store(version, body, time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "db_version": self._db_version,
+                "cached_version": self._cached_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "rebuilds": self.rebuilds,
+                "last_rebuild_seconds": self.last_rebuild_seconds,
+                "total_rebuild_seconds": self.total_rebuild_seconds,
+            }
+
+
+tree_cache = TreeCache()
@@ -0,0 +1,97 @@
+"""
+Load test of the sync and async node routes against a SQLite file.
+
+Drives GET /api/nodes?limit=50 in-process through the ASGI app with N
+concurrent clients and reports throughput and latency percentiles. The sync
+mode runs on the default threadpool like production; the async mode uses
+aiosqlite through app.routes.async_node_routes.
+
+    python -m benchmarks.bench_async [concurrency...]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.database import get_async_db
+from app.routes import node_routes, async_node_routes
+from benchmarks.common import percentile, seed_file, session_dependency, star_rows
+
+NODES = 10_000
+# Both modes get the same pool, sized from the client count so only the
+# request path differs. It needs headroom past one connection per client:
+# sync sessions are closed after the response is sent, by a threadpool
+# thread, and a pool with no slack can deadlock with every thread waiting
+# for a connection that only such a close would release.
+POOL = {"pool_timeout": 300}
+REQUESTS_PER_CLIENT = 3
+
+
+def sync_app(path, pool_size):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                           pool_size=pool_size, max_overflow=pool_size, **POOL)
+    app = FastAPI()
+    app.include_router(node_routes.router, prefix="/api")
+    app.dependency_overrides[node_routes.get_db] = session_dependency(engine)
+    return app, engine.dispose
+
+
+def async_app(path, pool_size):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}",
+                                 pool_size=pool_size, max_overflow=pool_size, **POOL)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_db():
+        async with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(async_node_routes.router, prefix="/api")
+    app.dependency_overrides[get_async_db] = get_db
+    return app, engine.dispose
+
+
+async def run_load(app, concurrency):
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker():
+            for _ in range(REQUESTS_PER_CLIENT):
+                after = random.randint(0, NODES - 50)
+                start = time.perf_counter()
+                response = await client.get(f"/api/nodes?limit=50&after={after}")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.99), statistics.median(latencies)
+
+
+def main(levels):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed_file(path, star_rows(NODES))
+        print(f"{'mode':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for mode, factory in (("sync", sync_app), ("async", async_app)):
+            for concurrency in levels:
+                app, dispose = factory(path, concurrency)
+                throughput, p99, p50 = asyncio.run(run_load(app, concurrency))
+                result = dispose()
+                if asyncio.iscoroutine(result):
+                    asyncio.run(result)
+                print(f"{mode:>6} {concurrency:>8} {throughput:>8.0f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [50, 200, 1000])
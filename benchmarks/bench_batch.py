@@ -0,0 +1,102 @@
+"""
+One POST /api/nodes/batch of 500 operations versus the equivalent single calls.
+
+Reorganizes part of a plant hierarchy (see bench_suite): moves assets to
+other lines, renames assets, soft-deletes some and restores them, once as
+individual PUT / DELETE / PUT restore requests and once as a single batch,
+each on a fresh copy of the same SQLite database. Reports wall time and SQL
+statements for both.
+
+    python -m benchmarks.bench_batch [nodes] [operations]
+"""
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_suite import StatementCounter, bench_app, dataset
+
+
+def plan_operations(path, count, rng):
+    conn = sqlite3.connect(path)
+    names = dict(conn.execute("SELECT node_id, node_name FROM node_data WHERE is_deleted = 0"))
+    conn.close()
+    assets = [node_id for node_id, name in names.items() if name.startswith("Asset")]
+    lines = [node_id for node_id, name in names.items() if name.startswith("Line")]
+    picked = rng.sample(assets, count)
+    share = count // 10 * 4  # 40% moves, 40% renames, 10% deletes, 10% restores
+    deletes = picked[2 * share:2 * share + (count - 2 * share) // 2]
+    operations = [{"op": "move", "node_id": node_id, "parent_id": rng.choice(lines)} for node_id in picked[:share]]
+    operations += [{"op": "rename", "node_id": node_id, "node_name": f"{names[node_id]} (renamed)"}
+                   for node_id in picked[share:2 * share]]
+    operations += [{"op": "delete", "node_id": node_id} for node_id in deletes]
+    operations += [{"op": "restore", "node_id": node_id} for node_id in deletes]
+    return operations, names
+
+
+def single_request(op, names, parents):
+    """The single-node route call equivalent to one batch operation."""
+    node_id = op["node_id"]
+    if op["op"] == "move":
+        parents[node_id] = op["parent_id"]
+        return "PUT", f"/api/nodes/{node_id}", {
+            "json": {"parent_name": names[op["parent_id"]], "node_name": names[node_id]}}
+    if op["op"] == "rename":
+        names[node_id] = op["node_name"]
+        return "PUT", f"/api/nodes/{node_id}", {
+            "json": {"parent_name": names[parents[node_id]], "node_name": op["node_name"]}}
+    if op["op"] == "delete":
+        return "DELETE", f"/api/nodes/{node_id}", {}
+    return "PUT", f"/api/nodes/restore/{node_id}", {}
+
+
+async def run(path, operations, names, batched):
+    work = path + ".run"
+    shutil.copyfile(path, work)
+    try:
+        conn = sqlite3.connect(work)
+        parents = dict(conn.execute("SELECT node_id, parent_id FROM node_data"))
+        conn.close()
+        app, engine = bench_app(work)
+        counter = StatementCounter(engine)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            if batched:
+                response = await client.post("/api/nodes/batch", json={"operations": operations})
+                assert response.status_code == 200, response.text
+            else:
+                for op in operations:
+                    method, url, kwargs = single_request(op, names, parents)
+                    response = await client.request(method, url, **kwargs)
+                    assert response.status_code == 200, response.text
+            elapsed = time.perf_counter() - start
+        engine.dispose()
+        return elapsed, counter.count
+    finally:
+        os.remove(work)
+
+
+def main(nodes, count):
+    data_dir = os.path.join(tempfile.gettempdir(), "asset-hierarchy-bench")
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset(data_dir, "plant", nodes, 0, 50, 1)
+    operations, names = plan_operations(path, count, random.Random(1))
+    print(f"{len(operations)} operations on a {nodes}-node plant hierarchy")
+    print(f"{'mode':>18} {'seconds':>9} {'statements':>11}")
+    single_seconds, single_statements = asyncio.run(run(path, operations, dict(names), batched=False))
+    print(f"{'single calls':>18} {single_seconds:>9.3f} {single_statements:>11}")
+    batch_seconds, batch_statements = asyncio.run(run(path, operations, names, batched=True))
+    print(f"{'one batch':>18} {batch_seconds:>9.3f} {batch_statements:>11}")
+    print(f"speedup: {single_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,61 @@
+"""
+Bulk import throughput (rows/sec) on SQLite.
+
+Imports a site/line/asset hierarchy of the given size through
+app.bulk.import_rows in a single transaction, then streams it back out.
+
+    python -m benchmarks.bench_bulk_import [sizes...]
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import bulk
+from app.database import Base
+
+LINES_PER_SITE = 20
+ASSETS_PER_LINE = 50
+
+
+def synthetic_rows(size):
+    rows = []
+    site = line = 0
+    while len(rows) < size:
+        site += 1
+        rows.append({"node_name": f"Site {site}"})
+        for line in range(1, LINES_PER_SITE + 1):
+            line_path = f"Site {site}/Line {line}"
+            rows.append({"node_name": f"Line {line}", "parent_path": f"Site {site}"})
+            for asset in range(1, ASSETS_PER_LINE + 1):
+                rows.append({"node_name": f"Asset {asset}", "parent_path": line_path})
+    return rows[:size]
+
+
+def main(sizes):
+    print(f"{'rows':>8} {'import s':>9} {'rows/sec':>10} {'export s':>9} {'rows/sec':>10}")
+    for size in sizes:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        rows = synthetic_rows(size)
+
+        start = time.perf_counter()
+        report = bulk.import_rows(db, rows)
+        db.commit()
+        import_seconds = time.perf_counter() - start
+        assert not report["errors"], report["errors"][:5]
+
+        start = time.perf_counter()
+        exported = sum(chunk.count("\n") for chunk in bulk.export_nodes(db, "csv")) - 1
+        export_seconds = time.perf_counter() - start
+
+        print(f"{size:>8} {import_seconds:>9.2f} {size / import_seconds:>10.0f} "
+              f"{export_seconds:>9.2f} {exported / export_seconds:>10.0f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 30_000])
@@ -0,0 +1,80 @@
+"""
+Fan-out of the hierarchy change feed to many subscribers on one event loop.
+
+Subscribes SUBSCRIBERS reader tasks to a fresh ChangeFeed, a few of which
+read slowly enough to overflow their queues, then publishes EVENTS events
+from a separate thread (as the sync write routes do) at RATE events/s.
+Reports publish-to-delivery latency for the prompt readers, deliveries per
+second and how many slow readers were evicted. Readers only look up the publish time of each
+event, so this measures the feed itself, not socket writes.
+
+    python -m benchmarks.bench_change_feed [subscribers] [events] [rate]
+"""
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+from app.change_feed import ChangeFeed
+
+SLOW_READERS = 10
+SLOW_DELAY = 0.05
+
+
+async def reader(subscription, sent_at, events, latencies, slow):
+    while True:
+        item = await subscription.get()
+        if item is None:
+            return
+        seq = int(item[0].rpartition("-")[2])
+        if slow:
+            await asyncio.sleep(SLOW_DELAY)
+        else:
+            latencies.append(time.perf_counter() - sent_at[seq])
+        if seq == events:
+            return
+
+
+def publisher(feed, sent_at, events, rate):
+    interval = 1 / rate
+    start = time.perf_counter()
+    for seq in range(1, events + 1):
+        delay = start + seq * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sent_at[seq] = time.perf_counter()
+        feed.publish({"type": "rename", "node_id": seq, "node_name": f"Node {seq}"})
+
+
+async def run(subscribers, events, rate):
+    feed = ChangeFeed()
+    sent_at, latencies, tasks = {}, [], []
+    for i in range(subscribers):
+        subscription, _ = feed.subscribe()
+        tasks.append(asyncio.create_task(reader(subscription, sent_at, events, latencies, i < SLOW_READERS)))
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=publisher, args=(feed, sent_at, events, rate))
+    thread.start()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    return feed, latencies, elapsed
+
+
+def main(subscribers, events, rate):
+    feed, latencies, elapsed = asyncio.run(run(subscribers, events, rate))
+    latencies.sort()
+    print(f"{subscribers} subscribers ({SLOW_READERS} slow), {events} events at {rate}/s")
+    print(f"deliveries: {len(latencies)} in {elapsed:.2f} s ({len(latencies) / elapsed:,.0f}/s)")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000:.2f} ms")
+    print(f"evicted: {feed.evictions}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 50)
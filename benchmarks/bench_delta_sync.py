@@ -0,0 +1,85 @@
+"""
+Delta sync from the change log versus re-downloading every node.
+
+Imports a site/line/asset hierarchy of NODES nodes into a SQLite file,
+notes the hierarchy version, then applies rounds of renames (logged the way
+the write routes do) and compares, for each round, fetching and encoding
+GET /api/nodes/changes?since=<version> against the full GET /api/nodes
+payload: response bytes and median latency.
+
+    python -m benchmarks.bench_delta_sync [nodes]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app import bulk, change_log
+from app.database import Base
+from app.models import NodeData
+from app.routes.node_routes import encode_value
+from benchmarks.bench_bulk_import import synthetic_rows
+from benchmarks.common import timed
+
+CHANGES = (10, 100, 1000, 10000)
+REPEAT = 5
+
+
+def full_download(db):
+    rows = [dict(row._mapping) for row in db.execute(select(NodeData.__table__).order_by(NodeData.node_id))]
+    return json.dumps(rows, default=encode_value).encode()
+
+
+def delta(db, since):
+    return json.dumps(change_log.changes_since(db, since), default=encode_value).encode()
+
+
+def rename(db, node_ids):
+    version = change_log.next_version(db)
+    db.execute(text("UPDATE node_data SET node_name = node_name || '*' WHERE node_id = :id"),
+               [{"id": node_id} for node_id in node_ids])
+    change_log.record(db, version, "update", node_ids)
+    db.commit()
+
+
+def main(nodes):
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        bulk.import_rows(db, synthetic_rows(nodes), version=change_log.next_version(db))
+        db.commit()
+        change_log.prune(db)  # the initial import, compacted as it would be in production
+        db.commit()
+        all_ids = [row[0] for row in db.execute(text("SELECT node_id FROM node_data"))]
+
+        full_seconds, body = timed(lambda: full_download(db), REPEAT)
+        full_bytes = len(body)
+        print(f"{nodes} nodes; full download: {full_bytes / 1024:,.0f} KiB, {full_seconds * 1000:.1f} ms")
+        print(f"{'changed':>8} {'delta KiB':>10} {'delta ms':>9} {'bytes %':>8} {'speedup':>8}")
+        for count in CHANGES:
+            since = change_log.current(db)[0]
+            changed = rng.sample(all_ids, count)
+            for i in range(0, count, 100):  # one write per 100 nodes, like a burst of edits
+                rename(db, changed[i:i + 100])
+            seconds, body = timed(lambda: delta(db, since), REPEAT)
+            size = len(body)
+            print(f"{count:>8} {size / 1024:>10,.1f} {seconds * 1000:>9.1f} "
+                  f"{size / full_bytes * 100:>7.2f}% {full_seconds / seconds:>7.0f}x")
+
+        start = time.perf_counter()
+        result = change_log.prune(db, retention_days=0)
+        db.commit()
+        print(f"prune everything: {result} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,84 @@
+"""
+Round trips and wall time of subtree resolution on a local SQLite stand-in.
+
+Compares the old one-SELECT-per-node walk with the closure-table lookup
+behind app.crud.get_descendants.
+
+    python -m benchmarks.bench_descendants [sizes...]
+"""
+import sys
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.crud import get_descendants
+from benchmarks.common import write_nodes
+
+FANOUT = 10
+# parent_id is unindexed, so the legacy walk is quadratic; skip it on big trees
+LEGACY_LIMIT = 20_000
+
+
+def legacy_descendants(db, parent_id):
+    query = text("SELECT node_id FROM node_data WHERE parent_id = :parent_id")
+    all_ids = []
+    for child in db.execute(query, {"parent_id": parent_id}).fetchall():
+        all_ids.append(child[0])
+        all_ids.extend(legacy_descendants(db, child[0]))
+    return all_ids
+
+
+def build_db(size):
+    engine = create_engine("sqlite://")
+    rows = [{"node_id": 1, "parent_id": None, "node_name": "root", "is_deleted": False}]
+    for node_id in range(2, size + 2):
+        rows.append({
+            "node_id": node_id,
+            "parent_id": (node_id - 2) // FANOUT + 1,
+            "node_name": f"node {node_id}",
+            "is_deleted": False,
+        })
+    write_nodes(engine, rows)
+    return engine
+
+
+def measure(engine, fn):
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = sessionmaker(bind=engine)()
+    try:
+        start = time.perf_counter()
+        found = len(fn(db))
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+    return found, statements, elapsed
+
+
+def main(sizes):
+    print(f"{'subtree':>8} {'mode':>8} {'found':>8} {'queries':>8} {'seconds':>9}")
+    for size in sizes:
+        engine = build_db(size)
+        cases = [
+            ("legacy", lambda db: legacy_descendants(db, 1)),
+            ("ids", lambda db: get_descendants(db, 1, return_objects=False)),
+            ("objects", lambda db: get_descendants(db, 1, return_objects=True)),
+        ]
+        for mode, fn in cases:
+            if mode == "legacy" and size > LEGACY_LIMIT:
+                print(f"{size:>8} {mode:>8} {'skipped':>8}")
+                continue
+            found, statements, elapsed = measure(engine, fn)
+            print(f"{size:>8} {mode:>8} {found:>8} {statements:>8} {elapsed:>9.3f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,77 @@
+"""
+Insert/update throughput with and without batched parameter execution.
+
+Runs against DATABASE_URL when set (e.g. an MSSQL test database, where
+fast_executemany applies), otherwise a temporary SQLite file.
+
+    python -m benchmarks.bench_executemany [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import delete, insert, update, bindparam
+
+from app.database import Base, make_engine
+from app.models import NodeData
+
+node_table = NodeData.__table__
+
+
+def timed(engine, fn):
+    with engine.begin() as conn:
+        conn.execute(delete(node_table))
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        fn(conn)
+    return time.perf_counter() - start
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = os.getenv("DATABASE_URL") or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = make_engine(url)
+        Base.metadata.create_all(engine)
+
+        params = [{"parent_id": None, "node_name": f"Asset {i}", "is_deleted": False} for i in range(rows)]
+
+        def seed(conn):
+            conn.execute(insert(node_table), params)
+
+        def row_updates(conn):
+            seed(conn)
+            ids = [r.node_id for r in conn.execute(node_table.select())]
+            stmt = update(node_table).where(node_table.c.node_id == bindparam("id")).values(node_name=bindparam("name"))
+            for node_id in ids:
+                conn.execute(stmt, {"id": node_id, "name": "renamed"})
+
+        def batched_updates(conn):
+            seed(conn)
+            ids = [r.node_id for r in conn.execute(node_table.select())]
+            stmt = update(node_table).where(node_table.c.node_id == bindparam("id")).values(node_name=bindparam("name"))
+            conn.execute(stmt, [{"id": node_id, "name": "renamed"} for node_id in ids])
+
+        cases = [
+            ("insert, one per row", lambda conn: [conn.execute(insert(node_table), p) for p in params]),
+            ("insert, executemany", seed),
+            ("insert+returning, row by row",
+             lambda conn: [conn.execute(insert(node_table).returning(node_table.c.node_id), p).all() for p in params]),
+            ("insert+returning, batched",
+             lambda conn: conn.execute(insert(node_table).returning(node_table.c.node_id), params).all()),
+        ]
+        print(f"{'case':>30} {'seconds':>8} {'rows/sec':>10}")
+        for label, fn in cases:
+            elapsed = timed(engine, fn)
+            print(f"{label:>30} {elapsed:>8.3f} {rows / elapsed:>10.0f}")
+
+        # updates include a batched seed, so report the update part only
+        seed_time = timed(engine, seed)
+        for label, fn in (("update, one per row", row_updates), ("update, executemany", batched_updates)):
+            elapsed = timed(engine, fn) - seed_time
+            print(f"{label:>30} {elapsed:>8.3f} {rows / elapsed:>10.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,74 @@
+"""
+Telemetry ingestion throughput on one core.
+
+Publishes simulator payloads through the in-process FakeBroker into a
+ReadingIngestor writing to a SQLite file, as fast as the subscriber accepts
+them, then waits for the last flush. Reports end-to-end messages/sec (parse,
+validate, buffer and insert), drops and flush latency, plus the validation
+cost on its own.
+
+    python -m benchmarks.bench_ingest [messages] [nodes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from app.database import Base
+from app.ingest import ReadingIngestor, parse_reading, readings_table
+from app.mqtt_simulator import TOPIC_TEMPLATE, FakeBroker, Simulator
+
+TARGET_RATE = 10_000
+
+
+def payloads(messages, nodes):
+    sim = Simulator(FakeBroker(), list(range(1, nodes + 1)))
+    topics = [TOPIC_TEMPLATE.format(node_id=i % nodes + 1) for i in range(messages)]
+    return list(zip(topics, sim.payloads(messages, "2026-01-01T00:00:00.000000")))
+
+
+def main(messages, nodes):
+    messages_list = payloads(messages, nodes)
+
+    start = time.perf_counter()
+    for topic, payload in messages_list:
+        parse_reading(topic, payload)
+    parse_rate = messages / (time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+
+        broker = FakeBroker()
+        ingestor = ReadingIngestor(engine, batch_size=5000, flush_seconds=0.5, max_buffer=200_000)
+        broker.subscribe("node/+/metrics", ingestor.handle)
+        ingestor.start()
+
+        start = time.perf_counter()
+        for topic, payload in messages_list:
+            broker.publish(topic, payload)
+        accepted = time.perf_counter() - start
+        ingestor.stop()
+        elapsed = time.perf_counter() - start
+
+        with engine.connect() as conn:
+            stored = conn.execute(select(func.count()).select_from(readings_table)).scalar()
+        engine.dispose()
+
+    stats = ingestor.stats()
+    rate = stored / elapsed
+    print(f"{messages} messages from {nodes} nodes")
+    print(f"validation only:      {parse_rate:>10.0f} msg/s")
+    print(f"subscriber accepted:  {messages / accepted:>10.0f} msg/s")
+    print(f"end to end (stored):  {rate:>10.0f} msg/s  "
+          f"[{'ok' if rate >= TARGET_RATE else 'below'} vs {TARGET_RATE} target]")
+    print(f"stored {stored}, dropped {stats['dropped']}, invalid {stats['invalid']}, "
+          f"{stats['flushes']} flushes, "
+          f"avg flush {stats['flush_seconds_total'] / max(stats['flushes'], 1) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
@@ -0,0 +1,94 @@
+"""
+Latency of live subtree summaries from the in-memory ring buffers.
+
+Seeds a plant -> lines -> sensors hierarchy into SQLite, fills every
+sensor's ring buffer, and times LiveReadingStore.summary() for the plant
+(every sensor), one line and one sensor. Also reports the cost of rebuilding
+the subtree index after a hierarchy change and of ingesting a batch.
+
+    python -m benchmarks.bench_live_summary [sensors] [lines]
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.live_readings import LIVE_HISTORY, LiveReadingStore
+from app.models import NodeData
+from app.tree_cache import tree_cache
+from benchmarks.common import percentile, samples
+
+REPEAT = 200
+TARGET_MS = 10
+
+
+def seed(db, sensors, lines):
+    rows = [{"node_id": 1, "parent_id": None, "node_name": "Plant", "is_deleted": False}]
+    rows += [{"node_id": 1 + i, "parent_id": 1, "node_name": f"Line {i}", "is_deleted": False}
+             for i in range(1, lines + 1)]
+    first_sensor = lines + 2
+    rows += [{"node_id": first_sensor + i, "parent_id": 2 + i % lines, "node_name": f"Sensor {i}",
+              "is_deleted": False}
+             for i in range(sensors)]
+    db.execute(insert(NodeData), rows)
+    db.commit()
+    return list(range(first_sensor, first_sensor + sensors))
+
+
+def readings(sensor_ids, now):
+    rng = np.random.default_rng(1)
+    statuses = np.array(["OK", "Warning", "Error"])[rng.choice(3, len(sensor_ids), p=[0.9, 0.07, 0.03])]
+    return [
+        {"node_id": node_id, "recorded_at": now, "temperature": float(temp), "humidity": 50.0,
+         "pressure": 1000.0, "status": status}
+        for node_id, temp, status in zip(sensor_ids, rng.uniform(20, 30, len(sensor_ids)), statuses)
+    ]
+
+
+def timed(fn):
+    """(p50, p99) seconds over REPEAT calls."""
+    seconds, _ = samples(fn, REPEAT)
+    return statistics.median(seconds), percentile(seconds, 0.99)
+
+
+def main(sensors, lines):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    sensor_ids = seed(db, sensors, lines)
+
+    store = LiveReadingStore()
+    now = datetime.utcnow()
+    batches = [readings(sensor_ids, now - timedelta(seconds=LIVE_HISTORY - step)) for step in range(LIVE_HISTORY)]
+    start = time.perf_counter()
+    for batch in batches:
+        store.add_rows(batch)
+    ingest = (time.perf_counter() - start) / LIVE_HISTORY
+    print(f"{sensors} sensors under {lines} lines, {LIVE_HISTORY} readings each")
+    print(f"ingest batch of {sensors}: {ingest * 1000:.1f} ms")
+
+    tree_cache.invalidate()
+    start = time.perf_counter()
+    store.index.refresh(db)
+    print(f"subtree index rebuild: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'summary of':>18} {'sensors':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, node_id in (("plant", 1), ("line", 2), ("sensor", sensor_ids[0])):
+        count = store.summary(db, node_id)["reporting"]
+        p50, p99 = timed(lambda: store.summary(db, node_id))
+        print(f"{label:>18} {count:>8} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+    p50, _ = timed(lambda: store.summary(db, 1, max_age=60))
+    print(f"{'plant, max_age':>18} {sensors:>8} {p50 * 1000:>8.2f}")
+    print(f"target: under {TARGET_MS} ms for {sensors} sensors")
+    db.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,134 @@
+"""
+Login storm: login throughput and tree-read latency while hundreds of
+operators log in at once.
+
+Compares bcrypt run inline on the request threadpool (the old behaviour)
+with app.hashing's bounded process pool. Tree readers keep polling
+GET /api/nodes/tree for as long as the storm lasts; logins refused with 503
+by the pool's backpressure are counted separately.
+
+    BCRYPT_ROUNDS=12 python -m benchmarks.bench_login [logins] [concurrency]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+
+import httpx
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine
+
+from app import auth, database
+from app.hashing import HashPool, hash_password, verify_and_update
+from app.routes import auth_routes, node_routes
+from benchmarks.common import percentile, seed_file, session_dependency
+
+NODES = 2_000
+TREE_READERS = 8
+PASSWORD = "correct horse battery"
+
+
+class InlineHashing:
+    """Old behaviour: hash on whichever threadpool thread runs the request."""
+
+    async def hash(self, password):
+        return await run_in_threadpool(hash_password, password)
+
+    async def verify(self, plain_password, hashed_password):
+        return await run_in_threadpool(verify_and_update, plain_password, hashed_password)
+
+
+def seed(path):
+    seed_file(path, [
+        {"node_id": i, "parent_id": None if i == 1 else (i // 10 or 1), "node_name": f"Asset {i}",
+         "is_deleted": False}
+        for i in range(1, NODES + 1)
+    ], users=[{"username": "operator", "hashed_password": hash_password(PASSWORD)}])
+
+
+def build_app(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                           pool_size=50, max_overflow=50)
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/api")
+    app.include_router(node_routes.router, prefix="/api")
+    app.dependency_overrides[database.get_db] = session_dependency(engine)
+    app.dependency_overrides[node_routes.get_current_user] = lambda: "bench"
+    return app, engine.dispose
+
+
+async def storm(app, logins, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.get("/api/nodes/tree")  # build the tree cache up front
+        remaining = logins
+        outcomes = {"ok": 0, "busy": 0}
+        tree_latencies = []
+        done = asyncio.Event()
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.post("/api/token", json={"username": "operator", "password": PASSWORD})
+                if response.status_code == 503:
+                    outcomes["busy"] += 1
+                    await asyncio.sleep(float(response.headers["Retry-After"]))
+                    remaining += 1
+                else:
+                    assert response.status_code == 200, response.text
+                    outcomes["ok"] += 1
+
+        async def tree_reader():
+            while not done.is_set():
+                start = time.perf_counter()
+                response = await client.get("/api/nodes/tree")
+                tree_latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+
+        readers = [asyncio.create_task(tree_reader()) for _ in range(TREE_READERS)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*readers)
+
+    tree_latencies.sort()
+    return {
+        "logins_per_s": outcomes["ok"] / elapsed,
+        "busy": outcomes["busy"],
+        "tree_p50": statistics.median(tree_latencies),
+        "tree_p99": percentile(tree_latencies, 0.99),
+        "tree_reads": len(tree_latencies),
+    }
+
+
+def main(logins, concurrency):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path)
+        print(f"bcrypt rounds {os.environ['BCRYPT_ROUNDS']}, {logins} logins, "
+              f"{concurrency} concurrent, {TREE_READERS} tree readers")
+        print(f"{'mode':>7} {'logins/s':>9} {'503s':>6} {'tree reads':>11} {'tree p50 ms':>12} {'tree p99 ms':>12}")
+        pool = HashPool()
+        pool.start()
+        try:
+            for mode, hashing in (("inline", InlineHashing()), ("pool", pool)):
+                auth.hash_pool = hashing
+                app, dispose = build_app(path)
+                result = asyncio.run(storm(app, logins, concurrency))
+                dispose()
+                print(f"{mode:>7} {result['logins_per_s']:>9.1f} {result['busy']:>6} {result['tree_reads']:>11} "
+                      f"{result['tree_p50'] * 1000:>12.1f} {result['tree_p99'] * 1000:>12.1f}")
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,66 @@
+"""
+Overhead of MetricsMiddleware and the SQL event hooks.
+
+Runs the same request mix against two otherwise identical apps, one plain
+and one instrumented like app.main, and reports the per-request difference.
+
+    python -m benchmarks.bench_metrics [requests]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from app.metrics import MetricsMiddleware, instrument_engine
+from app.routes import node_routes
+from benchmarks.common import seed_file, session_dependency, star_rows
+
+NODES = 2_000
+PATHS = ["/api/nodes?limit=20", "/api/nodes/1/subtree?depth=1", "/api/nodes/search?q=sset 1"]
+
+
+def build_app(path, instrumented):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    app = FastAPI()
+    if instrumented:
+        instrument_engine(engine, name=f"bench-{id(engine)}")
+        app.add_middleware(MetricsMiddleware, slow_request_seconds=None)
+    app.include_router(node_routes.router, prefix="/api")
+    app.dependency_overrides[node_routes.get_db] = session_dependency(engine)
+    app.dependency_overrides[node_routes.get_current_user] = lambda: "bench"
+    return app
+
+
+def run(client, requests):
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        client.get(PATHS[i % len(PATHS)])
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), statistics.mean(samples)
+
+
+def main(requests):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed_file(path, star_rows(NODES))
+        results = {}
+        for label, instrumented in (("plain", False), ("instrumented", True)):
+            with TestClient(build_app(path, instrumented)) as client:
+                run(client, 100)  # warm up
+                results[label] = run(client, requests)
+        print(f"{'mode':>13} {'median us':>10} {'mean us':>10}")
+        for label, (median, mean) in results.items():
+            print(f"{label:>13} {median * 1e6:>10.0f} {mean * 1e6:>10.0f}")
+        overhead = results["instrumented"][0] - results["plain"][0]
+        print(f"overhead per request: {overhead * 1e6:.0f} us "
+              f"({overhead / results['plain'][0] * 100:.1f}% of median)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
@@ -0,0 +1,87 @@
+"""
+Latency of POST /api/nodes/{id}/move for subtrees of 10 to 100k nodes.
+
+Builds one SQLite hierarchy holding a balanced subtree (fan-out 10) of each
+size next to a target branch, then moves every subtree under the target and
+back REPEAT times through the ASGI app, reporting the median time and SQL
+statements per move. Each move rewrites the subtree's node_closure rows
+(old ancestors out, new ancestors in), so cost grows with subtree size
+times depth; the cycle check is one indexed lookup.
+
+    python -m benchmarks.bench_move [sizes...]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_suite import StatementCounter, bench_app, write_database
+
+FANOUT = 10
+TARGET_DEPTH = 4
+REPEAT = 3
+
+
+def build_rows(sizes):
+    rows = [(1, None, "Enterprise")]
+    parent_id = 1
+    for level in range(TARGET_DEPTH):
+        rows.append((len(rows) + 1, parent_id, f"Target {level}"))
+        parent_id = len(rows)
+    target_id = parent_id
+    groups = {}
+    for size in sizes:
+        group_id = len(rows) + 1
+        rows.append((group_id, 1, f"Group {size}"))
+        groups[size] = group_id
+        queue, made = [group_id], 1
+        while made < size:
+            parent = queue.pop(0)
+            for _ in range(min(FANOUT, size - made)):
+                rows.append((len(rows) + 1, parent, f"Node {len(rows) + 1}"))
+                queue.append(len(rows))
+                made += 1
+    return rows, target_id, groups
+
+
+async def run(app, counter, target_id, groups):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'subtree':>8} {'move ms':>9} {'back ms':>9} {'sql':>5}")
+        for size, group_id in groups.items():
+            there, back, statements = [], [], 0
+            for _ in range(REPEAT):
+                for parent_id, samples in ((target_id, there), (1, back)):
+                    counter.count = 0
+                    start = time.perf_counter()
+                    response = await client.post(f"/api/nodes/{group_id}/move", json={"parent_id": parent_id})
+                    samples.append(time.perf_counter() - start)
+                    assert response.status_code == 200 and response.json()["moved"] == size, response.text
+                    statements = counter.count
+            print(f"{size:>8} {statistics.median(there) * 1000:>9.1f} "
+                  f"{statistics.median(back) * 1000:>9.1f} {statements:>5}")
+
+        start = time.perf_counter()
+        response = await client.post("/api/nodes/1/move", json={"parent_id": groups[max(groups)] + 1})
+        assert response.status_code == 400
+        print(f"rejected cycle (root under its descendant): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def main(sizes):
+    rows, target_id, groups = build_rows(sizes)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        write_database(path, rows)
+        print(f"{len(rows)} nodes, target at depth {TARGET_DEPTH}")
+        app, engine = bench_app(path)
+        counter = StatementCounter(engine)
+        asyncio.run(run(app, counter, target_id, groups))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1_000, 10_000, 100_000])
@@ -0,0 +1,116 @@
+"""
+Path resolution throughput, cold and warm, on a plant hierarchy (see bench_suite).
+
+Resolves random asset paths ("Enterprise/Site 2/Area 3/Line 4/Asset 5")
+through GET /api/nodes/by-path one at a time (the cold run empties the
+path cache before every request) and through POST /api/nodes/resolve in
+batches, cold and then warm, and reports paths per second and SQL
+statements per path. The resolver itself is also timed without HTTP in
+front of it.
+
+    python -m benchmarks.bench_paths [nodes] [paths]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app import database
+from app.path_resolver import path_resolver
+from app.routes.node_routes import MAX_RESOLVE_PATHS
+from benchmarks.bench_suite import StatementCounter, bench_app, dataset
+
+SINGLE_REQUESTS = 2000
+
+
+def asset_paths(path, count, rng):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT node_id, parent_id, node_name FROM node_data WHERE is_deleted = 0").fetchall()
+    conn.close()
+    parents = {node_id: parent_id for node_id, parent_id, _ in rows}
+    names = {node_id: name for node_id, _, name in rows}
+
+    def path_of(node_id):
+        parts = []
+        while node_id in names:
+            parts.append(names[node_id])
+            node_id = parents[node_id]
+        return "/".join(reversed(parts))
+
+    assets = [node_id for node_id, name in names.items() if name.startswith("Asset")]
+    return [path_of(node_id) for node_id in rng.sample(assets, count)]
+
+
+def report(label, paths, seconds, statements):
+    print(f"{label:>28} {paths:>7} {paths / seconds:>12,.0f} {statements / paths:>11.3f}")
+
+
+async def run_http(path, paths):
+    app, engine = bench_app(path)
+    counter = StatementCounter(engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        singles = paths[:SINGLE_REQUESTS]
+        for label in ("GET /nodes/by-path (cold)", "GET /nodes/by-path (warm)"):
+            if "warm" in label:
+                await client.post("/api/nodes/resolve", json={"paths": singles})
+            counter.count = 0
+            start = time.perf_counter()
+            for node_path in singles:
+                if "cold" in label:
+                    path_resolver.clear()
+                response = await client.get("/api/nodes/by-path", params={"path": node_path})
+                assert response.status_code == 200, response.text
+            report(label, len(singles), time.perf_counter() - start, counter.count)
+
+        for label in ("POST /nodes/resolve (cold)", "POST /nodes/resolve (warm)"):
+            if "cold" in label:
+                path_resolver.clear()
+            counter.count = 0
+            start = time.perf_counter()
+            for i in range(0, len(paths), MAX_RESOLVE_PATHS):
+                response = await client.post("/api/nodes/resolve", json={"paths": paths[i:i + MAX_RESOLVE_PATHS]})
+                assert response.status_code == 200, response.text
+                assert all(r["node_id"] for r in response.json()["results"])
+            report(label, len(paths), time.perf_counter() - start, counter.count)
+    engine.dispose()
+
+
+def run_direct(path, paths):
+    app, engine = bench_app(path)
+    counter = StatementCounter(engine)
+    db = database.SessionLocal()
+    try:
+        for label in ("resolve_many (cold)", "resolve_many (warm)"):
+            if "cold" in label:
+                path_resolver.clear()
+            counter.count = 0
+            start = time.perf_counter()
+            found, _ = path_resolver.resolve_many(db, paths)
+            assert len(found) == len(set(paths))
+            report(label, len(paths), time.perf_counter() - start, counter.count)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main(nodes, count):
+    data_dir = os.path.join(tempfile.gettempdir(), "asset-hierarchy-bench")
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset(data_dir, "plant", nodes, 0, 50, 1)
+    paths = asset_paths(path, count, random.Random(1))
+    print(f"{len(paths)} asset paths on a {nodes}-node plant hierarchy")
+    print(f"{'mode':>28} {'paths':>7} {'paths/s':>12} {'stmts/path':>11}")
+    asyncio.run(run_http(path, paths))
+    run_direct(path, paths)
+    print(f"cache: {path_resolver.stats()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
@@ -0,0 +1,135 @@
+"""
+Read throughput as read replicas are added (app.replicas).
+
+Copies a plant hierarchy (see bench_suite) to a primary SQLite file and to
+one file per replica, then runs reader threads that take their sessions from
+ReplicaSet.read_session() and load a random area's subtree the way
+GET /nodes/{id}/subtree does (hierarchy.load_subtrees), for a fixed time per
+replica count. Every database gets a pool of POOL connections and no
+overflow, standing in for a database server's capacity. The replicas are
+plain copies: replication itself is the database's job and is not modelled.
+
+Each replica count runs twice: reads alone, and with a writer thread on the
+primary soft-deleting and restoring subtrees back to back, like the write
+routes do. Reads/s on one database file are bounded by the CPUs the SQLite
+calls get (sqlite3 releases the GIL while a statement runs) and by the
+writer's locks, so the scaling seen depends on both; nproc is printed.
+
+    python -m benchmarks.bench_replicas [nodes] [max replicas] [readers]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import hierarchy
+from app.replicas import ReplicaSet
+from benchmarks.bench_suite import dataset
+
+SECONDS = 3.0
+POOL = 2
+DEPTH = 2
+
+
+def make_engine(path):
+    return create_engine(f"sqlite:///{path}", pool_size=POOL, max_overflow=0, pool_timeout=300,
+                         connect_args={"check_same_thread": False, "timeout": 60})
+
+
+def writer(engine, area_ids, stop, counts):
+    rng = random.Random(2)
+    with engine.connect() as conn:
+        while not stop.is_set():
+            area_id = rng.choice(area_ids)
+            for is_deleted in (1, 0):
+                with conn.begin():
+                    conn.execute(text("UPDATE hierarchy_version SET version = version + 1 WHERE id = 1"))
+                    conn.execute(text("""
+                        UPDATE node_data SET is_deleted = :d
+                        WHERE node_id IN (SELECT descendant_id FROM node_closure WHERE ancestor_id = :id)
+                    """), {"d": is_deleted, "id": area_id})
+                counts["writes"] += 1
+
+
+def reader(replica_set, area_ids, stop, counts, seed):
+    rng = random.Random(seed)
+    done = 0
+    while not stop.is_set():
+        db = replica_set.read_session()
+        try:
+            hierarchy.load_subtrees(db, [rng.choice(area_ids)], DEPTH)
+        finally:
+            db.close()
+        done += 1
+    with counts["lock"]:
+        counts["reads"] += done
+
+
+def run(primary, replicas, area_ids, readers, with_writer):
+    engines = [make_engine(path) for path in replicas]
+    primary_engine = make_engine(primary)
+    # no lag check: the writer moves the primary's version on, the copies stay put
+    replica_set = ReplicaSet(engines, sessionmaker(bind=primary_engine), max_version_lag=10**9)
+    counts = {"reads": 0, "writes": 0, "lock": threading.Lock()}
+    stop = threading.Event()
+    threads = [threading.Thread(target=reader, args=(replica_set, area_ids, stop, counts, i))
+               for i in range(readers)]
+    if with_writer:
+        # its own connection, so it waits on the database's locks rather than on the readers' pool
+        writer_engine = create_engine(f"sqlite:///{primary}", connect_args={"timeout": 60})
+        threads.append(threading.Thread(target=writer, args=(writer_engine, area_ids, stop, counts)))
+    for thread in threads:
+        thread.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for engine in engines + [primary_engine]:
+        engine.dispose()
+    if with_writer:
+        writer_engine.dispose()
+    return counts["reads"] / SECONDS, counts["writes"] / SECONDS
+
+
+def main(nodes, max_replicas, readers):
+    data_dir = os.path.join(tempfile.gettempdir(), "asset-hierarchy-bench")
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset(data_dir, "plant", nodes, 0, 50, 1)
+    work = tempfile.mkdtemp(prefix="replicas-", dir=data_dir)
+    try:
+        primary = os.path.join(work, "primary.db")
+        shutil.copyfile(path, primary)
+        replicas = []
+        for i in range(1, max_replicas + 1):
+            replicas.append(os.path.join(work, f"replica-{i}.db"))
+            shutil.copyfile(path, replicas[-1])
+        engine = create_engine(f"sqlite:///{primary}")
+        with engine.connect() as conn:
+            area_ids = list(conn.execute(text("SELECT node_id FROM node_data WHERE node_name LIKE 'Area%'")).scalars())
+        engine.dispose()
+
+        print(f"plant, {nodes} nodes, {len(area_ids)} areas, subtree depth {DEPTH}, {readers} readers, "
+              f"pool {POOL} per database, {SECONDS:.0f} s per run, nproc {os.cpu_count()}")
+        print(f"{'replicas':>8} {'reads/s':>10} {'x':>6} {'reads/s, writer':>16} {'x':>6} {'writes/s':>9}")
+        base = base_writing = None
+        for count in range(max_replicas + 1):
+            reads, _ = run(primary, replicas[:count], area_ids, readers, False)
+            reads_writing, writes = run(primary, replicas[:count], area_ids, readers, True)
+            base = base or reads
+            base_writing = base_writing or reads_writing
+            print(f"{count:>8} {reads:>10,.0f} {reads / base:>6.2f} {reads_writing:>16,.0f} "
+                  f"{reads_writing / base_writing:>6.2f} {writes:>9,.0f}")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 8)
@@ -0,0 +1,115 @@
+"""
+Retention purge throughput and its effect on the read endpoints.
+
+Takes a plant hierarchy (see bench_suite) with a share of its nodes
+soft-deleted, back-dates every deletion past the retention period, and
+times the tree, search, listing and deleted-trees endpoints before and after
+app.retention.purge() hard-deletes them. Reports rows purged per second with
+and without the between-batch pause, on separate copies of the database.
+
+    python -m benchmarks.bench_retention [nodes] [deleted percent]
+"""
+import asyncio
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from app import database
+from app.retention import PURGE_BATCH_SIZE, PURGE_PAUSE_SECONDS, purge
+from app.search_index import search_index
+from app.tree_cache import tree_cache
+from benchmarks.bench_suite import SEARCH_TERMS, bench_app, dataset
+
+REPEAT = 5
+RETENTION_DAYS = 30
+
+ENDPOINTS = [
+    ("GET /nodes/tree (cold)", "/api/nodes/tree", lambda: tree_cache.invalidate()),
+    ("GET /nodes/search (index load)", "/api/nodes/search?q=asset+12", lambda: search_index.invalidate()),
+    ("GET /nodes/search", "/api/nodes/search?q=" + SEARCH_TERMS[1], None),
+    ("GET /nodes?limit=100", "/api/nodes?limit=100&after=50000", None),
+    ("GET /nodes/deleted-trees", "/api/nodes/deleted-trees", None),
+]
+
+
+async def time_endpoints(app):
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, url, before in ENDPOINTS:
+            samples = []
+            for _ in range(REPEAT):
+                if before:
+                    before()
+                start = time.perf_counter()
+                response = await client.get(url)
+                samples.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+            results[name] = statistics.median(samples) * 1000
+    return results
+
+
+def prepare(path, work):
+    shutil.copyfile(path, work)
+    conn = sqlite3.connect(work)
+    deleted_at = (datetime.utcnow() - timedelta(days=RETENTION_DAYS + 30)).isoformat(" ")
+    conn.execute("UPDATE node_data SET deleted_at = ? WHERE is_deleted = 1", (deleted_at,))
+    conn.commit()
+    counts = conn.execute("SELECT COUNT(*), SUM(is_deleted) FROM node_data").fetchone()
+    conn.close()
+    return counts
+
+
+def run_purge(work, pause):
+    app, engine = bench_app(work)
+    db = database.SessionLocal()
+    try:
+        result = purge(db, RETENTION_DAYS, PURGE_BATCH_SIZE, pause)
+    finally:
+        db.close()
+        engine.dispose()
+    return result
+
+
+def main(nodes, percent):
+    data_dir = os.path.join(tempfile.gettempdir(), "asset-hierarchy-bench")
+    os.makedirs(data_dir, exist_ok=True)
+    path = dataset(data_dir, "plant", nodes, percent, 50, 1)
+    work = path + ".retention"
+    try:
+        total, deleted = prepare(path, work)
+        print(f"plant, {total} nodes, {deleted} soft-deleted {RETENTION_DAYS + 30} days ago, "
+              f"retention {RETENTION_DAYS} days, batches of {PURGE_BATCH_SIZE}")
+
+        app, engine = bench_app(work)
+        before = asyncio.run(time_endpoints(app))
+        engine.dispose()
+
+        for pause in (0.0, PURGE_PAUSE_SECONDS):
+            if pause:
+                prepare(path, work)
+            result = run_purge(work, pause)
+            print(f"purge, pause {pause * 1000:.0f} ms: {result['purged']} rows in {result['batches']} batches, "
+                  f"{result['seconds']:.2f} s, {result['purged'] / result['seconds']:,.0f} rows/s")
+
+        app, engine = bench_app(work)
+        after = asyncio.run(time_endpoints(app))
+        engine.dispose()
+
+        print(f"\n{'endpoint':>32} {'before ms':>10} {'after ms':>10} {'change':>8}")
+        for name in before:
+            print(f"{name:>32} {before[name]:>10.2f} {after[name]:>10.2f} {(after[name] / before[name] - 1) * 100:>+7.1f}%")
+    finally:
+        os.remove(work)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,97 @@
+"""
+30-day metric queries: rollups at each resolution vs scanning raw readings.
+
+Seeds NODES sensors with one reading every INTERVAL seconds for 30 days into
+a SQLite file, backfills the rollups, then times app.rollups.series() for one
+node over the whole range at 1m, 1h and 1d against fetching that node's raw
+rows and aggregating them with the same NumPy code. Also times one
+incremental refresh after a fresh batch of readings.
+
+    python -m benchmarks.bench_rollups [nodes] [interval_seconds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+
+from app import rollups
+from app.database import Base
+from app.models import NodeReading
+from benchmarks.common import timed
+
+DAYS = 30
+REPEAT = 5
+START = 1_790_000_000 // 86400 * 86400
+
+
+def seed(engine, nodes, interval):
+    rng = np.random.default_rng(1)
+    steps = DAYS * 86400 // interval
+    table = NodeReading.__table__
+    for node_id in range(1, nodes + 1):
+        times = START + np.arange(steps) * interval + rng.integers(0, interval, steps)
+        temperature = 25 + 5 * np.sin(np.arange(steps) / 500) + rng.normal(0, 1, steps)
+        humidity = rng.integers(30, 71, steps)
+        pressure = rng.integers(990, 1026, steps)
+        with engine.begin() as conn:
+            conn.execute(insert(table), [
+                {"node_id": node_id, "recorded_at": rollups.from_epoch(t), "temperature": temp,
+                 "humidity": hum, "pressure": pres, "status": "OK"}
+                for t, temp, hum, pres in zip(times.tolist(), temperature.tolist(),
+                                              humidity.tolist(), pressure.tolist())
+            ])
+    return steps
+
+
+def main(nodes, interval):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        start = time.perf_counter()
+        per_node = seed(engine, nodes, interval)
+        print(f"seeded {nodes} nodes x {per_node} readings in {time.perf_counter() - start:.1f} s")
+
+        lo, hi = START, START + DAYS * 86400
+        now = hi + 86400  # every bucket closed
+        with engine.begin() as conn:
+            start = time.perf_counter()
+            rollups.backfill(conn, lo, hi)
+        print(f"backfill: {time.perf_counter() - start:.1f} s")
+
+        print(f"{'query (30 days, 1 node)':>26} {'points':>7} {'median ms':>10}")
+        with engine.connect() as conn:
+            for resolution in ("1h", "1d"):
+                size = rollups.RESOLUTIONS[resolution]
+                elapsed, result = timed(lambda: rollups.aggregate_raw(
+                    rollups.fetch_raw(conn, [1], lo, hi), size), REPEAT)
+                print(f"{'raw scan -> ' + resolution:>26} {len(result['bucket']):>7} {elapsed * 1000:>10.1f}")
+            for resolution in ("1m", "1h", "1d"):
+                elapsed, result = timed(lambda: rollups.series(conn, 1, resolution, lo, hi, now=now), REPEAT)
+                print(f"{'rollup ' + resolution:>26} {len(result['bucket']):>7} {elapsed * 1000:>10.1f}")
+            elapsed, points = timed(lambda: rollups.to_points(rollups.series(conn, 1, "1h", lo, hi, now=now)),
+                                    REPEAT)
+            print(f"{'rollup 1h + JSON points':>26} {len(points):>7} {elapsed * 1000:>10.1f}")
+
+        # one flush worth of new readings, one per node, in the last minute
+        maintainer = rollups.RollupMaintainer(engine)
+        batch = [
+            {"node_id": node_id, "recorded_at": rollups.from_epoch(hi - 30), "temperature": 25.0,
+             "humidity": 50.0, "pressure": 1000.0, "status": "OK"}
+            for node_id in range(1, nodes + 1)
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(NodeReading.__table__), batch)
+        maintainer.on_readings(batch)
+        start = time.perf_counter()
+        maintainer.refresh(now=hi)
+        print(f"incremental refresh after a {len(batch)}-reading batch: "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 30)
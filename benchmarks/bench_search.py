@@ -0,0 +1,58 @@
+"""
+Latency of the in-process trigram index versus the LIKE scan it replaced.
+
+    python -m benchmarks.bench_search [sizes...]
+"""
+import random
+import sys
+import time
+
+from sqlalchemy import create_engine, insert, text
+
+from app.models import NodeData
+from app.search_index import NodeSearchIndex
+from benchmarks.common import timed
+
+WORDS = ["Pump", "Valve", "Motor", "Sensor", "Line", "Tank", "Boiler", "Fan",
+         "Compressor", "Conveyor", "Mixer", "Heater", "Filter", "Gauge"]
+QUERIES = ["pump", "val", "motor 12", "nsor", "ank 9", "co", "conveyor 4"]
+REPEAT = 20
+
+
+def build_db(size):
+    rng = random.Random(42)
+    engine = create_engine("sqlite://")
+    NodeData.__table__.create(engine)
+    with engine.begin() as conn:
+        for start in range(0, size, 50_000):
+            conn.execute(insert(NodeData), [
+                {"node_id": node_id, "parent_id": None, "is_deleted": False,
+                 "node_name": f"{rng.choice(WORDS)} {rng.randint(1, 999)}"}
+                for node_id in range(start + 1, min(start + 50_000, size) + 1)
+            ])
+    return engine
+
+
+def main(sizes):
+    like = text("""
+        SELECT node_id, node_name FROM node_data
+        WHERE node_name LIKE :pattern AND is_deleted = 0
+        ORDER BY node_name LIMIT 20
+    """)
+    print(f"{'nodes':>9} {'query':>12} {'like ms':>9} {'index ms':>9}")
+    for size in sizes:
+        engine = build_db(size)
+        index = NodeSearchIndex()
+        with engine.connect() as conn:
+            start = time.perf_counter()
+            index.load(conn.execute(text("SELECT node_id, node_name FROM node_data")))
+            print(f"{size:>9} {'(load)':>12} {'':>9} {(time.perf_counter() - start) * 1000:>9.1f}")
+            for q in QUERIES:
+                like_ms = timed(lambda: conn.execute(like, {"pattern": f"%{q}%"}).fetchall(), REPEAT)[0] * 1000
+                index_ms = timed(lambda: index.search(q, limit=20), REPEAT)[0] * 1000
+                print(f"{size:>9} {q!r:>12} {like_ms:>9.2f} {index_ms:>9.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,412 @@
+"""
+Benchmark suite for the node endpoints on synthetic hierarchies.
+
+Generates a hierarchy of the requested shape and size into a SQLite file
+(cached in --data-dir, keyed by shape, size, deleted percentage, depth and
+seed), copies it to a scratch database and drives every node route through
+the ASGI app in-process. For each endpoint it reports latency percentiles,
+SQL statements per request and the peak Python heap of one request
+(tracemalloc). Read endpoints run first, then writes, ending with subtree
+soft deletes, so every run sees the same data.
+
+Shapes:
+    wide   every node directly under one root
+    deep   chains of --depth nodes under one root
+    plant  enterprise / site / area (10 per site) / line (10 per area) /
+           asset (50 per line)
+
+--deleted soft-deletes that percentage of nodes as whole subtrees, the way
+DELETE /api/nodes/{id} does. --json writes the results for a later
+--compare, which prints each endpoint's p50 against the baseline run.
+Needs neither MSSQL nor the network.
+
+    python -m benchmarks.bench_suite --shape plant --nodes 1000 100000 --json run.json
+    python -m benchmarks.bench_suite --shape plant --nodes 1000 100000 --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event
+
+from app import database
+from app.auth import get_current_user
+from app.database import Base
+from app.routes import node_routes
+from app.path_resolver import path_resolver
+from app.search_index import search_index
+from app.tree_cache import tree_cache
+
+SHAPES = ("wide", "deep", "plant")
+PLANT_LEVELS = (("Site", 10), ("Area", 10), ("Line", 50), ("Asset", 0))
+INSERT_CHUNK = 50_000
+HEAVY_REPEAT = 5  # full-table endpoints
+SEARCH_TERMS = ("asset 12", "line", "site 3", "area 4", "stage 9", "sset 77")
+
+
+# ---------- GENERATION ----------
+def generate(shape, nodes, depth):
+    """(node_id, parent_id, node_name) rows, parents before children; node 1 is the root."""
+    rows = [(1, None, "Enterprise")]
+    if shape == "wide":
+        rows += [(node_id, 1, f"Asset {node_id}") for node_id in range(2, nodes + 1)]
+    elif shape == "deep":
+        for node_id in range(2, nodes + 1):
+            parent_id = 1 if (node_id - 2) % depth == 0 else node_id - 1
+            rows.append((node_id, parent_id, f"Stage {node_id}"))
+    else:
+        def add(parent_id, level):
+            label, fanout = PLANT_LEVELS[level]
+            node_id = len(rows) + 1
+            rows.append((node_id, parent_id, f"{label} {node_id}"))
+            for _ in range(fanout):
+                if len(rows) >= nodes:
+                    return
+                add(node_id, level + 1)
+
+        while len(rows) < nodes:
+            add(1, 0)
+    return rows[:nodes]
+
+
+def pick_deleted(rows, percent, rng):
+    """Ids to soft-delete: random whole subtrees until percent of the nodes are covered."""
+    target = len(rows) * percent // 100
+    children = {}
+    for node_id, parent_id, _ in rows:
+        children.setdefault(parent_id, []).append(node_id)
+    deleted = set()
+    candidates = [node_id for node_id, _, _ in rows[1:]]
+    rng.shuffle(candidates)
+    for top in candidates:
+        if len(deleted) >= target:
+            break
+        if top in deleted:
+            continue
+        stack = [top]
+        while stack:
+            node_id = stack.pop()
+            deleted.add(node_id)
+            stack.extend(children.get(node_id, ()))
+    return deleted
+
+
+def build_database(path, shape, nodes, percent, depth, seed):
+    rng = random.Random(seed)
+    rows = generate(shape, nodes, depth)
+    write_database(path, rows, pick_deleted(rows, percent, rng))
+
+
+def write_database(path, rows, deleted=frozenset()):
+    """Create the schema at path and load rows (parents first) with their closure."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    # plain sqlite3 executemany: SQLAlchemy's per-row overhead dominates at 1M nodes
+    conn = sqlite3.connect(path)
+    parents = {}
+    node_rows, closure_rows = [], []
+
+    def flush(force=False):
+        if force or len(node_rows) >= INSERT_CHUNK:
+            conn.executemany("INSERT INTO node_data (node_id, parent_id, node_name, is_deleted, created_at) "
+                             "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)", node_rows)
+            node_rows.clear()
+        if force or len(closure_rows) >= INSERT_CHUNK:
+            conn.executemany("INSERT INTO node_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, ?)",
+                             closure_rows)
+            closure_rows.clear()
+
+    for node_id, parent_id, name in rows:
+        parents[node_id] = parent_id
+        node_rows.append((node_id, parent_id, name, node_id in deleted))
+        ancestor, level = node_id, 0
+        while ancestor is not None:
+            closure_rows.append((ancestor, node_id, level))
+            ancestor, level = parents[ancestor], level + 1
+        flush()
+    flush(force=True)
+    conn.commit()
+    conn.close()
+
+
+def dataset(data_dir, shape, nodes, percent, depth, seed):
+    name = f"{shape}-{nodes}-{percent}pct-d{depth}-s{seed}.db" if shape == "deep" else \
+        f"{shape}-{nodes}-{percent}pct-s{seed}.db"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        build_database(path + ".tmp", shape, nodes, percent, depth, seed)
+        os.replace(path + ".tmp", path)
+        print(f"generated {name} in {time.perf_counter() - start:.1f} s")
+    return path
+
+
+# ---------- APP ----------
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, *args):
+        self.count += 1
+
+
+def bench_app(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    # routes that stream open their own sessions from SessionLocal
+    database.SessionLocal.configure(bind=engine)
+    app = FastAPI()
+    app.include_router(node_routes.router, prefix="/api")
+    app.dependency_overrides[get_current_user] = lambda: "bench"
+    tree_cache.invalidate()
+    search_index.invalidate()
+    path_resolver.clear()
+    return app, engine
+
+
+class Context:
+    """What the request builders draw ids and names from; writes append to it."""
+
+    def __init__(self, path, rng):
+        conn = sqlite3.connect(path)
+        live = conn.execute("SELECT node_id, node_name, parent_id FROM node_data WHERE is_deleted = 0").fetchall()
+        self.live_ids = [node_id for node_id, _, _ in live]
+        self.names = {node_id: name for node_id, name, _ in live}
+        self.parents = {node_id: parent_id for node_id, _, parent_id in live}
+        self.internal_ids = [row[0] for row in conn.execute(
+            "SELECT DISTINCT parent_id FROM node_data WHERE is_deleted = 0 AND parent_id > 1")]
+        self.max_id = conn.execute("SELECT MAX(node_id) FROM node_data").fetchone()[0]
+        conn.close()
+        self.rng = rng
+        self.created = []
+        self.queues = {}
+        self.serial = 0
+
+    def live_id(self):
+        return self.rng.choice(self.live_ids)
+
+    def path(self, node_id):
+        names = []
+        while node_id in self.names:
+            names.append(self.names[node_id])
+            node_id = self.parents[node_id]
+        return "/".join(reversed(names))
+
+    def next_name(self):
+        self.serial += 1
+        return f"Bench {self.serial}"
+
+    def take(self, queue):
+        """Next created node for a write step; each step walks the created nodes in order."""
+        position = self.queues.get(queue, 0)
+        self.queues[queue] = position + 1
+        return self.created[position % len(self.created)]
+
+
+def created(ctx, response):
+    if response.status_code == 200:
+        ctx.created.append(response.json()["node_id"])
+
+
+def import_body(ctx):
+    return "".join(
+        json.dumps({"node_name": ctx.next_name(), "parent_id": ctx.live_id()}) + "\n" for _ in range(100)
+    )
+
+
+def subtree_delete_target(ctx):
+    return ctx.internal_ids.pop(ctx.rng.randrange(len(ctx.internal_ids))) if ctx.internal_ids else ctx.live_id()
+
+
+# (name, heavy, request builder -> (method, url, kwargs), before each request, after each response)
+SCENARIOS = [
+    ("GET /nodes?limit=100", False,
+     lambda ctx: ("GET", f"/api/nodes?limit=100&after={ctx.rng.randrange(ctx.max_id)}", {}), None, None),
+    ("GET /nodes", True, lambda ctx: ("GET", "/api/nodes", {}), None, None),
+    ("GET /nodes?format=ndjson", True, lambda ctx: ("GET", "/api/nodes?format=ndjson", {}), None, None),
+    ("GET /nodes/tree (cold)", True, lambda ctx: ("GET", "/api/nodes/tree", {}),
+     lambda ctx: tree_cache.invalidate(), None),
+    ("GET /nodes/tree (cached)", False, lambda ctx: ("GET", "/api/nodes/tree", {}), None, None),
+    ("GET /nodes/roots?depth=2", False, lambda ctx: ("GET", "/api/nodes/roots?depth=2", {}), None, None),
+    ("GET /nodes/{id}/subtree?depth=2", False,
+     lambda ctx: ("GET", f"/api/nodes/{ctx.live_id()}/subtree?depth=2", {}), None, None),
+    ("GET /nodes/search", False,
+     lambda ctx: ("GET", "/api/nodes/search", {"params": {"q": ctx.rng.choice(SEARCH_TERMS)}}), None, None),
+    ("GET /nodes/by-path", False,
+     lambda ctx: ("GET", "/api/nodes/by-path", {"params": {"path": ctx.path(ctx.live_id())}}), None, None),
+    ("POST /nodes/resolve (1000 paths)", False,
+     lambda ctx: ("POST", "/api/nodes/resolve", {"json": {"paths": [
+         ctx.path(ctx.live_id()) for _ in range(1000)]}}), None, None),
+    ("GET /nodes/deleted-trees", True, lambda ctx: ("GET", "/api/nodes/deleted-trees", {}), None, None),
+    ("GET /nodes/export?format=csv", True, lambda ctx: ("GET", "/api/nodes/export?format=csv", {}), None, None),
+    ("GET /nodes/changes", False, lambda ctx: ("GET", "/api/nodes/changes?since=0", {}), None, None),
+    ("GET /nodes/{id}/live-summary", False,
+     lambda ctx: ("GET", f"/api/nodes/{ctx.live_id()}/live-summary", {}), None, None),
+    ("GET /nodes/{id}/metrics", False,
+     lambda ctx: ("GET", f"/api/nodes/{ctx.live_id()}/metrics", {"params": {
+         "from": (datetime.utcnow() - timedelta(days=1)).isoformat()}}), None, None),
+    ("POST /nodes", False,
+     lambda ctx: ("POST", "/api/nodes", {"json": {"parent_name": ctx.names[ctx.live_id()],
+                                                   "node_name": ctx.next_name()}}), None, created),
+    ("PUT /nodes/{id}", False,
+     lambda ctx: ("PUT", f"/api/nodes/{ctx.take('rename')}",
+                  {"json": {"parent_name": ctx.names[ctx.live_id()], "node_name": ctx.next_name()}}), None, None),
+    ("POST /nodes/{id}/move", False,
+     lambda ctx: ("POST", f"/api/nodes/{ctx.take('move')}/move", {"json": {"parent_id": ctx.live_id()}}),
+     None, None),
+    ("POST /nodes/batch (20 renames)", False,
+     lambda ctx: ("POST", "/api/nodes/batch", {"json": {"operations": [
+         {"op": "rename", "node_id": ctx.take("batch"), "node_name": ctx.next_name()} for _ in range(20)]}}),
+     None, None),
+    ("DELETE /nodes/{id}", False, lambda ctx: ("DELETE", f"/api/nodes/{ctx.take('delete')}", {}), None, None),
+    ("PUT /nodes/restore/{id}", False,
+     lambda ctx: ("PUT", f"/api/nodes/restore/{ctx.take('restore')}", {}), None, None),
+    ("POST /nodes/import (100 rows)", False,
+     lambda ctx: ("POST", "/api/nodes/import?format=ndjson", {"content": import_body(ctx)}), None, None),
+    ("DELETE /hard-nodes/{id}", False,
+     lambda ctx: ("DELETE", f"/api/hard-nodes/{ctx.take('hard_delete')}", {}), None, None),
+    ("DELETE /nodes/{id} (subtree)", False,
+     lambda ctx: ("DELETE", f"/api/nodes/{subtree_delete_target(ctx)}", {}), None, None),
+]
+
+
+# ---------- RUNNING ----------
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def run_scenario(client, ctx, counter, scenario, repeat):
+    name, heavy, build, before, after = scenario
+    repeat = min(repeat, HEAVY_REPEAT) if heavy else repeat
+    latencies, statements, errors, peak = [], [], 0, 0.0
+    # request 0 is the warm-up and is the one measured for memory
+    for i in range(repeat + 1):
+        if before:
+            before(ctx)
+        method, url, kwargs = build(ctx)
+        if i == 0:
+            tracemalloc.start()
+        counter.count = 0
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+        if i == 0:
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        if response.status_code >= 400:
+            errors += 1
+        if after:
+            after(ctx, response)
+        if i > 0:
+            latencies.append(elapsed)
+            statements.append(counter.count)
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "sql_per_request": statistics.mean(statements),
+        "peak_mib": peak,
+    }
+
+
+async def run_dataset(path, repeat, only, seed):
+    work = path + ".run"
+    shutil.copyfile(path, work)
+    try:
+        app, engine = bench_app(work)
+        counter = StatementCounter(engine)
+        ctx = Context(work, random.Random(seed))
+        results = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for scenario in SCENARIOS:
+                if only and not any(part.lower() in scenario[0].lower() for part in only):
+                    continue
+                results.append(await run_scenario(client, ctx, counter, scenario, repeat))
+        engine.dispose()
+        return results
+    finally:
+        os.remove(work)
+
+
+def print_results(results, baseline):
+    header = f"{'endpoint':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'sql':>6} {'peak MiB':>9} {'err':>4}"
+    if baseline is not None:
+        header += f" {'base p50':>9} {'change':>8}"
+    print(header)
+    for r in results:
+        line = (f"{r['endpoint']:<32} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                f"{r['max_ms']:>9.2f} {r['sql_per_request']:>6.1f} {r['peak_mib']:>9.2f} {r['errors']:>4}")
+        base = baseline.get(r["endpoint"]) if baseline is not None else None
+        if base:
+            line += f" {base['p50_ms']:>9.2f} {(r['p50_ms'] / base['p50_ms'] - 1) * 100:>+7.1f}%"
+        print(line)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        runs = json.load(f)["runs"]
+    return {(run["shape"], run["nodes"], run["deleted_pct"]): {r["endpoint"]: r for r in run["results"]}
+            for run in runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the node endpoints on synthetic hierarchies")
+    parser.add_argument("--shape", nargs="+", choices=SHAPES, default=["plant"])
+    parser.add_argument("--nodes", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--deleted", type=int, default=5, help="percent of nodes soft-deleted")
+    parser.add_argument("--depth", type=int, default=50, help="chain length for the deep shape")
+    parser.add_argument("--repeat", type=int, default=30, help="timed requests per endpoint")
+    parser.add_argument("--only", nargs="*", help="run endpoints whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "asset-hierarchy-bench"))
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare p50 against")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    baselines = load_baseline(args.compare) if args.compare else None
+    runs = []
+    for shape in args.shape:
+        for nodes in args.nodes:
+            path = dataset(args.data_dir, shape, nodes, args.deleted, args.depth, args.seed)
+            print(f"\n{shape}, {nodes} nodes, {args.deleted}% deleted")
+            results = asyncio.run(run_dataset(path, args.repeat, args.only, args.seed))
+            print_results(results, baselines.get((shape, nodes, args.deleted), {}) if baselines is not None else None)
+            runs.append({"shape": shape, "nodes": nodes, "deleted_pct": args.deleted, "results": results})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "created_at": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "repeat": args.repeat,
+                "depth": args.depth,
+                "seed": args.seed,
+                "runs": runs,
+            }, f, indent=2)
+        print(f"\nresults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
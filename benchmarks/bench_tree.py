@@ -0,0 +1,138 @@
+"""
+/nodes/tree and /nodes/deleted-trees bodies: array engine versus the old
+dict-of-dicts assembly.
+
+On plant hierarchies (see bench_suite) with 5% of the nodes soft-deleted,
+times serialize_nodes_tree and get_deleted_trees against the implementation
+they replaced (kept below: row dicts linked into nested dicts, recursive
+children_count, NodeTreeResponse validation, jsonable_encoder, json.dumps),
+then measures the tracemalloc peak of each in a second, separate run. A
+deep shape shows the recursion limit the old code hit.
+
+    python -m benchmarks.bench_tree [nodes...]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+
+from app import database
+from app.routes import node_routes
+from app.schemas import DeletedNodeTree, NodeTreeResponse
+from benchmarks.bench_suite import bench_app, dataset
+
+REPEAT = 3
+
+
+# ---------- BEFORE ----------
+def old_build_nodes_tree(db):
+    nodes = [dict(row._mapping) for row in db.execute(text("SELECT * FROM node_data WHERE is_deleted = 0;"))]
+    node_map = {n["node_id"]: {**n, "children": [], "children_count": 0} for n in nodes}
+    tree = []
+    for n in node_map.values():
+        parent_id = n.get("parent_id")
+        if parent_id and parent_id in node_map:
+            node_map[parent_id]["children"].append(n)
+        else:
+            tree.append(n)
+
+    def count_children(node):
+        total = 0
+        for child in node["children"]:
+            total += 1 + count_children(child)
+        node["children_count"] = total
+        return total
+
+    for root in tree:
+        count_children(root)
+    return tree
+
+
+def old_tree(db):
+    tree = [NodeTreeResponse(**n) for n in old_build_nodes_tree(db)]
+    return json.dumps(jsonable_encoder(tree)).encode("utf-8")
+
+
+def old_deleted_trees(db):
+    deleted_nodes = [dict(row) for row in db.execute(text(
+        "SELECT node_id, node_name, parent_id FROM node_data WHERE is_deleted = 1")).mappings()]
+    deleted_ids = {n["node_id"] for n in deleted_nodes}
+    roots = [n for n in deleted_nodes if not n["parent_id"] or n["parent_id"] not in deleted_ids]
+    node_map = {n["node_id"]: {**n, "children": []} for n in deleted_nodes}
+    for n in node_map.values():
+        pid = n.get("parent_id")
+        if pid and pid in node_map:
+            node_map[pid]["children"].append(n)
+    # what FastAPI did with the returned dicts: validate against the response model, then encode
+    trees = [DeletedNodeTree(**node_map[r["node_id"]]) for r in roots]
+    return json.dumps(jsonable_encoder(trees)).encode("utf-8")
+
+
+# ---------- AFTER ----------
+def new_tree(db):
+    return node_routes.serialize_nodes_tree(db)
+
+
+def new_deleted_trees(db):
+    # every deleted tree in one page, like the old unpaginated route
+    return node_routes.get_deleted_trees(None, 10**9, db).body
+
+
+CASES = [
+    ("tree, before", old_tree),
+    ("tree, after", new_tree),
+    ("deleted-trees, before", old_deleted_trees),
+    ("deleted-trees, after", new_deleted_trees),
+]
+
+
+def measure(build):
+    db = database.SessionLocal()
+    try:
+        samples = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            try:
+                body = build(db)
+            except (RecursionError, ValueError):  # pydantic reports its recursion limit as a ValidationError
+                return None
+            samples.append(time.perf_counter() - start)
+        tracemalloc.start()
+        build(db)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return statistics.median(samples), peak, len(body)
+    finally:
+        db.close()
+
+
+def run(path, label):
+    app, engine = bench_app(path)
+    print(f"\n{label}")
+    print(f"{'body':>24} {'median ms':>10} {'peak MiB':>9} {'bytes':>12}")
+    for name, build in CASES:
+        result = measure(build)
+        if result is None:
+            print(f"{name:>24} {'fails: recursion limit':>22}")
+            continue
+        seconds, peak, size = result
+        print(f"{name:>24} {seconds * 1000:>10.1f} {peak / 2**20:>9.1f} {size:>12,}")
+    engine.dispose()
+
+
+def main(sizes):
+    data_dir = os.path.join(tempfile.gettempdir(), "asset-hierarchy-bench")
+    os.makedirs(data_dir, exist_ok=True)
+    for nodes in sizes:
+        run(dataset(data_dir, "plant", nodes, 5, 50, 1), f"plant, {nodes} nodes, 5% deleted")
+    run(dataset(data_dir, "deep", 4_000, 5, 2_000, 1), "deep, 4000 nodes in chains of 2000, 5% deleted")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000])
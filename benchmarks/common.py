@@ -0,0 +1,81 @@
+"""
+Helpers shared by the benchmarks: timing loops, percentiles, seeding SQLite
+databases with nodes, and session dependencies for apps built on them.
+"""
+import statistics
+import time
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import hierarchy
+from app.database import Base
+from app.models import NodeData, User
+
+
+def samples(fn: Callable, repeat: int):
+    """(sorted seconds per call, result of the last call) over repeat calls of fn."""
+    seconds, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    seconds.sort()
+    return seconds, result
+
+
+def timed(fn: Callable, repeat: int):
+    """(median seconds, result of the last call) over repeat calls of fn."""
+    seconds, result = samples(fn, repeat)
+    return statistics.median(seconds), result
+
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    return sorted_samples[max(int(len(sorted_samples) * fraction) - 1, 0)]
+
+
+def write_nodes(engine, rows: Iterable[dict], users: Optional[List[dict]] = None, chunk: int = 50_000):
+    """Create every table, insert node_data rows (and users), then build node_closure."""
+    Base.metadata.create_all(engine)
+    rows = list(rows)
+    with engine.begin() as conn:
+        for start in range(0, len(rows), chunk):
+            conn.execute(insert(NodeData), rows[start:start + chunk])
+        if users:
+            conn.execute(insert(User), users)
+    db = sessionmaker(bind=engine)()
+    try:
+        hierarchy.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def seed_file(path: str, rows: Iterable[dict], users: Optional[List[dict]] = None):
+    """write_nodes() into a fresh SQLite file."""
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        write_nodes(engine, rows, users)
+    finally:
+        engine.dispose()
+
+
+def star_rows(nodes: int) -> List[dict]:
+    """Node 1 with every other node directly under it."""
+    return [{"node_id": i, "parent_id": None if i == 1 else 1, "node_name": f"Asset {i}", "is_deleted": False}
+            for i in range(1, nodes + 1)]
+
+
+def session_dependency(engine):
+    """A get_db replacement yielding sessions on engine, for app.dependency_overrides."""
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return get_db
@@ -0,0 +1,64 @@
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import hierarchy
+from app.auth import get_current_user
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.path_resolver import path_resolver
+from app.search_index import search_index
+from app.tree_cache import tree_cache
+
+
+@pytest.fixture
+def client():
+    """TestClient on an emptied in-memory database, authenticated as "tester"."""
+    app.dependency_overrides[get_current_user] = lambda: "tester"
+    with TestClient(app) as client:
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+        tree_cache.invalidate()
+        search_index.invalidate()
+        path_resolver.clear()
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def seed(rows):
+    """Insert (node_id, parent_id, node_name) rows and index them."""
+    with engine.begin() as conn:
+        for node_id, parent_id, node_name in rows:
+            conn.execute(text("INSERT INTO node_data (node_id, parent_id, node_name, is_deleted) "
+                              "VALUES (:id, :parent_id, :name, 0)"),
+                         {"id": node_id, "parent_id": parent_id, "name": node_name})
+    db = SessionLocal()
+    try:
+        hierarchy.rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def assert_consistent(step=""):
+    db = SessionLocal()
+    try:
+        report = hierarchy.verify(db)
+    finally:
+        db.close()
+    assert report == {"missing": [], "unexpected": []}, step
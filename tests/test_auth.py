@@ -0,0 +1,56 @@
+"""
+AUTH_REQUIRE_ACTIVE_USER: the cached active/unknown lookup per user and
+when it is refreshed.
+"""
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app import auth
+from app.database import engine
+from app.main import app
+
+
+@pytest.fixture
+def active_users(client, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REQUIRE_ACTIVE_USER", True)
+    app.dependency_overrides.pop(auth.get_current_user)
+    auth.user_cache.discard("alice")
+    yield client
+    auth.user_cache.discard("alice")
+
+
+def tree(client, token):
+    return client.get("/api/nodes/tree", headers={"Authorization": f"Bearer {token}"}).status_code
+
+
+def test_registering_clears_a_cached_unknown_user(active_users):
+    token = auth.create_access_token({"sub": "alice"})
+    assert tree(active_users, token) == 401
+
+    response = active_users.post("/api/register", json={"username": "alice", "password": "secret"})
+    assert response.status_code == 200
+    assert tree(active_users, response.json()["access_token"]) == 200
+
+
+def test_deactivation_applies_within_the_cache_ttl(active_users, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_USER_CACHE_SECONDS", 0.2)
+    token = active_users.post("/api/register", json={"username": "alice", "password": "secret"}).json()["access_token"]
+    assert tree(active_users, token) == 200
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE users SET is_active = 0 WHERE username = 'alice'"))
+    assert tree(active_users, token) == 200  # still cached
+    time.sleep(0.3)
+    assert tree(active_users, token) == 401
+
+
+def test_invalidate_user_applies_immediately(active_users):
+    token = active_users.post("/api/register", json={"username": "alice", "password": "secret"}).json()["access_token"]
+    assert tree(active_users, token) == 200
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE username = 'alice'"))
+    auth.invalidate_user("alice")
+    assert tree(active_users, token) == 401
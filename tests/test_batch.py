@@ -0,0 +1,94 @@
+"""
+POST /api/nodes/batch: all-or-nothing, ordering within a batch, and limits.
+"""
+from sqlalchemy import text
+
+from app import batch, hierarchy
+from app.database import engine
+from tests.conftest import assert_consistent, seed
+
+TABLES = ("node_data", "node_closure", "node_changes", "hierarchy_version")
+
+
+def snapshot():
+    with engine.connect() as conn:
+        return {table: sorted(map(tuple, conn.execute(text(f"SELECT * FROM {table}")))) for table in TABLES}
+
+
+def plant():
+    seed([(1, None, "Plant"), (2, 1, "Line 1"), (3, 1, "Line 2"), (4, 2, "Pump"), (5, 3, "Valve")])
+
+
+def test_invalid_operation_rejects_the_whole_batch(client):
+    plant()
+    client.post("/api/nodes", json={"node_name": "Fan", "parent_name": "Line 1"})  # a version row and a log entry
+    before = snapshot()
+    response = client.post("/api/nodes/batch", json={"operations": [
+        {"op": "rename", "node_id": 4, "node_name": "Pump A"},
+        {"op": "delete", "node_id": 5},
+        {"op": "move", "node_id": 2, "parent_id": 4},  # under its own child
+        {"op": "move", "node_id": 3, "parent_id": 2},
+    ]})
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"] == [
+        {"index": 2, "op": "move", "node_id": 2, "error": "Node cannot be moved under itself or its descendants"}]
+    assert snapshot() == before
+
+
+def test_failure_while_applying_rolls_everything_back(client, monkeypatch):
+    plant()
+    client.post("/api/nodes", json={"node_name": "Fan", "parent_name": "Line 1"})
+    before = snapshot()
+    real_move = hierarchy.move_subtree
+    calls = []
+
+    def failing_move(db, node_id, parent_id):
+        calls.append(node_id)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        real_move(db, node_id, parent_id)
+
+    monkeypatch.setattr(hierarchy, "move_subtree", failing_move)
+    response = client.post("/api/nodes/batch", json={"operations": [
+        {"op": "rename", "node_id": 4, "node_name": "Pump A"},
+        {"op": "move", "node_id": 4, "parent_id": 3},
+        {"op": "delete", "node_id": 5},
+        {"op": "move", "node_id": 2, "parent_id": 3},
+    ]})
+    assert response.status_code == 500
+    assert snapshot() == before
+
+
+def test_operations_see_the_ones_before_them(client):
+    plant()
+    assert client.delete("/api/nodes/3").status_code == 200
+    response = client.post("/api/nodes/batch", json={"operations": [
+        {"op": "move", "node_id": 4, "parent_id": 3},  # Line 2 is deleted
+        {"op": "restore", "node_id": 5},                # restores Valve and Line 2
+    ]})
+    assert response.status_code == 400
+
+    response = client.post("/api/nodes/batch", json={"operations": [
+        {"op": "restore", "node_id": 5},
+        {"op": "move", "node_id": 4, "parent_id": 3},
+        {"op": "rename", "node_id": 3, "node_name": "Line 2b"},
+        {"op": "move", "node_id": 2, "parent_id": 4},  # Pump is no longer under Line 1
+    ]})
+    assert response.status_code == 200
+    assert [result["affected"] for result in response.json()["results"]] == [2, 1, 1, 1]
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT node_id, parent_id FROM node_data")).all())
+    assert rows == {1: None, 2: 4, 3: 1, 4: 3, 5: 3}
+    assert client.get("/api/nodes/by-path", params={"path": "Plant/Line 2b/Pump/Line 1"}).json()["node_id"] == 2
+    assert_consistent()
+
+
+def test_operation_count_limit(client, monkeypatch):
+    plant()
+    monkeypatch.setattr(batch, "MAX_BATCH_OPERATIONS", 3)
+    rename = {"op": "rename", "node_id": 4, "node_name": "Pump"}
+    assert client.post("/api/nodes/batch", json={"operations": [rename] * 3}).status_code == 200
+    response = client.post("/api/nodes/batch", json={"operations": [rename] * 4})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "At most 3 operations per batch"
+    assert client.post("/api/nodes/batch", json={"operations": []}).status_code == 400
@@ -0,0 +1,66 @@
+"""
+Authentication of the change feed's SSE and WebSocket routes, whose browser
+clients cannot send an Authorization header.
+"""
+import asyncio
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.auth import create_access_token
+from app.main import app
+
+
+@pytest.fixture
+def token():
+    return create_access_token({"sub": "alice"})
+
+
+def first_line(path, headers=()):
+    """(status, first body line) of an SSE request, disconnecting after the first chunk.
+
+    Driven over ASGI directly: the test clients buffer the whole body, which never ends here.
+    """
+    query = path.partition("?")[2].encode()
+    scope = {"type": "http", "method": "GET", "path": path.partition("?")[0], "raw_path": path.encode(),
+             "query_string": query, "headers": [(k.encode(), v.encode()) for k, v in headers],
+             "scheme": "http", "server": ("test", 80), "client": ("test", 1), "root_path": "",
+             "http_version": "1.1"}
+    result = {}
+    done = asyncio.Event()
+
+    async def receive():
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body" and "line" not in result:
+            result["line"] = message.get("body", b"").decode().split("\n")[0]
+            done.set()
+
+    async def run():
+        await asyncio.wait_for(app(scope, receive, send), 5)
+
+    asyncio.run(run())
+    return result["status"], result["line"] if result["status"] == 200 else None
+
+
+def test_sse_accepts_header_query_or_cookie(client, token):
+    assert first_line("/api/nodes/events", [("authorization", f"Bearer {token}")]) == (200, "retry: 2000")
+    assert first_line(f"/api/nodes/events?access_token={token}") == (200, "retry: 2000")
+    assert first_line("/api/nodes/events", [("cookie", f"access_token={token}")]) == (200, "retry: 2000")
+
+
+def test_sse_rejects_missing_or_bad_tokens(client):
+    assert first_line("/api/nodes/events")[0] == 401
+    assert first_line("/api/nodes/events?access_token=nonsense")[0] == 401
+
+
+def test_websocket_accepts_query_token(client, token):
+    with client.websocket_connect(f"/api/nodes/events/ws?access_token={token}"):
+        pass  # accepted
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/nodes/events/ws?access_token=nonsense") as socket:
+            socket.receive_text()
@@ -0,0 +1,70 @@
+"""
+The hierarchy version row and GET /api/nodes/changes?since=<version>.
+"""
+from app import change_log
+from app.database import SessionLocal
+from tests.conftest import seed
+
+
+def version(client):
+    return int(client.get("/api/nodes").headers["x-hierarchy-version"])
+
+
+def create(client, name, parent="Plant"):
+    response = client.post("/api/nodes", json={"node_name": name, "parent_name": parent})
+    assert response.status_code == 200
+    return response.json()["node_id"]
+
+
+def test_first_writes_share_one_version_row(client, db):
+    # the client fixture empties hierarchy_version; a writer that finds the row
+    # already inserted by another must carry on rather than fail
+    change_log.ensure_version_row(db)
+    change_log.ensure_version_row(db)
+    assert change_log.next_version(db) == 1
+    db.commit()
+    other = SessionLocal()
+    try:
+        assert change_log.next_version(other) == 2
+        other.commit()
+    finally:
+        other.close()
+    assert change_log.current(db) == (2, 0)
+
+
+def test_changes_since_nets_out_upserts_and_removals(client):
+    seed([(1, None, "Plant")])
+    kept, dropped = create(client, "Pump"), create(client, "Valve")
+    since = version(client)
+
+    assert client.put(f"/api/nodes/{kept}", json={"node_name": "Pump 2", "parent_name": "Plant"}).status_code == 200
+    short_lived = create(client, "Temp")
+    assert client.delete(f"/api/hard-nodes/{short_lived}").status_code == 200
+    # after the create: SQLite hands a freed top id out again
+    assert client.delete(f"/api/hard-nodes/{dropped}").status_code == 200
+
+    changes = client.get(f"/api/nodes/changes?since={since}").json()
+    assert changes["resync_required"] is False
+    assert changes["version"] == version(client)
+    assert [(row["node_id"], row["node_name"]) for row in changes["upserts"]] == [(kept, "Pump 2")]
+    assert changes["removed"] == [dropped]
+
+    assert client.get(f"/api/nodes/changes?since={changes['version']}").json()["upserts"] == []
+
+
+def test_pruned_or_future_cursor_requires_resync(client, db):
+    seed([(1, None, "Plant")])
+    create(client, "Pump")
+    since = version(client)
+    create(client, "Valve")
+
+    assert client.get(f"/api/nodes/changes?since={since}").json()["resync_required"] is False
+    change_log.prune(db, retention_days=0)
+    db.commit()
+    current, floor = change_log.current(db)
+    assert floor == current
+    for cursor in (since, current + 1):
+        changes = client.get(f"/api/nodes/changes?since={cursor}").json()
+        assert changes["resync_required"] is True
+        assert changes["upserts"] == [] and changes["removed"] == []
+    assert client.get(f"/api/nodes/changes?since={current}").json()["resync_required"] is False
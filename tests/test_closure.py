@@ -0,0 +1,47 @@
+"""
+node_closure stays in line with node_data.parent_id through random create,
+move, soft delete, restore and hard delete requests (hierarchy.verify).
+"""
+import random
+
+import pytest
+from sqlalchemy import text
+
+from app.database import engine
+from tests.conftest import assert_consistent, seed
+
+STEPS = 300
+
+
+def node_ids(deleted):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(
+            text("SELECT node_id FROM node_data WHERE is_deleted = :d AND node_id <> 1"), {"d": deleted})]
+
+
+@pytest.mark.parametrize("seed_value", [1, 2, 3])
+def test_closure_consistent_under_random_edits(client, seed_value):
+    seed([(1, None, "Root"), (2, None, "Spare")])  # a second root for the edits to move and delete
+    rng = random.Random(seed_value)
+    for i in range(STEPS):
+        live, deleted = node_ids(False), node_ids(True)
+        op = rng.choice(["create", "create", "move", "move", "delete", "restore", "hard_delete"])
+        if op == "create":
+            parent_id = rng.choice(live + [1])
+            with engine.connect() as conn:
+                parent_name = conn.execute(text("SELECT node_name FROM node_data WHERE node_id = :id"),
+                                           {"id": parent_id}).scalar()
+            response = client.post("/api/nodes", json={"node_name": f"n{i}", "parent_name": parent_name})
+        elif op == "move" and live:
+            response = client.post(f"/api/nodes/{rng.choice(live)}/move", json={"parent_id": rng.choice(live + [1])})
+        elif op == "delete" and live:
+            response = client.delete(f"/api/nodes/{rng.choice(live)}")
+        elif op == "restore" and deleted:
+            response = client.put(f"/api/nodes/restore/{rng.choice(deleted)}")
+        elif op == "hard_delete" and live + deleted:
+            response = client.delete(f"/api/hard-nodes/{rng.choice(live + deleted)}")
+        else:
+            continue
+        # refusals (moving under itself, restoring under a deleted parent...) are fine, failures are not
+        assert response.status_code < 500, response.text
+        assert_consistent(f"step {i}: {op} -> {response.status_code}")
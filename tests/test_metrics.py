@@ -0,0 +1,43 @@
+"""
+Resolution picking for GET /api/nodes/{id}/metrics.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import rollups
+from app.routes.node_routes import MAX_METRIC_POINTS
+from tests.conftest import seed
+
+DAY = 86400
+TO = datetime(2026, 1, 31)
+
+
+@pytest.mark.parametrize("days, points, expected", [
+    (1, 300, "1m"),
+    (8, 300, "1h"),    # 1m would be 11,520 buckets
+    (30, 300, "1h"),
+    (30, 20, "1d"),
+    (400, 300, "1d"),  # 1h would be 9,600 buckets, under the cap, but 1d already gives 400
+])
+def test_pick_resolution(days, points, expected):
+    assert rollups.pick_resolution(0, days * DAY, points, MAX_METRIC_POINTS) == expected
+
+
+def metrics(client, days, **params):
+    return client.get("/api/nodes/1/metrics",
+                      params={"from": (TO - timedelta(days=days)).isoformat(), "to": TO.isoformat(), **params})
+
+
+@pytest.mark.parametrize("days, expected", [(1, "1m"), (8, "1h"), (30, "1h")])
+def test_auto_resolution_stays_under_the_cap(client, days, expected):
+    seed([(1, None, "Sensor")])
+    response = metrics(client, days)
+    assert response.status_code == 200
+    assert response.json()["resolution"] == expected
+
+
+def test_explicit_resolution_over_the_cap_is_rejected(client):
+    seed([(1, None, "Sensor")])
+    assert metrics(client, 8, resolution="1m").status_code == 400
+    assert metrics(client, 8, resolution="1h").status_code == 200
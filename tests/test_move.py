@@ -0,0 +1,65 @@
+"""
+POST /api/nodes/{id}/move: cycle checks, roots, and node_closure afterwards.
+"""
+from sqlalchemy import text
+
+from app.database import engine
+from tests.conftest import assert_consistent, seed
+
+
+def plant():
+    seed([(1, None, "Plant"), (2, 1, "Line 1"), (3, 2, "Cell"), (4, 3, "Pump"), (5, 1, "Line 2"),
+          (6, None, "Spares")])
+
+
+def parents():
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT node_id, parent_id FROM node_data")).all())
+
+
+def test_move_under_itself_or_a_descendant_is_rejected(client):
+    plant()
+    before = parents()
+    for parent_id in (2, 3, 4):
+        response = client.post("/api/nodes/2/move", json={"parent_id": parent_id})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Node cannot be moved under itself or its descendants"
+    assert client.post("/api/nodes/1/move", json={"parent_path": "Plant/Line 1/Cell/Pump"}).status_code == 400
+    assert parents() == before
+    assert_consistent()
+
+
+def test_move_subtree(client):
+    plant()
+    response = client.post("/api/nodes/3/move", json={"parent_path": "Plant/Line 2"})
+    assert response.status_code == 200
+    assert response.json() == {"node_id": 3, "parent_id": 5, "old_parent_id": 2, "moved": 2, "depth": 2}
+    assert client.get("/api/nodes/by-path", params={"path": "Plant/Line 2/Cell/Pump"}).json()["node_id"] == 4
+    assert client.get("/api/nodes/by-path", params={"path": "Plant/Line 1/Cell/Pump"}).status_code == 404
+    assert_consistent()
+
+    # to where it already is: nothing to do
+    assert client.post("/api/nodes/3/move", json={"parent_id": 5}).json()["moved"] == 0
+
+
+def test_move_root(client):
+    plant()
+    response = client.post("/api/nodes/1/move", json={"parent_id": 6})
+    assert response.status_code == 200
+    assert response.json()["moved"] == 5
+    assert parents()[1] == 6
+    assert client.get("/api/nodes/by-path", params={"path": "Spares/Plant/Line 1/Cell/Pump"}).json()["node_id"] == 4
+    assert_consistent()
+
+    # Spares is now an ancestor of Pump, so it cannot go under it
+    assert client.post("/api/nodes/6/move", json={"parent_id": 4}).status_code == 400
+    assert_consistent()
+
+
+def test_move_to_missing_or_deleted_parent(client):
+    plant()
+    assert client.post("/api/nodes/3/move", json={"parent_id": 99}).status_code == 404
+    assert client.delete("/api/nodes/5").status_code == 200
+    assert client.post("/api/nodes/3/move", json={"parent_id": 5}).status_code == 404
+    assert client.post("/api/nodes/3/move", json={}).status_code == 400
+    assert_consistent()
@@ -0,0 +1,34 @@
+"""
+--nodes / SIM_NODES specs for the MQTT simulator.
+"""
+import argparse
+
+import pytest
+
+from app.mqtt_simulator import node_spec, parse_node_ids
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("7", [7]),
+    ("1,2,3", [1, 2, 3]),
+    ("3-6", [3, 4, 5, 6]),
+    ("1-5,10", [1, 2, 3, 4, 5, 10]),
+    (" 10 , 1-2 ,", [10, 1, 2]),
+])
+def test_parse_node_ids(spec, expected):
+    assert parse_node_ids(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["", "a", "1-", "-3", "5-2", "1-2-3", "1,,x", "1;2"])
+def test_malformed_specs_are_rejected(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_node_ids(spec)
+
+
+def test_nodes_argument():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=node_spec, default="db")
+    assert parser.parse_args([]).nodes == "db"
+    assert parser.parse_args(["--nodes", "1-5,10"]).nodes == "1-5,10"
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--nodes", "1-x"])
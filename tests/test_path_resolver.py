@@ -0,0 +1,47 @@
+"""
+PathResolver against a node_data whose names compare case-insensitively, as
+under SQL Server's default collation.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.path_resolver import PathResolver
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE node_data (node_id INTEGER PRIMARY KEY, parent_id INTEGER, "
+                          "node_name VARCHAR(255) COLLATE NOCASE, is_deleted BOOLEAN)"))
+        conn.execute(text("INSERT INTO node_data VALUES (1, NULL, 'Plant', 0), (2, 1, 'Pump', 0), "
+                          "(3, 1, 'Valve', 0), (4, 1, 'VALVE', 0)"))
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def test_names_match_in_any_case(db):
+    resolver = PathResolver()
+    found, ambiguous = resolver.resolve_many(db, ["plant/PUMP", "Plant/Pump", "PLANT"])
+    assert found == {"plant/PUMP": 2, "Plant/Pump": 2, "PLANT": 1}
+    assert ambiguous == set()
+
+
+def test_siblings_differing_in_case_are_ambiguous(db):
+    assert PathResolver().resolve(db, "Plant/valve") == (None, True)
+
+
+def test_cache_entries_are_shared_and_invalidated_across_cases(db):
+    resolver = PathResolver()
+    assert resolver.resolve(db, "Plant/Pump") == (2, False)
+    queries = resolver.queries
+    assert resolver.resolve(db, "PLANT/pump") == (2, False)
+    assert resolver.queries == queries
+
+    db.execute(text("UPDATE node_data SET node_name = 'Fan' WHERE node_id = 2"))
+    resolver.invalidate(["plant/pump"])
+    assert resolver.resolve(db, "Plant/Pump") == (None, False)
+    assert resolver.resolve(db, "plant/fan") == (2, False)
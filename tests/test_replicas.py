@@ -0,0 +1,44 @@
+"""
+Read routing with a replica configured: reads go to the replica unless the
+client wrote recently (read-your-writes stickiness).
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import hierarchy
+from app.database import Base
+from app.replicas import Replica, replica_set
+from tests.conftest import seed
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """A replica that lags behind: it only ever has the node "Stale"."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO node_data (node_id, parent_id, node_name, is_deleted) "
+                          "VALUES (1, NULL, 'Stale', 0)"))
+    db = sessionmaker(bind=engine)()
+    hierarchy.rebuild(db)
+    db.commit()
+    db.close()
+    monkeypatch.setattr(replica_set, "replicas", [Replica("replica-1", engine)])
+    monkeypatch.setattr(replica_set, "max_version_lag", 10**9)
+    yield engine
+    engine.dispose()
+
+
+def test_export_reads_primary_after_a_write(client, replica):
+    seed([(1, None, "Root")])
+    assert "Stale" in client.get("/api/nodes/export").text
+
+    assert client.post("/api/nodes", json={"node_name": "Pump", "parent_name": "Root"}).status_code < 300
+    assert client.cookies.get("read_primary_until")
+    export = client.get("/api/nodes/export").text
+    assert "Pump" in export and "Stale" not in export
+
+    client.cookies.clear()
+    assert "Stale" in client.get("/api/nodes/export").text
@@ -0,0 +1,54 @@
+"""
+Streamed GET /api/nodes formats read through get_db, so its overrides apply.
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base, get_db
+from app.main import app
+from app.routes import node_routes
+from tests.conftest import seed
+
+
+@pytest.fixture
+def other_db(client):
+    """get_db overridden with a database holding only the node "Elsewhere"."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO node_data (node_id, parent_id, node_name, is_deleted) "
+                          "VALUES (7, NULL, 'Elsewhere', 0)"))
+    seed([(1, None, "Plant")])
+    Session = sessionmaker(bind=engine)
+
+    def other_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = other_get_db
+    yield engine
+    engine.dispose()
+
+
+def test_streamed_formats_use_the_overridden_get_db(client, other_db):
+    ndjson = client.get("/api/nodes", params={"format": "ndjson"})
+    assert [json.loads(line)["node_name"] for line in ndjson.text.splitlines()] == ["Elsewhere"]
+    array = client.get("/api/nodes", params={"format": "json-stream"})
+    assert [node["node_name"] for node in array.json()] == ["Elsewhere"]
+    assert [node["node_name"] for node in client.get("/api/nodes").json()] == ["Elsewhere"]
+
+
+def test_own_session_stream_uses_the_overridden_get_db(other_db):
+    # as the async route does: its AsyncSession cannot be read while the body is sent
+    request = SimpleNamespace(app=app)
+    query = node_routes.node_list_query(None, None, None)
+    body = "".join(node_routes.stream_nodes_own_session(request, query, "json-stream"))
+    assert [node["node_name"] for node in json.loads(body)] == ["Elsewhere"]
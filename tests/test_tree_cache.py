@@ -0,0 +1,49 @@
+"""
+GET /api/nodes/tree: ETag and 304 handling, and invalidation after writes.
+"""
+from sqlalchemy import text
+
+from app import change_log
+from app.database import SessionLocal
+from app.tree_cache import tree_cache
+from tests.conftest import seed
+
+
+def test_matching_etag_gets_304(client):
+    seed([(1, None, "Root"), (2, 1, "Pump")])
+    first = client.get("/api/nodes/tree")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = client.get("/api/nodes/tree", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert again.content == b""
+    assert client.get("/api/nodes/tree", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_write_invalidates_etag(client):
+    seed([(1, None, "Root")])
+    first = client.get("/api/nodes/tree")
+    rebuilds = tree_cache.stats()["rebuilds"]
+
+    assert client.post("/api/nodes", json={"node_name": "Pump", "parent_name": "Root"}).status_code < 300
+    after = client.get("/api/nodes/tree", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != first.headers["etag"]
+    assert [child["node_name"] for child in after.json()[0]["children"]] == ["Pump"]
+    assert tree_cache.stats()["rebuilds"] == rebuilds + 1
+
+
+def test_write_from_another_worker_invalidates(client):
+    seed([(1, None, "Root")])
+    first = client.get("/api/nodes/tree")
+    # another worker renames the node: it bumps hierarchy_version, but this process's cache is never told
+    db = SessionLocal()
+    change_log.next_version(db)
+    db.execute(text("UPDATE node_data SET node_name = 'Plant' WHERE node_id = 1"))
+    db.commit()
+    db.close()
+    after = client.get("/api/nodes/tree", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json()[0]["node_name"] == "Plant"